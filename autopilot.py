@@ -0,0 +1,363 @@
+"""Time-budgeted autopilot for Pac-Man, for attract-mode demos and as an evaluation baseline.
+
+    python pacman_clone.py --autopilot                # attract mode
+    python pacman_clone.py --autopilot --autopilot-budget 8 --autopilot-processes 4
+    python runner.py --games 100 --policy autopilot   # baseline scores
+
+Each time Pac-Man enters a cell the autopilot weighs every exit of that cell
+by Monte Carlo rollouts: a private headless copy of the game is restored
+from a snapshot of the real one, Pac-Man is sent through the exit and then
+steered by a cheap pellet-seeking rule for HORIZON_TICKS ticks while the
+ghosts play by their usual rules. The copy's RNG is reseeded for every
+rollout, so the frightened ghosts' random turns are sampled rather than
+known in advance, and an exit's value is the mean over its rollouts of the
+points scored, less DEATH_PENALTY for a lost life and the distance left to
+the nearest pellet. The exit with the best mean so far is the move.
+
+The search is anytime: think() adds one time budget of rollouts to the
+current cell's tally, and move() answers at once with the best exit found
+so far. After start(), think() hands the budget to a background thread and
+returns immediately, so the search runs while the frame is drawn and the
+loop sleeps. Rollouts check the clock every few ticks and a rollout cut
+short by the deadline is dropped, so a budget is never overrun by more than
+a few ticks' work. With processes > 1 the same rollouts also run in worker
+processes, each on its own copy of the game, and their tallies are added
+up: quality grows with both the budget and the number of cores.
+"""
+import time, random, signal, threading
+import multiprocessing
+
+from pacman_clone import Game, DIRECTIONS, DIRECTION_INDEX, INPUT_START, FRAME_MS, GAME_STATE_PLAYING
+from levels import compile_level, read_compiled
+
+DEFAULT_BUDGET_MS = 4.0
+# Rollout length, in ticks of FRAME_MS
+HORIZON_TICKS = 60
+DEATH_PENALTY = 1000
+CLEAR_BONUS = 1000
+# Points per cell between Pac-Man and the nearest pellet when a rollout ends
+PELLET_DISTANCE_WEIGHT = 2
+MAX_PELLET_DISTANCE = 100
+# Rollouts every exit needs before the tally is trusted; until then Pac-Man keeps going
+MIN_ROLLOUTS = 4
+# Rollout ticks between deadline checks
+DEADLINE_CHECK_TICKS = 8
+# Rollouts per exit for the runner policy, which has no time budget so that
+# its results depend only on the seed
+EVAL_ROLLOUTS = 8
+# How much longer than the budget to wait for a worker process before going without its rollouts
+WORKER_GRACE_S = 0.1
+# How long attract mode shows a finished game before starting the next
+ATTRACT_RESTART_MS = 3000
+
+
+def game_settings(game):
+    """The tuning a snapshot leaves out: fright duration and each ghost's speeds and mode durations."""
+    return (game.fright_duration, tuple((ghost.mode_duration_scatter, ghost.mode_duration_chase, ghost.normal_speed,
+                                         ghost.frightened_speed, ghost.eaten_speed) for ghost in game.ghosts))
+
+def apply_settings(game, settings):
+    game.fright_duration, ghosts = settings
+    for ghost, values in zip(game.ghosts, ghosts):
+        (ghost.mode_duration_scatter, ghost.mode_duration_chase, ghost.normal_speed,
+         ghost.frightened_speed, ghost.eaten_speed) = values
+
+def pellet_distance(nav, pellets, start, limit=MAX_PELLET_DISTANCE):
+    """Cells along the maze from start to the nearest pellet, or limit if none is that close."""
+    if start in pellets:
+        return 0
+    seen = {start}
+    frontier = [start]
+    for distance in range(1, limit):
+        reached = []
+        for r, c in frontier:
+            for cell in nav.neighbours(r, c):
+                if cell not in seen:
+                    if cell in pellets:
+                        return distance
+                    seen.add(cell)
+                    reached.append(cell)
+        if not reached:
+            break
+        frontier = reached
+    return limit
+
+
+class Searcher:
+    """Runs rollouts from snapshots on its own headless game, which has the live game's maze."""
+
+    def __init__(self, level, horizon=HORIZON_TICKS, seed=None):
+        self.sim = Game(headless=True, seed=0, level=level)
+        self.horizon = horizon
+        self.rng = random.Random(seed)
+
+    def search(self, snapshot, actions, settings, deadline=None, rollouts=None, first=0):
+        """Rolls out each action in turn, from actions[first], until the deadline or
+        until each has had rollouts more; returns (totals, counts) per action."""
+        apply_settings(self.sim, settings)
+        totals = [0] * len(actions)
+        counts = [0] * len(actions)
+        k = first
+        while rollouts is None or counts[first - 1] < rollouts:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            value = self.rollout(snapshot, actions[k], deadline)
+            if value is None:
+                break
+            totals[k] += value
+            counts[k] += 1
+            k = (k + 1) % len(actions)
+        return totals, counts
+
+    def rollout(self, snapshot, action, deadline):
+        """Plays action and then the rollout rule on the copy; returns the value, or None at the deadline."""
+        sim = self.sim
+        sim.restore(snapshot)
+        sim.rng.seed(self.rng.getrandbits(32))
+        pac_man, nav, pellets, rng = sim.pac_man, sim.nav, sim.pellets, self.rng
+        pac_man.set_queued_direction(*action)
+        start_score, lives = sim.score, sim.lives
+        cell = (pac_man.grid_pos[0], pac_man.grid_pos[1])
+        for tick in range(self.horizon):
+            if deadline is not None and tick % DEADLINE_CHECK_TICKS == 0 and time.perf_counter() >= deadline:
+                return None
+            sim.update(FRAME_MS)
+            if sim.lives != lives:
+                return sim.score - start_score - DEATH_PENALTY
+            if sim.game_state != GAME_STATE_PLAYING:
+                return sim.score - start_score + CLEAR_BONUS
+            r, c = pac_man.grid_pos
+            if (r, c) != cell:
+                cell = (r, c)
+                # Never turn back; prefer exits with a pellet behind them
+                options = nav.choices[r][c][DIRECTION_INDEX[pac_man.direction]]
+                if len(options) > 1:
+                    fed = [d for d in options if (r + d[1], c + d[0]) in pellets]
+                    pac_man.set_queued_direction(*rng.choice(fed or options))
+                else:
+                    pac_man.set_queued_direction(*options[0])
+        return sim.score - start_score - PELLET_DISTANCE_WEIGHT * pellet_distance(nav, pellets, cell)
+
+
+def worker_main(conn, compiled_level, horizon):
+    """Worker process: answers (number, snapshot, actions, settings, budget, rollouts,
+    first, seed) tasks from its pipe with (number, totals, counts) until sent None."""
+    # Ctrl+C is for the game to handle
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    searcher = Searcher(read_compiled(compiled_level)[0], horizon)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        number, snapshot, actions, settings, budget, rollouts, first, seed = task
+        searcher.rng.seed(seed)
+        deadline = None if budget is None else time.perf_counter() + budget
+        conn.send((number, *searcher.search(snapshot, actions, settings, deadline, rollouts, first)))
+
+
+class SearchRoot:
+    """The state being searched from, one per cell Pac-Man enters, with the tally so far."""
+    __slots__ = ("key", "snapshot", "actions", "settings", "totals", "counts")
+
+    def __init__(self, key, snapshot, actions, settings):
+        self.key = key
+        self.snapshot = snapshot
+        self.actions = actions
+        self.settings = settings
+        self.totals = [0] * len(actions)
+        self.counts = [0] * len(actions)
+
+    def add(self, totals, counts):
+        for i in range(len(self.actions)):
+            self.totals[i] += totals[i]
+            self.counts[i] += counts[i]
+
+    def best(self):
+        """The action with the best mean value so far, or None until every action has had MIN_ROLLOUTS."""
+        if len(self.actions) == 1:
+            return self.actions[0]
+        if min(self.counts) < MIN_ROLLOUTS:
+            return None
+        return max(zip(self.actions, self.totals, self.counts), key=lambda entry: entry[1] / entry[2])[0]
+
+
+class Autopilot:
+    """Chooses Pac-Man's moves in one game (see the module docstring).
+
+    budget_ms caps the search per think(); rollouts caps the rollouts per
+    exit of each cell and may replace the budget (budget_ms=None) to make
+    the moves depend only on seed. The game must have one Pac-Man and the
+    level's four ghosts, as restore() requires of the private copy.
+    """
+
+    def __init__(self, game, budget_ms=DEFAULT_BUDGET_MS, rollouts=None, processes=1, horizon=HORIZON_TICKS, seed=None):
+        if budget_ms is None and rollouts is None:
+            raise ValueError("an autopilot needs a time budget, a rollout count or both")
+        self.budget = None if budget_ms is None else budget_ms / 1000
+        self.rollouts = rollouts
+        self.rng = random.Random(seed)
+        self.searcher = Searcher(game.level, horizon, self.rng.getrandbits(32))
+        # (process, connection) per worker. Each has a pipe of its own rather than a
+        # shared queue, so a worker that dies (say, to a signal sent to the whole
+        # process group) takes no lock with it and is simply left out.
+        self.workers = []
+        self.tasks_sent = 0
+        if processes > 1:
+            # Spawned rather than forked, so the workers share no display or audio state
+            context = multiprocessing.get_context("spawn")
+            compiled = compile_level(game.level)
+            for _ in range(processes - 1):
+                conn, child_conn = context.Pipe()
+                process = context.Process(target=worker_main, args=(child_conn, compiled, horizon),
+                                          name="autopilot-worker", daemon=True)
+                process.start()
+                child_conn.close()
+                self.workers.append((process, conn))
+        self.root = None
+        self.lock = threading.Lock()
+        self.granted = threading.Event()
+        self.thread = None
+        self.stopping = False
+        self.idle_ms = 0
+
+    def __call__(self, game):
+        """Policy for run_headless and runner.py: searches inline, then moves."""
+        self.observe(game)
+        self.think()
+        return self.move()
+
+    def step(self, game):
+        """The move for this tick, from the search so far; never waits for the search."""
+        self.observe(game)
+        return self.move()
+
+    def attract_input(self, game, dt):
+        """The input code for this tick of attract mode, or None: the move when it
+        changes anything, or INPUT_START once a finished game has been on show for
+        ATTRACT_RESTART_MS."""
+        if game.game_state != GAME_STATE_PLAYING:
+            self.idle_ms += dt
+            if self.idle_ms < ATTRACT_RESTART_MS:
+                return None
+            self.idle_ms = 0
+            return INPUT_START
+        direction = self.step(game)
+        if direction is None or direction in (game.pac_man.direction, game.pac_man.queued_direction):
+            return None
+        return DIRECTIONS.index(direction)
+
+    def observe(self, game):
+        """Starts a new search whenever Pac-Man has entered another cell."""
+        if game.game_state != GAME_STATE_PLAYING:
+            return
+        r, c = game.pac_man.grid_pos
+        key = (r, c, game.lives, game.pellets.generation)
+        if self.root is None or self.root.key != key:
+            root = SearchRoot(key, game.snapshot(), game.nav.exit_dirs[r][c], game_settings(game))
+            with self.lock:
+                self.root = root
+
+    def move(self):
+        root = self.root
+        if root is None or not root.actions:
+            return None
+        with self.lock:
+            return root.best()
+
+    def think(self):
+        """Searches the current cell for one budget: on the background thread once
+        start()ed, otherwise here."""
+        if self.thread is not None:
+            self.granted.set()
+        else:
+            self.search(self.root)
+
+    def search(self, root):
+        if root is None or len(root.actions) < 2:
+            return
+        rollouts = None
+        if self.rollouts is not None:
+            rollouts = self.rollouts - min(root.counts)
+            if rollouts <= 0:
+                return
+        deadline = None if self.budget is None else time.perf_counter() + self.budget
+        # Start at the least tried action, and each worker at a different one, so
+        # that budgets too short to try every action still share them out
+        first = root.counts.index(min(root.counts))
+        self.tasks_sent += 1
+        number = self.tasks_sent
+        busy = []
+        for i, (process, conn) in enumerate(self.workers, 1):
+            try:
+                conn.send((number, root.snapshot, root.actions, root.settings, self.budget, rollouts,
+                           (first + i) % len(root.actions), self.rng.getrandbits(32)))
+                busy.append(conn)
+            except OSError:
+                pass
+        results = [self.searcher.search(root.snapshot, root.actions, root.settings, deadline, rollouts, first)]
+        for conn in busy:
+            results.extend(self.collect(conn, number, None if deadline is None else deadline + WORKER_GRACE_S))
+        with self.lock:
+            for totals, counts in results:
+                root.add(totals, counts)
+
+    def collect(self, conn, number, deadline):
+        """Waits until deadline for a worker's answer to task number, skipping answers to
+        earlier tasks that came too late; returns [(totals, counts)], or [] if none came."""
+        try:
+            while conn.poll(None if deadline is None else max(0, deadline - time.perf_counter())):
+                answer, totals, counts = conn.recv()
+                if answer == number:
+                    return [(totals, counts)]
+        except (EOFError, OSError):
+            pass
+        return []
+
+    # --- Background search ---
+    def start(self):
+        """Moves the search to a background thread; think() then only hands it a budget."""
+        if self.thread is None:
+            self.stopping = False
+            self.thread = threading.Thread(target=self.run, name="autopilot", daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            self.granted.wait()
+            self.granted.clear()
+            if self.stopping:
+                return
+            self.search(self.root)
+
+    def close(self):
+        if self.thread is not None:
+            self.stopping = True
+            self.granted.set()
+            self.thread.join()
+            self.thread = None
+        for process, conn in self.workers:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for process, conn in self.workers:
+            process.join(WORKER_GRACE_S)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+        self.workers = []
+
+
+def autopilot_policy(rng):
+    """Runner policy: EVAL_ROLLOUTS rollouts per exit and no time budget, so a game depends only on its seed."""
+    pilot = None
+
+    def policy(game):
+        nonlocal pilot
+        if pilot is None:
+            pilot = Autopilot(game, budget_ms=None, rollouts=EVAL_ROLLOUTS, seed=rng.getrandbits(32))
+        return pilot(game)
+    return policy
@@ -0,0 +1,390 @@
+"""Vectorized batch simulator: steps many independent Pac-Man games at once.
+
+Every game lives in struct-of-arrays form (one NumPy array per field, with the
+game index as the first axis), so a single BatchGame.step() advances all of them
+with the same movement, ghost targeting, pellet and collision rules as
+pacman_clone.Game.update.
+"""
+import sys, time
+
+import numpy as np
+
+from pacman_clone import (
+    CELL_SIZE, FRAME_MS, DIRECTIONS, UP, LEFT, RIGHT,
+    GAME_STATE_PLAYING, GAME_STATE_GAME_OVER, GAME_STATE_LEVEL_COMPLETE,
+    DEFAULT_LEVEL, MAX_DISTANCE_TABLE_CELLS, get_nav_graph, DistanceTable,
+)
+from levels import GHOST_TYPES, CELL_PELLET, CELL_POWER_PELLET, load_level
+
+# Direction indices follow DIRECTIONS, with one extra index for "not moving"
+STOP = len(DIRECTIONS)
+NO_ACTION = -1
+CHOOSE = -1
+DX = np.array([d[0] for d in DIRECTIONS] + [0])
+DY = np.array([d[1] for d in DIRECTIONS] + [0])
+DIRECTION_INDEX = np.arange(STOP, dtype=np.int32)
+OPPOSITE = np.array([DIRECTIONS.index((-dx, -dy)) for dx, dy in DIRECTIONS] + [STOP])
+UP_INDEX, LEFT_INDEX, RIGHT_INDEX = DIRECTIONS.index(UP), DIRECTIONS.index(LEFT), DIRECTIONS.index(RIGHT)
+
+# Ghosts in update order: blinky, pinky, inky, clyde
+BLINKY, PINKY, INKY, CLYDE = range(4)
+NUM_GHOSTS = 4
+GHOST_INDEX = np.arange(NUM_GHOSTS)
+
+SCATTER, CHASE = 0, 1
+MODE_DURATION_SCATTER = 7000
+MODE_DURATION_CHASE = 20000
+FRIGHT_DURATION = 7000
+
+PACMAN_SPEED = 0.1
+GHOST_SPEED = 0.1
+FRIGHTENED_SPEED = 0.05
+EATEN_SPEED = 0.2
+
+
+def _center(cell):
+    return cell * CELL_SIZE + CELL_SIZE // 2
+
+
+def _step(speed, scale):
+    """Pixels moved in a tick, computed exactly as Entity.move_towards_center does."""
+    step = speed * CELL_SIZE
+    return step if scale is None else step * scale
+
+
+class BatchGame:
+    """N independent games stored as NumPy arrays and stepped together."""
+
+    def __init__(self, num_games, level=None, seed=None):
+        self.n = num_games
+        self.rng = np.random.default_rng(seed)
+        self.index = np.arange(num_games)
+
+        if level is None:
+            level = load_level(DEFAULT_LEVEL)
+        maze_map = level.maze_map
+        self.rows, self.cols = level.rows, level.cols
+        self.pac_spawn = level.pacman_spawn
+        self.ghost_house = level.ghost_house
+        self.ghost_spawns = np.array([level.ghost_spawns[ghost] for ghost in GHOST_TYPES])
+        self.ghost_scatter = np.array([level.ghost_scatter[ghost] for ghost in GHOST_TYPES])
+        # Walkable cells padded by one wall cell on every side, so neighbour
+        # lookups never need a bounds check.
+        walkable = np.zeros((self.rows + 2, self.cols + 2), dtype=bool)
+        for r, row in enumerate(maze_map):
+            for c, val in enumerate(row):
+                walkable[r + 1, c + 1] = val != 1
+        self.walkable = walkable.ravel()
+        # Steering tables per padded cell and arrival direction (STOP when
+        # standing still), taken from the maze's NavGraph: the exits a ghost
+        # may take, and that exit when it is the only choice.
+        nav = get_nav_graph(maze_map)
+        cells = (self.rows + 2) * (self.cols + 2)
+        self.exits = np.zeros((cells, STOP), dtype=bool)
+        self.choice_mask = np.zeros((cells, STOP + 1, STOP), dtype=bool)
+        self.forced = np.full((cells, STOP + 1), STOP, dtype=np.int8)
+        for r in range(self.rows):
+            for c in range(self.cols):
+                cell = self._cell(r, c)
+                for d in nav.exit_dirs[r][c]:
+                    self.exits[cell, DIRECTIONS.index(d)] = True
+                for arrival, options in enumerate(nav.choices[r][c]):
+                    for d in options:
+                        self.choice_mask[cell, arrival, DIRECTIONS.index(d)] = True
+                    if len(options) > 1:
+                        self.forced[cell, arrival] = CHOOSE
+                    elif options:
+                        self.forced[cell, arrival] = DIRECTIONS.index(options[0])
+        # Maze distances for targeting and collisions, from the cached DistanceTable
+        distances = nav.distances
+        if not isinstance(distances, DistanceTable):
+            raise ValueError(f"maze '{level.name}' is too large for batch simulation "
+                             f"({level.rows}x{level.cols}; the distance table needs {MAX_DISTANCE_TABLE_CELLS} walkable cells or fewer)")
+        self.distance_index = np.full(cells, -1, dtype=np.int32)
+        for i, (r, c) in enumerate(distances.cells):
+            self.distance_index[self._cell(r, c)] = i
+        self.distance_matrix = np.frombuffer(distances.table, dtype=np.uint16).reshape(distances.n, distances.n)
+        # Same per-cell layout as the scalar game's PelletStore
+        grid = np.frombuffer(level.pellet_grid, dtype=np.uint8)
+        self.pellet_template = grid == CELL_PELLET
+        self.power_template = grid == CELL_POWER_PELLET
+
+        n, g = num_games, NUM_GHOSTS
+        self.pac_r = np.zeros(n, dtype=np.int32)
+        self.pac_c = np.zeros(n, dtype=np.int32)
+        self.pac_x = np.zeros(n)
+        self.pac_y = np.zeros(n)
+        self.pac_dir = np.full(n, STOP, dtype=np.int8)
+        self.pac_queued = np.full(n, STOP, dtype=np.int8)
+        self.ghost_r = np.zeros((n, g), dtype=np.int32)
+        self.ghost_c = np.zeros((n, g), dtype=np.int32)
+        self.ghost_x = np.zeros((n, g))
+        self.ghost_y = np.zeros((n, g))
+        self.ghost_dir = np.full((n, g), STOP, dtype=np.int8)
+        self.ghost_mode = np.zeros((n, g), dtype=np.int8)
+        self.mode_timer = np.zeros((n, g))
+        self.frightened = np.zeros((n, g), dtype=bool)
+        self.eaten = np.zeros((n, g), dtype=bool)
+        self.pellets = np.zeros((n, self.rows * self.cols), dtype=bool)
+        self.power_pellets = np.zeros((n, self.rows * self.cols), dtype=bool)
+        self.pellets_left = np.zeros(n, dtype=np.int32)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lives = np.zeros(n, dtype=np.int32)
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.fright_mode = np.zeros(n, dtype=bool)
+        self.fright_timer = np.zeros(n)
+        self.game_state = np.zeros(n, dtype=np.int8)
+        self.reset()
+
+    # --- Resetting ---
+    def reset(self, mask=None):
+        """Starts new games for the games selected by mask (all games if None)."""
+        mask = np.ones(self.n, dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+        self.pellets[mask] = self.pellet_template
+        self.power_pellets[mask] = self.power_template
+        self.pellets_left[mask] = self.pellet_template.sum() + self.power_template.sum()
+        self.score[mask] = 0
+        self.lives[mask] = 3
+        self.ticks[mask] = 0
+        self.fright_mode[mask] = False
+        self.fright_timer[mask] = 0
+        self.game_state[mask] = GAME_STATE_PLAYING
+        self._reset_positions(mask, random_ghost_dirs=False)
+
+    def _reset_positions(self, mask, random_ghost_dirs=True):
+        self.pac_r[mask], self.pac_c[mask] = self.pac_spawn
+        self.pac_x[mask], self.pac_y[mask] = _center(self.pac_spawn[1]), _center(self.pac_spawn[0])
+        self.pac_dir[mask] = STOP
+        self.pac_queued[mask] = STOP
+        self.ghost_r[mask], self.ghost_c[mask] = self.ghost_spawns[:, 0], self.ghost_spawns[:, 1]
+        self.ghost_x[mask], self.ghost_y[mask] = _center(self.ghost_spawns[:, 1]), _center(self.ghost_spawns[:, 0])
+        if random_ghost_dirs:
+            self.ghost_dir[mask] = self.rng.integers(0, STOP, size=(int(np.count_nonzero(mask)), NUM_GHOSTS))
+        else:
+            self.ghost_dir[mask] = STOP
+        self.frightened[mask] = False
+        self.eaten[mask] = False
+        self.ghost_mode[mask] = SCATTER
+        self.mode_timer[mask] = 0
+
+    # --- Movement ---
+    def _cell(self, r, c):
+        return (r + 1) * (self.cols + 2) + c + 1
+
+    def _maze_distance(self, r1, c1, r2, c2):
+        """Vectorized DistanceTable.distance, with the same Manhattan fallback."""
+        manhattan = np.abs(r1 - r2) + np.abs(c1 - c2)
+        i, j = self._distance_index_of(r1, c1), self._distance_index_of(r2, c2)
+        known = (i >= 0) & (j >= 0)
+        dist = self.distance_matrix[np.where(known, i, 0), np.where(known, j, 0)]
+        return np.where(known & (dist != DistanceTable.UNREACHABLE), dist, manhattan)
+
+    def _distance_index_of(self, r, c):
+        inside = (r >= 0) & (r < self.rows) & (c >= 0) & (c < self.cols)
+        return np.where(inside, self.distance_index[self._cell(np.clip(r, 0, self.rows - 1), np.clip(c, 0, self.cols - 1))], -1)
+
+    def _advance(self, r, c, x, y, direction, step):
+        """Vectorized Entity.update_position; returns the new (r, c, x, y, direction)."""
+        target_x = _center(c)
+        target_y = _center(r)
+        x = np.where(x < target_x, np.minimum(x + step, target_x), np.maximum(x - step, target_x))
+        y = np.where(y < target_y, np.minimum(y + step, target_y), np.maximum(y - step, target_y))
+        at_center = (x == target_x) & (y == target_y)
+        next_r = r + DY[direction]
+        next_c = c + DX[direction]
+        movable = self.walkable[self._cell(next_r, next_c)]
+        step_on = at_center & movable
+        r = np.where(step_on, next_r, r)
+        c = np.where(step_on, next_c, c)
+        direction = np.where(at_center & ~movable, STOP, direction)
+        return r, c, x, y, direction
+
+    def _update_pac_man(self, sel, scale):
+        r, c, x, y = self.pac_r[sel], self.pac_c[sel], self.pac_x[sel], self.pac_y[sel]
+        direction, queued = self.pac_dir[sel], self.pac_queued[sel]
+
+        # Side tunnel teleportation
+        wrap_left = (c == 0) & (direction == LEFT_INDEX)
+        wrap_right = (c == self.cols - 1) & (direction == RIGHT_INDEX)
+        c = np.where(wrap_left, self.cols - 1, np.where(wrap_right, 0, c))
+        wrapped = wrap_left | wrap_right
+        x = np.where(wrapped, _center(c), x)
+        y = np.where(wrapped, _center(r), y)
+
+        turn = (queued != STOP) & self.walkable[self._cell(r + DY[queued], c + DX[queued])]
+        direction = np.where(turn, queued, direction)
+        self.pac_queued[sel] = np.where(turn, STOP, queued)
+
+        r, c, x, y, direction = self._advance(r, c, x, y, direction, _step(PACMAN_SPEED, scale))
+        self.pac_r[sel], self.pac_c[sel], self.pac_x[sel], self.pac_y[sel], self.pac_dir[sel] = r, c, x, y, direction
+
+    def _ghost_targets(self, games, ghost, r, c, mode, frightened, eaten, blinky_r, blinky_c):
+        """Vectorized Ghost.get_target_tile for ghost[i] of game games[i], standing on (r[i], c[i])."""
+        pr, pc, pac_dir = self.pac_r[games], self.pac_c[games], self.pac_dir[games]
+        # Ghost.get_target_tile unpacks Pac-Man's (dx, dy) direction as (pdr, pdc)
+        pdr, pdc = DX[pac_dir], DY[pac_dir]
+        far = self._maze_distance(r, c, pr, pc) >= 8
+        kinds = [ghost == BLINKY, ghost == PINKY, ghost == INKY]
+        target_r = np.select(kinds, [pr, pr + 4 * pdr, 2 * (pr + 2 * pdr) - blinky_r], np.where(far, pr, self.ghost_scatter[CLYDE, 0]))
+        target_c = np.select(kinds, [pc, pc + 4 * pdc - 4 * (pac_dir == UP_INDEX), 2 * (pc + 2 * pdc) - blinky_c], np.where(far, pc, self.ghost_scatter[CLYDE, 1]))
+
+        scatter = mode == SCATTER
+        target_r = np.where(eaten, self.ghost_house[0], np.where(frightened, r, np.where(scatter, self.ghost_scatter[ghost, 0], target_r)))
+        target_c = np.where(eaten, self.ghost_house[1], np.where(frightened, c, np.where(scatter, self.ghost_scatter[ghost, 1], target_c)))
+        return target_r, target_c
+
+    def _choose_at_junctions(self, games, ghost, r, c, direction, mode, frightened, eaten, blinky_r, blinky_c):
+        """Vectorized Ghost.choose_direction for ghosts standing on a junction."""
+        cell = self._cell(r, c)
+        random_order = frightened | eaten
+        allowed = np.where(random_order[:, None], self.exits[cell], self.choice_mask[cell, direction])
+        target_r, target_c = self._ghost_targets(games, ghost, r, c, mode, frightened, eaten, blinky_r, blinky_c)
+        # Distance to the target; ties go to DIRECTIONS order, or to a random
+        # order for frightened and eaten ghosts. Frightened ghosts target their
+        # own tile, so every exit ties and the pick is uniform.
+        dist = self._maze_distance(r[:, None] + DY[:STOP], c[:, None] + DX[:STOP], target_r[:, None], target_c[:, None])
+        tie_break = np.where(random_order[:, None], self.rng.integers(0, 64, size=dist.shape, dtype=np.int32), DIRECTION_INDEX)
+        cost = np.where(allowed, dist * 64 + tie_break, np.iinfo(np.int32).max)
+        return cost.argmin(axis=1)
+
+    def _update_ghosts(self, sel, dt, scale):
+        mode, timer = self.ghost_mode[sel], self.mode_timer[sel] + dt
+        frightened, eaten = self.frightened[sel], self.eaten[sel]
+        normal = ~frightened & ~eaten
+        switch = normal & (((mode == SCATTER) & (timer >= MODE_DURATION_SCATTER)) | ((mode == CHASE) & (timer >= MODE_DURATION_CHASE)))
+
+        r, c = self.ghost_r[sel], self.ghost_c[sel]
+        home = eaten & (r == self.ghost_spawns[:, 0]) & (c == self.ghost_spawns[:, 1])
+        eaten = eaten & ~home
+        mode = np.where(home, SCATTER, np.where(switch, 1 - mode, mode))
+        timer = np.where(home | switch, 0, timer)
+        self.ghost_mode[sel], self.mode_timer[sel], self.eaten[sel] = mode, timer, eaten
+
+        step = np.where(eaten, _step(EATEN_SPEED, scale), np.where(frightened, _step(FRIGHTENED_SPEED, scale), _step(GHOST_SPEED, scale)))
+        x, y = self.ghost_x[sel], self.ghost_y[sel]
+        target_x, target_y = _center(c), _center(r)
+        x = np.where(x < target_x, np.minimum(x + step, target_x), np.maximum(x - step, target_x))
+        y = np.where(y < target_y, np.minimum(y + step, target_y), np.maximum(y - step, target_y))
+        self.ghost_x[sel], self.ghost_y[sel] = x, y
+
+        # Only ghosts that reached a tile center this tick steer and step on
+        gi, gj = np.nonzero((x == target_x) & (y == target_y))
+        if not len(gi):
+            return
+        r, c, direction = r[gi, gj], c[gi, gj], self.ghost_dir[sel][gi, gj]
+        new_dir = self.forced[self._cell(r, c), direction]
+        junction = np.nonzero(new_dir == CHOOSE)[0]
+        if len(junction):
+            j, games = gi[junction], self.index[sel][gi[junction]]
+            new_dir[junction] = self._choose_at_junctions(
+                games, gj[junction], r[junction], c[junction], direction[junction],
+                mode[j, gj[junction]], frightened[j, gj[junction]], eaten[j, gj[junction]],
+                self.ghost_r[games, BLINKY], self.ghost_c[games, BLINKY])
+
+        next_r, next_c = r + DY[new_dir], c + DX[new_dir]
+        movable = self.walkable[self._cell(next_r, next_c)]
+        games = self.index[sel][gi]
+        self.ghost_r[games, gj] = np.where(movable, next_r, r)
+        self.ghost_c[games, gj] = np.where(movable, next_c, c)
+        self.ghost_dir[games, gj] = np.where(movable, new_dir, STOP)
+
+    # --- Stepping ---
+    def step(self, actions=None, dt=FRAME_MS):
+        """Advances every game by one tick of dt ms, moving entities as far as Game.update would.
+
+        actions holds one entry per game: an index into DIRECTIONS to queue for
+        Pac-Man, or NO_ACTION. Returns (rewards, done), the score gained this
+        tick and whether each game has ended.
+        """
+        if actions is not None:
+            actions = np.asarray(actions)
+            np.copyto(self.pac_queued, actions, where=actions != NO_ACTION, casting='unsafe')
+
+        start_score = self.score.copy()
+        playing = self.game_state == GAME_STATE_PLAYING
+        if playing.all():
+            self._step_playing(slice(None), dt)
+        elif playing.any():
+            self._step_playing(self.index[playing], dt)
+        return self.score - start_score, self.game_state != GAME_STATE_PLAYING
+
+    def _step_playing(self, sel, dt):
+        """Steps the playing games selected by sel, a slice or an index array."""
+        games = self.index[sel]
+        self.ticks[sel] += 1
+        # Speeds are per 60 Hz frame, as in Entity.move_towards_center
+        scale = None if dt == FRAME_MS else dt / FRAME_MS
+        self._update_pac_man(sel, scale)
+        cell = self.pac_r[sel] * self.cols + self.pac_c[sel]
+
+        ate = self.pellets[games, cell]
+        self.pellets[games[ate], cell[ate]] = False
+        ate_power = self.power_pellets[games, cell]
+        powered = games[ate_power]
+        self.power_pellets[powered, cell[ate_power]] = False
+        self.score[sel] += 10 * ate + 50 * ate_power
+        self.pellets_left[sel] -= ate | ate_power
+        if len(powered):
+            self.fright_mode[powered] = True
+            self.fright_timer[powered] = FRIGHT_DURATION
+            scare = ~self.eaten[powered]
+            self.frightened[powered] |= scare
+            self.ghost_dir[powered] = np.where(scare, OPPOSITE[self.ghost_dir[powered]], self.ghost_dir[powered])
+
+        timing = games[self.fright_mode[sel]]
+        if len(timing):
+            self.fright_timer[timing] -= dt
+            expired = timing[self.fright_timer[timing] <= 0]
+            self.fright_mode[expired] = False
+            self.frightened[expired] = False
+
+        self._update_ghosts(sel, dt, scale)
+        # Maze distance < 1.5: the same or a neighbouring cell, side tunnels included
+        ghost_r, ghost_c, pac_r, pac_c = self.ghost_r[sel], self.ghost_c[sel], self.pac_r[sel, None], self.pac_c[sel, None]
+        col_gap = np.abs(ghost_c - pac_c)
+        hit = (np.abs(ghost_r - pac_r) + col_gap < 1.5) | ((ghost_r == pac_r) & (col_gap == self.cols - 1))
+        frightened, eaten = self.frightened[sel], self.eaten[sel]
+        # Game.update stops checking ghosts at the first one that catches Pac-Man
+        kills = hit & ~frightened & ~eaten
+        killed = kills.any(axis=1)
+        first_kill = np.where(killed, kills.argmax(axis=1), NUM_GHOSTS)
+        caught_game, caught_ghost = np.nonzero(hit & frightened & ~eaten & (GHOST_INDEX < first_kill[:, None]))
+        if len(caught_game):
+            caught_game = games[caught_game]
+            np.add.at(self.score, caught_game, 200)
+            self.eaten[caught_game, caught_ghost] = True
+            self.frightened[caught_game, caught_ghost] = False
+            self.ghost_r[caught_game, caught_ghost] = self.ghost_spawns[caught_ghost, 0]
+            self.ghost_c[caught_game, caught_ghost] = self.ghost_spawns[caught_ghost, 1]
+            self.ghost_x[caught_game, caught_ghost] = _center(self.ghost_spawns[caught_ghost, 1])
+            self.ghost_y[caught_game, caught_ghost] = _center(self.ghost_spawns[caught_ghost, 0])
+            self.ghost_dir[caught_game, caught_ghost] = STOP
+
+        died = games[killed]
+        if len(died):
+            self.lives[died] -= 1
+            died_mask = np.zeros(self.n, dtype=bool)
+            died_mask[died] = True
+            self._reset_positions(died_mask)
+            self.game_state[died[self.lives[died] == 0]] = GAME_STATE_GAME_OVER
+
+        self.game_state[games[self.pellets_left[sel] == 0]] = GAME_STATE_LEVEL_COMPLETE
+
+
+def random_actions(batch):
+    """Picks a new random direction for every Pac-Man that has stopped."""
+    actions = batch.rng.integers(0, len(DIRECTIONS), size=batch.n)
+    return np.where(batch.pac_dir == STOP, actions, NO_ACTION)
+
+
+if __name__ == "__main__":
+    num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    num_steps = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    batch = BatchGame(num_games, seed=0)
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        _, done = batch.step(random_actions(batch))
+        if done.any():
+            batch.reset(done)
+    elapsed = time.perf_counter() - start
+    print(f"{num_games} games x {num_steps} steps in {elapsed:.2f}s ({num_games * num_steps / elapsed:,.0f} game-steps/sec)")
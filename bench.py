@@ -0,0 +1,269 @@
+"""Benchmarks for the Game.update and Game.draw hot paths.
+
+Runs scripted scenarios on a headless display (SDL's dummy video driver) and
+times every phase of a tick and a frame. Results are printed and saved as
+JSON so runs can be compared to catch performance regressions:
+
+    python bench.py --out results.json
+    python bench.py --compare results.json
+"""
+import os, sys, json, time, random, platform, argparse
+from collections import defaultdict
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import pacman_clone
+from pacman_clone import Game, Renderer, PacMan, Ghost, DIRECTIONS, DEFAULT_LEVEL, GHOST_COLORS
+from levels import GHOST_TYPES, load_level
+from mazegen import generate_maze_text
+
+UPDATE_PHASES = ["pac_man", "ghost_ai", "collisions", "update_total"]
+DRAW_PHASES = ["maze", "entities", "hud", "flip", "draw_total"]
+
+
+# --- Scenarios ---
+# Each scenario sets up a freshly started game and is then called again
+# before every tick to keep the game in the state being measured.
+def early_game(game, setup):
+    pass
+
+def fright_mode(game, setup):
+    if setup:
+        game.fright_duration = float('inf')
+        game.activate_fright_mode()
+    for ghost in game.ghosts:
+        if not ghost.frightened and not ghost.eaten:
+            ghost.set_frightened(True)
+
+def eaten_ghosts(game, setup):
+    for ghost in game.ghosts:
+        if not ghost.eaten:
+            ghost.set_eaten(True)
+
+ENDGAME_PELLETS = set(random.Random(0).sample(sorted(load_level(DEFAULT_LEVEL).pellets), 5))
+
+def endgame(game, setup):
+    if setup or not game.pellets:
+        game.pellets.clear()
+        for r, c in ENDGAME_PELLETS:
+            game.pellets.place(r, c)
+
+# Hundreds of ghosts and a few extra Pac-Men scattered over the maze. The
+# ghosts stay frightened, so collisions send them home instead of resetting
+# everyone, and the extra Pac-Men wander at random.
+STRESS_GHOSTS = 300
+STRESS_PAC_MEN = 4
+STRESS_RNG = random.Random()
+
+def stress(game, setup):
+    if setup:
+        STRESS_RNG.seed(0)
+        level = game.level
+        cells = STRESS_RNG.sample(sorted(level.pellets), STRESS_GHOSTS + STRESS_PAC_MEN - 1)
+        for i, cell in enumerate(cells[:STRESS_GHOSTS]):
+            ghost_type = GHOST_TYPES[i % len(GHOST_TYPES)]
+            game.add_ghost(Ghost(cell, GHOST_COLORS[ghost_type], ghost_type, level.ghost_scatter[ghost_type],
+                                 level.ghost_house, game.rng))
+        for cell in cells[STRESS_GHOSTS:]:
+            game.add_pac_man(PacMan(cell))
+    fright_mode(game, setup)
+    for pac_man in game.pac_men[1:]:
+        if pac_man.direction == (0, 0) or STRESS_RNG.random() < 0.02:
+            pac_man.set_queued_direction(*STRESS_RNG.choice(DIRECTIONS))
+
+# The early game on a generated 1001x1001 maze, to check that update and draw
+# times do not grow with the maze. The maze is generated once and cached.
+ARENA_SIZE = 1001
+
+def arena(game, setup):
+    pass
+
+def arena_level():
+    path = os.path.join(pacman_clone.CACHE_DIR, f"arena-{ARENA_SIZE}x{ARENA_SIZE}.txt")
+    if not os.path.exists(path):
+        os.makedirs(pacman_clone.CACHE_DIR, exist_ok=True)
+        with open(path, "w") as f:
+            f.write(generate_maze_text(ARENA_SIZE, ARENA_SIZE, seed=0))
+    return load_level(path)
+
+SCENARIOS = {
+    "early_game": early_game,
+    "fright_mode": fright_mode,
+    "eaten_ghosts": eaten_ghosts,
+    "endgame": endgame,
+    "stress": stress,
+    "arena": arena,
+}
+# Scenarios played on a maze other than the default
+SCENARIO_LEVELS = {
+    "arena": arena_level,
+}
+
+
+# --- Timing ---
+class PhaseTimer:
+    """Accumulates the time spent in wrapped methods, one sample per tick.
+
+    Methods are wrapped on an instance, or on a class for instances without
+    a __dict__ (entities); unwrap() puts the originals back.
+    """
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.pending = defaultdict(int)
+        self.wrapped = []
+
+    def wrap(self, obj, method_name, phase):
+        original = getattr(obj, method_name)
+        self.wrapped.append((obj, method_name, vars(obj).get(method_name)))
+        pending = self.pending
+        def timed(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                pending[phase] += time.perf_counter_ns() - start
+        setattr(obj, method_name, timed)
+
+    def unwrap(self):
+        for obj, method_name, own in reversed(self.wrapped):
+            if own is None:
+                delattr(obj, method_name)
+            else:
+                setattr(obj, method_name, own)
+        self.wrapped.clear()
+
+    def add(self, phase, ns):
+        self.pending[phase] += ns
+
+    def end_sample(self, phases):
+        for phase in phases:
+            self.samples[phase].append(self.pending.pop(phase, 0))
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(samples):
+    values = sorted(samples)
+    mean = sum(values) / len(values)
+    return {
+        "mean_us": mean / 1000,
+        "p50_us": percentile(values, 0.50) / 1000,
+        "p90_us": percentile(values, 0.90) / 1000,
+        "p99_us": percentile(values, 0.99) / 1000,
+        "max_us": values[-1] / 1000,
+    }
+
+
+def run_scenario(setup_fn, ticks, warmup, seed, level=None):
+    game = Game(headless=True, seed=seed, level=level)
+    game.start_game()
+    game.lives = 10 ** 6
+    setup_fn(game, True)
+    game.renderer = Renderer()
+
+    timer = PhaseTimer()
+    timer.wrap(game, "update_pac_man", "pac_man")
+    timer.wrap(game, "handle_collision", "collisions")
+    timer.wrap(Ghost, "update", "ghost_ai")
+    timer.wrap(game.renderer, "draw_pellets", "maze")
+    timer.wrap(game.renderer, "redraw", "maze")
+    timer.wrap(game.renderer, "scroll", "maze")
+    timer.wrap(game.renderer, "draw_entities", "entities")
+    timer.wrap(game.renderer, "draw_hud", "hud")
+    timer.wrap(game.renderer, "present", "flip")
+
+    rng = random.Random(seed)
+    for tick in range(warmup + ticks):
+        setup_fn(game, False)
+        if game.pac_man.direction == (0, 0) or rng.random() < 0.02:
+            game.pac_man.set_queued_direction(*rng.choice(DIRECTIONS))
+
+        start = time.perf_counter_ns()
+        game.update(pacman_clone.FRAME_MS)
+        timer.add("update_total", time.perf_counter_ns() - start)
+        start = time.perf_counter_ns()
+        game.draw(pacman_clone.SCREEN)
+        timer.add("draw_total", time.perf_counter_ns() - start)
+
+        if tick < warmup:
+            timer.pending.clear()
+        else:
+            timer.end_sample(UPDATE_PHASES + DRAW_PHASES)
+    timer.unwrap()
+
+    phases = {phase: summarize(timer.samples[phase]) for phase in UPDATE_PHASES + DRAW_PHASES}
+    return {
+        "ticks_per_sec": 1e6 / phases["update_total"]["mean_us"],
+        "frames_per_sec": 1e6 / phases["draw_total"]["mean_us"],
+        "phases": phases,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Prints per-scenario throughput changes; returns True if anything got slower by more than threshold."""
+    regressed = False
+    for name, result in results["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        for metric in ("ticks_per_sec", "frames_per_sec"):
+            change = result[metric] / old[metric] - 1
+            flag = ""
+            if change < -threshold:
+                flag = "  REGRESSION"
+                regressed = True
+            print(f"{name:14} {metric:15} {old[metric]:10.0f} -> {result[metric]:10.0f} ({change:+.1%}){flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Pac-Man update and draw hot paths.")
+    parser.add_argument("--ticks", type=int, default=2000, help="measured ticks per scenario")
+    parser.add_argument("--warmup", type=int, default=60, help="unmeasured ticks before measuring")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only these scenarios")
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", help="compare against a previous results file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown that counts as a regression (default 0.10)")
+    args = parser.parse_args()
+
+    pacman_clone.init_display()
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "video_driver": pygame.display.get_driver(),
+            "ticks": args.ticks,
+            "seed": args.seed,
+        },
+        "scenarios": {},
+    }
+    for name in args.scenario or SCENARIOS:
+        level = SCENARIO_LEVELS[name]() if name in SCENARIO_LEVELS else None
+        result = run_scenario(SCENARIOS[name], args.ticks, args.warmup, args.seed, level)
+        results["scenarios"][name] = result
+        print(f"{name}: {result['ticks_per_sec']:.0f} ticks/sec, {result['frames_per_sec']:.0f} frames/sec")
+        for phase, stats in result["phases"].items():
+            print(f"  {phase:13} mean {stats['mean_us']:8.1f}us  p50 {stats['p50_us']:8.1f}us  "
+                  f"p90 {stats['p90_us']:8.1f}us  p99 {stats['p99_us']:8.1f}us  max {stats['max_us']:8.1f}us")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    regressed = False
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(results, json.load(f), args.threshold)
+    pygame.quit()
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
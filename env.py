@@ -0,0 +1,166 @@
+"""Gym-style environment around pacman_clone.Game, for training agents.
+
+    env = PacManEnv(frame_skip=4, seed=0)
+    obs, info = env.reset()
+    while True:
+        obs, reward, terminated, truncated, info = env.step(policy(obs))
+        if terminated or truncated:
+            obs, info = env.reset()
+
+reset() and step() follow the Gymnasium API, without depending on it. An
+action is an index into DIRECTIONS to queue for Pac-Man, or NO_ACTION; each
+step repeats it for frame_skip ticks and the reward is the score gained.
+An episode terminates on game over or a cleared maze and is truncated after
+max_ticks ticks, if given.
+
+Observations are uint8 planes of shape (len(CHANNELS), rows, cols), one per
+entry of CHANNELS. They are kept up to date incrementally (only the cells
+that changed are written) and returned as a read-only view of the same array
+every step, so copy an observation to keep it. With pixel_size=(width, height)
+the observation is a dict holding the planes and a (height, width, 3) RGB
+image of the rendered game, scaled down, likewise reused between steps.
+Requires NumPy; pixel observations also need Pygame and draw off-screen.
+"""
+import os
+
+import numpy as np
+
+import pacman_clone
+from pacman_clone import (
+    Game, Renderer, DIRECTIONS, FRAME_MS, WIDTH, HEIGHT,
+    GAME_STATE_PLAYING, GAME_STATE_GAME_OVER, GAME_STATE_LEVEL_COMPLETE,
+)
+from levels import CELL_PELLET, CELL_POWER_PELLET
+
+NO_ACTION = len(DIRECTIONS)
+NUM_ACTIONS = len(DIRECTIONS) + 1
+
+CHANNELS = ("walls", "pellets", "power_pellets", "pac_man", "blinky", "pinky", "inky", "clyde", "frightened", "eaten")
+WALLS, PELLETS, POWER_PELLETS, PAC_MAN = range(4)
+GHOST_CHANNELS = range(4, 8)
+# Counts of frightened and of eaten ghosts per cell
+FRIGHTENED, EATEN = 8, 9
+
+
+class PacManEnv:
+    """One Pac-Man game behind reset() and step()."""
+
+    def __init__(self, level=None, frame_skip=4, dt=FRAME_MS, max_ticks=None, pixel_size=None, seed=None):
+        self.game = Game(headless=True, seed=seed, level=level)
+        self.frame_skip = frame_skip
+        self.dt = dt
+        self.max_ticks = max_ticks
+        level = self.game.level
+        self.planes = np.zeros((len(CHANNELS), level.rows, level.cols), dtype=np.uint8)
+        self.planes[WALLS] = np.frombuffer(level.walls, dtype=np.uint8).reshape(level.rows, level.cols)
+        self.planes_view = self.planes.view()
+        self.planes_view.flags.writeable = False
+        self.observation_shape = self.planes.shape
+        self.pellet_generation = None
+        self.erased = 0
+        # Where each entity was last marked: (r, c) for Pac-Man, (r, c, frightened, eaten) per ghost
+        self.pac_man_mark = None
+        self.ghost_marks = [None] * len(GHOST_CHANNELS)
+
+        self.pixel_size = pixel_size
+        if pixel_size is not None:
+            pygame = pacman_clone.pygame
+            if pygame.display.get_surface() is None:
+                os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+                pacman_clone.init_display()
+            self.renderer = Renderer(on_screen=False)
+            self.frame = pygame.Surface((WIDTH, HEIGHT)).convert()
+            self.scaled = pygame.Surface(pixel_size).convert()
+            self.pixels = np.zeros((pixel_size[0], pixel_size[1], 3), dtype=np.uint8)
+            self.pixels_view = self.pixels.transpose(1, 0, 2)
+            self.pixels_view.flags.writeable = False
+
+    def reset(self, seed=None):
+        """Starts a new game; returns (observation, info). A seed makes the game reproducible."""
+        game = self.game
+        if seed is not None:
+            game.seed = seed
+            game.rng.seed(seed)
+        game.start_game()
+        self.pellet_generation = None
+        self.pac_man_mark = None
+        self.ghost_marks = [None] * len(GHOST_CHANNELS)
+        self.planes[PAC_MAN:] = 0
+        return self.observe(), self.info()
+
+    def step(self, action):
+        """Queues action and runs frame_skip ticks; returns (observation, reward, terminated, truncated, info)."""
+        game = self.game
+        if action != NO_ACTION:
+            game.pac_man.set_queued_direction(*DIRECTIONS[action])
+        reward = 0
+        for _ in range(self.frame_skip):
+            reward += game.update(self.dt)
+            if game.game_state != GAME_STATE_PLAYING:
+                break
+        terminated = game.game_state in (GAME_STATE_GAME_OVER, GAME_STATE_LEVEL_COMPLETE)
+        truncated = not terminated and self.max_ticks is not None and game.ticks >= self.max_ticks
+        return self.observe(), reward, terminated, truncated, self.info()
+
+    def info(self):
+        game = self.game
+        return {"score": game.score, "lives": game.lives, "ticks": game.ticks, "game_state": game.game_state}
+
+    # --- Observations ---
+    def observe(self):
+        self.update_pellet_planes()
+        self.update_entity_planes()
+        if self.pixel_size is None:
+            return self.planes_view
+        return {"planes": self.planes_view, "pixels": self.render_pixels()}
+
+    def update_pellet_planes(self):
+        """Clears the pellets eaten since the last step, or rebuilds both planes after a reset."""
+        pellets = self.game.pellets
+        planes = self.planes
+        if pellets.generation != self.pellet_generation:
+            cells = np.frombuffer(pellets.cells, dtype=np.uint8).reshape(planes.shape[1:])
+            np.equal(cells, CELL_PELLET, out=planes[PELLETS], casting='unsafe')
+            np.equal(cells, CELL_POWER_PELLET, out=planes[POWER_PELLETS], casting='unsafe')
+            self.pellet_generation = pellets.generation
+            self.erased = len(pellets.eaten)
+            return
+        eaten = pellets.eaten
+        for r, c in eaten[self.erased:]:
+            planes[PELLETS, r, c] = 0
+            planes[POWER_PELLETS, r, c] = 0
+        self.erased = len(eaten)
+
+    def update_entity_planes(self):
+        """Moves the marks of Pac-Man and the four ghosts that changed cell or state."""
+        planes = self.planes
+        game = self.game
+        mark = (game.pac_man.grid_pos[0], game.pac_man.grid_pos[1])
+        if mark != self.pac_man_mark:
+            if self.pac_man_mark is not None:
+                planes[PAC_MAN][self.pac_man_mark] = 0
+            planes[PAC_MAN][mark] = 1
+            self.pac_man_mark = mark
+        for i, (channel, ghost) in enumerate(zip(GHOST_CHANNELS, game.ghosts)):
+            mark = (ghost.grid_pos[0], ghost.grid_pos[1], ghost.frightened, ghost.eaten)
+            old = self.ghost_marks[i]
+            if mark == old:
+                continue
+            if old is not None:
+                r, c, frightened, eaten = old
+                planes[channel, r, c] = 0
+                planes[FRIGHTENED, r, c] -= frightened
+                planes[EATEN, r, c] -= eaten
+            r, c, frightened, eaten = mark
+            planes[channel, r, c] = 1
+            planes[FRIGHTENED, r, c] += frightened
+            planes[EATEN, r, c] += eaten
+            self.ghost_marks[i] = mark
+
+    def render_pixels(self):
+        """Draws the game off-screen and copies it, scaled down, into the pixel array."""
+        pygame = pacman_clone.pygame
+        self.renderer.draw(self.game, self.frame)
+        pygame.transform.smoothscale(self.frame, self.pixel_size, self.scaled)
+        pygame.pixelcopy.surface_to_array(self.pixels, self.scaled)
+        return self.pixels_view
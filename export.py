@@ -0,0 +1,186 @@
+"""Offline video export: draws a recorded game frame by frame, faster than real time.
+
+    python export.py run.pmr frames/                    # frames/000000.bmp, 000001.bmp, ...
+    python export.py run.pmr frames/ --format png --start 10 --duration 5
+    python export.py run.pmr run.raw --fps 30           # raw video; prints how to encode it
+    python export.py run.pmr - | ffmpeg -f rawvideo -pix_fmt bgr0 -s 672x784 -r 60 -i - run.mp4
+
+The recording is re-run headless (see replay.py) and drawn at a fixed frame
+rate by a Renderer onto an off-screen surface, with entities interpolated
+between ticks as in the game window. Nothing waits on a clock, so the export
+runs as fast as frames can be drawn and written.
+
+Each frame is copied into one of a fixed pool of surfaces of the same pixel
+format, and a writer thread writes them out while the next frames are drawn:
+raw video straight from a buffer view of the surface's pixels, or one image
+file per frame through pygame.image.save (BMP and TGA are fast, PNG is small
+but slow). Drawing waits for a surface to come back when the writer falls
+behind, so memory stays bounded however long the game is.
+"""
+import os, sys, time, queue, argparse, threading
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+# Keep pygame's banner out of a raw video written to stdout
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+import pacman_clone
+from pacman_clone import Game, Renderer, WIDTH, HEIGHT
+from replay import load_replay
+
+DEFAULT_FPS = 60
+POOL_FRAMES = 8
+IMAGE_FORMATS = ("bmp", "tga", "png", "jpg")
+
+
+class FrameWriter:
+    """Passes frames to write(index, surface) on a background thread.
+
+    submit() copies a frame into a free surface from the pool and queues it,
+    waiting while none is free, so at most pool_size frames are held at once.
+    """
+
+    def __init__(self, write, like, pool_size=POOL_FRAMES):
+        self.write = write
+        self.free = queue.Queue()
+        for _ in range(pool_size):
+            self.free.put(pygame.Surface(like.get_size(), 0, like))
+        self.pending = queue.Queue()
+        self.frames = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name="frame-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, frame):
+        surface = self.free.get()
+        if self.error is not None:
+            self.free.put(surface)
+            raise self.error
+        surface.blit(frame, (0, 0))
+        self.pending.put((self.frames, surface))
+        self.frames += 1
+
+    def run(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            index, surface = item
+            # After an error the frames are only recycled, so submit() never blocks for good
+            if self.error is None:
+                try:
+                    self.write(index, surface)
+                except Exception as e:
+                    self.error = e
+            self.free.put(surface)
+
+    def close(self):
+        """Waits for the queued frames to be written; raises what the writer ran into, if anything."""
+        self.pending.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+def raw_writer(stream):
+    def write(index, surface):
+        stream.write(surface.get_view("0"))
+    return write
+
+
+def image_writer(directory, image_format):
+    os.makedirs(directory, exist_ok=True)
+    def write(index, surface):
+        pygame.image.save(surface, os.path.join(directory, f"{index:06d}.{image_format}"))
+    return write
+
+
+def pixel_format(surface):
+    """ffmpeg's name for how the surface lays out a pixel in memory, e.g. "bgr0"."""
+    channels = ["0"] * surface.get_bytesize()
+    for name, mask, shift in zip("rgba", surface.get_masks(), surface.get_shifts()):
+        if mask:
+            channels[shift // 8] = name
+    if sys.byteorder == "big":
+        channels.reverse()
+    return "".join(channels) + ("24" if len(channels) == 3 else "")
+
+
+def export_replay(replay, frame, submit, fps=DEFAULT_FPS, start_s=0.0, duration_s=None):
+    """Re-runs a recording and passes every frame in the time range, drawn onto frame, to submit().
+
+    Ticks before the range are run without drawing. Returns the number of frames.
+    """
+    game = Game(headless=True, seed=replay.seed, level=replay.level)
+    renderer = Renderer(on_screen=False)
+    frame_ms = 1000 / fps
+    start_ms = start_s * 1000
+    end_ms = float("inf") if duration_s is None else start_ms + duration_s * 1000
+    frames = 0
+    frame_at = start_ms
+    now = 0.0
+    for dt, inputs in replay.ticks():
+        # Frames up to the end of this tick show the game between the last tick and now
+        while frame_at < now + dt:
+            if frame_at >= end_ms:
+                return frames
+            renderer.draw(game, frame, (frame_at - now) / dt)
+            submit(frame)
+            frames += 1
+            frame_at = start_ms + frames * frame_ms
+        for code in inputs:
+            game.apply_input(code)
+        game.update(dt, replay.move_dt)
+        now += dt
+    if frame_at < end_ms:
+        renderer.draw(game, frame)
+        submit(frame)
+        frames += 1
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a recorded game as raw video or an image sequence.")
+    parser.add_argument("replay", help="recording made with pacman_clone.py --record")
+    parser.add_argument("output", help="a .raw file or - for raw video on stdout, otherwise a directory for images")
+    parser.add_argument("--format", choices=("raw",) + IMAGE_FORMATS,
+                        help="default: raw for .raw files and stdout, bmp otherwise")
+    parser.add_argument("--fps", type=float, default=DEFAULT_FPS)
+    parser.add_argument("--start", type=float, default=0.0, help="seconds of game time to skip")
+    parser.add_argument("--duration", type=float, help="seconds of game time to export (default: to the end)")
+    parser.add_argument("--pool", type=int, default=POOL_FRAMES, help="frames buffered for the writer")
+    args = parser.parse_args()
+    image_format = args.format or ("raw" if args.output == "-" or args.output.endswith(".raw") else "bmp")
+
+    replay = load_replay(args.replay)
+    pacman_clone.init_display()
+    frame = pygame.Surface((WIDTH, HEIGHT)).convert()
+    stream = None
+    if image_format != "raw":
+        write = image_writer(args.output, image_format)
+    elif args.output == "-":
+        write = raw_writer(sys.stdout.buffer)
+    else:
+        stream = open(args.output, "wb")
+        write = raw_writer(stream)
+
+    writer = FrameWriter(write, frame, args.pool)
+    start = time.perf_counter()
+    try:
+        frames = export_replay(replay, frame, writer.submit, args.fps, args.start, args.duration)
+    finally:
+        writer.close()
+        if stream is not None:
+            stream.close()
+    elapsed = time.perf_counter() - start
+    print(f"{args.output}: {frames} frames in {elapsed:.2f}s ({frames / elapsed:.0f} frames/sec, "
+          f"{frames / args.fps / elapsed:.1f}x real time)", file=sys.stderr)
+    if image_format == "raw" and args.output != "-":
+        print(f"Encode with: ffmpeg -f rawvideo -pix_fmt {pixel_format(frame)} -s {WIDTH}x{HEIGHT} "
+              f"-r {args.fps:g} -i {args.output} out.mp4", file=sys.stderr)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""Maze files: parsing, validation and a compiled, memory-mapped binary form.
+
+A maze file has "key: value" header lines followed by the maze rows (see
+levels/classic.txt):
+
+    name: classic
+    pacman: 21 10            # Pac-Man's spawn, "row col"
+    ghost_house: 14 13       # where eaten ghosts head back to
+    blinky: 11 13            # ghost spawns, likewise pinky, inky and clyde
+    blinky_scatter: 1 23     # scatter targets, may lie outside the maze
+    1111111111111111111111111111
+    1222222222222112222222222221
+    ...
+
+Maze rows use 0 = path, 1 = wall, 2 = pellet and 3 = power pellet. Lines
+starting with # are comments.
+
+load_level() compiles a maze the first time it is loaded and caches the
+result next to the source (classic.txt -> classic.lvl). The compiled file
+holds a header, the spawn and tunnel metadata, a wall grid of one byte per
+cell and one bitset each for pellets and power pellets, all row-major.
+It is memory-mapped rather than read, and loaded levels stay cached in
+memory, so restarting or switching levels costs a stat() call.
+"""
+import os, sys, mmap, struct
+from collections import deque
+
+GHOST_TYPES = ("blinky", "pinky", "inky", "clyde")
+POSITION_KEYS = ("pacman", "ghost_house") + GHOST_TYPES
+TARGET_KEYS = tuple(ghost + "_scatter" for ghost in GHOST_TYPES)
+
+MAGIC = b"PMLV"
+VERSION = 1
+# magic, version, rows, cols, source mtime (ns), source size, name length, tunnel count
+HEADER = struct.Struct("<4sBHHqqBH")
+POSITIONS = struct.Struct("<" + "hh" * (len(POSITION_KEYS) + len(TARGET_KEYS)))
+
+WALL, PATH, PELLET, POWER_PELLET = "1", "0", "2", "3"
+# What a cell holds in Level.pellet_grid
+NO_PELLET, CELL_PELLET, CELL_POWER_PELLET = 0, 1, 2
+
+
+class LevelError(ValueError):
+    """A maze file that cannot be parsed or fails validation."""
+
+
+def bitset_size(rows, cols):
+    return (rows * cols + 7) // 8
+
+
+class Level:
+    """A validated maze.
+
+    walls holds one byte per cell (1 = wall); pellet_bits and power_bits one
+    bit per cell. Cell (r, c) is index r * cols + c in all three.
+    """
+    def __init__(self, name, rows, cols, walls, pellet_bits, power_bits, positions, scatter, tunnel_rows):
+        self.name = name
+        self.rows = rows
+        self.cols = cols
+        self.walls = walls
+        self.pellet_bits = pellet_bits
+        self.power_bits = power_bits
+        self.pacman_spawn = positions["pacman"]
+        self.ghost_house = positions["ghost_house"]
+        self.ghost_spawns = {ghost: positions[ghost] for ghost in GHOST_TYPES}
+        self.ghost_scatter = {ghost: scatter[ghost + "_scatter"] for ghost in GHOST_TYPES}
+        self.tunnel_rows = tunnel_rows
+        self._maze_map = None
+        self._pellets = None
+        self._power_pellets = None
+        self._pellet_grid = None
+
+    def is_wall(self, r, c):
+        return self.walls[r * self.cols + c] == 1
+
+    @property
+    def maze_map(self):
+        """The wall grid as a list of rows of 0/1, built once and shared; do not modify."""
+        if self._maze_map is None:
+            cols = self.cols
+            self._maze_map = [list(self.walls[r * cols:(r + 1) * cols]) for r in range(self.rows)]
+        return self._maze_map
+
+    @property
+    def pellets(self):
+        if self._pellets is None:
+            self._pellets = frozenset(self.bit_cells(self.pellet_bits))
+        return self._pellets
+
+    @property
+    def power_pellets(self):
+        if self._power_pellets is None:
+            self._power_pellets = frozenset(self.bit_cells(self.power_bits))
+        return self._power_pellets
+
+    @property
+    def pellet_grid(self):
+        """One byte per cell: NO_PELLET, CELL_PELLET or CELL_POWER_PELLET."""
+        if self._pellet_grid is None:
+            grid = bytearray(self.rows * self.cols)
+            for i in range(len(grid)):
+                if self.power_bits[i >> 3] >> (i & 7) & 1:
+                    grid[i] = CELL_POWER_PELLET
+                elif self.pellet_bits[i >> 3] >> (i & 7) & 1:
+                    grid[i] = CELL_PELLET
+            self._pellet_grid = bytes(grid)
+        return self._pellet_grid
+
+    def bit_cells(self, bits):
+        cols = self.cols
+        return [divmod(i, cols) for i in range(self.rows * cols) if bits[i >> 3] >> (i & 7) & 1]
+
+
+# --- Parsing and validation ---
+def parse_position(text, key, line_number):
+    try:
+        r, c = (int(value) for value in text.split())
+    except ValueError:
+        raise LevelError(f"line {line_number}: {key} must be 'row col', got {text!r}")
+    return r, c
+
+def parse_level(text, name="level"):
+    """Parses and validates the text of a maze file; returns a Level."""
+    header = {}
+    rows = []
+    for line_number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if ":" in line:
+            if rows:
+                raise LevelError(f"line {line_number}: header line after the maze rows")
+            key, _, value = line.partition(":")
+            key, value = key.strip(), value.strip()
+            if key == "name":
+                header[key] = value
+            elif key in POSITION_KEYS or key in TARGET_KEYS:
+                header[key] = parse_position(value, key, line_number)
+            else:
+                raise LevelError(f"line {line_number}: unknown header key {key!r}")
+            continue
+        bad = set(line) - {WALL, PATH, PELLET, POWER_PELLET}
+        if bad:
+            raise LevelError(f"line {line_number}: unexpected characters {''.join(sorted(bad))!r} in maze row")
+        if rows and len(line) != len(rows[0]):
+            raise LevelError(f"line {line_number}: maze row has {len(line)} cells, expected {len(rows[0])}")
+        rows.append(line)
+
+    if not rows:
+        raise LevelError("no maze rows")
+    missing = [key for key in POSITION_KEYS + TARGET_KEYS if key not in header]
+    if missing:
+        raise LevelError(f"missing header keys: {', '.join(missing)}")
+
+    num_rows, cols = len(rows), len(rows[0])
+    walls = bytearray(num_rows * cols)
+    pellet_bits = bytearray(bitset_size(num_rows, cols))
+    power_bits = bytearray(bitset_size(num_rows, cols))
+    for r, row in enumerate(rows):
+        for c, char in enumerate(row):
+            i = r * cols + c
+            if char == WALL:
+                walls[i] = 1
+            elif char == PELLET:
+                pellet_bits[i >> 3] |= 1 << (i & 7)
+            elif char == POWER_PELLET:
+                power_bits[i >> 3] |= 1 << (i & 7)
+    tunnel_rows = tuple(r for r in range(num_rows) if not walls[r * cols] and not walls[r * cols + cols - 1])
+
+    level = Level(header.get("name", name), num_rows, cols, bytes(walls), bytes(pellet_bits), bytes(power_bits),
+                  header, header, tunnel_rows)
+    validate_level(level)
+    return level
+
+def validate_level(level):
+    """Raises LevelError unless every spawn is an open cell and every pellet and spawn
+    can be reached from Pac-Man's spawn."""
+    rows, cols = level.rows, level.cols
+    positions = {"pacman": level.pacman_spawn, "ghost_house": level.ghost_house, **level.ghost_spawns}
+    for key, (r, c) in positions.items():
+        if not (0 <= r < rows and 0 <= c < cols):
+            raise LevelError(f"{key} position {(r, c)} is outside the {rows}x{cols} maze")
+        if level.is_wall(r, c):
+            raise LevelError(f"{key} position {(r, c)} is a wall")
+    if not any(level.pellet_bits) and not any(level.power_bits):
+        raise LevelError("maze has no pellets")
+
+    tunnels = set(level.tunnel_rows)
+    start = level.pacman_spawn
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        r, c = queue.popleft()
+        neighbours = [(r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)]
+        if r in tunnels and c in (0, cols - 1):
+            neighbours.append((r, cols - 1 - c))
+        for nr, nc in neighbours:
+            if 0 <= nr < rows and 0 <= nc < cols and (nr, nc) not in seen and not level.is_wall(nr, nc):
+                seen.add((nr, nc))
+                queue.append((nr, nc))
+
+    for key, cell in positions.items():
+        if cell not in seen:
+            raise LevelError(f"{key} position {cell} cannot be reached from Pac-Man's spawn")
+    for cell in sorted(level.pellets | level.power_pellets):
+        if cell not in seen:
+            raise LevelError(f"pellet at {cell} cannot be reached from Pac-Man's spawn")
+
+
+# --- Compiled form ---
+def compile_level(level, source_mtime_ns=0, source_size=0):
+    """Serializes a Level to the compiled binary form."""
+    name = level.name.encode()[:255]
+    positions = [level.pacman_spawn, level.ghost_house] + [level.ghost_spawns[g] for g in GHOST_TYPES] \
+        + [level.ghost_scatter[g] for g in GHOST_TYPES]
+    return b"".join([
+        HEADER.pack(MAGIC, VERSION, level.rows, level.cols, source_mtime_ns, source_size, len(name), len(level.tunnel_rows)),
+        POSITIONS.pack(*(value for position in positions for value in position)),
+        struct.pack(f"<{len(level.tunnel_rows)}H", *level.tunnel_rows),
+        name,
+        bytes(level.walls),
+        bytes(level.pellet_bits),
+        bytes(level.power_bits),
+    ])
+
+def read_compiled(buffer):
+    """Builds a Level over a compiled buffer without copying the grid or bitsets.
+
+    Returns (level, source mtime, source size), or None if the buffer is not
+    a whole compiled level of this version.
+    """
+    if len(buffer) < HEADER.size:
+        return None
+    magic, version, rows, cols, mtime_ns, size, name_length, num_tunnels = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION:
+        return None
+    view = memoryview(buffer)
+    offset = HEADER.size
+    if len(buffer) < offset + POSITIONS.size + 2 * num_tunnels + name_length:
+        return None
+    values = POSITIONS.unpack_from(buffer, offset)
+    offset += POSITIONS.size
+    positions = {key: (values[2 * i], values[2 * i + 1]) for i, key in enumerate(POSITION_KEYS + TARGET_KEYS)}
+    tunnel_rows = struct.unpack_from(f"<{num_tunnels}H", buffer, offset)
+    offset += 2 * num_tunnels
+    name = bytes(view[offset:offset + name_length]).decode(errors="replace")
+    offset += name_length
+    cells, bits = rows * cols, bitset_size(rows, cols)
+    if len(buffer) != offset + cells + 2 * bits:
+        return None
+    walls = view[offset:offset + cells]
+    pellet_bits = view[offset + cells:offset + cells + bits]
+    power_bits = view[offset + cells + bits:]
+    return Level(name, rows, cols, walls, pellet_bits, power_bits, positions, positions, tunnel_rows), mtime_ns, size
+
+def compiled_path(path):
+    return os.path.splitext(path)[0] + ".lvl"
+
+_level_cache = {}
+
+def load_level(path):
+    """Loads a maze file, using the in-memory cache or the compiled file next to
+    it while they are newer than the source, and recompiling otherwise."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    cached = _level_cache.get(path)
+    if cached and cached[1:] == (stat.st_mtime_ns, stat.st_size):
+        return cached[0]
+
+    level = None
+    try:
+        with open(compiled_path(path), "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        compiled = read_compiled(buffer)
+        if compiled and compiled[1:] == (stat.st_mtime_ns, stat.st_size):
+            level = compiled[0]
+    except (OSError, ValueError):
+        pass
+
+    if level is None:
+        with open(path) as f:
+            level = parse_level(f.read(), os.path.splitext(os.path.basename(path))[0])
+        try:
+            target = compiled_path(path)
+            with open(target + ".tmp", "wb") as f:
+                f.write(compile_level(level, stat.st_mtime_ns, stat.st_size))
+            os.replace(target + ".tmp", target)
+        except OSError as e:
+            print(f"Warning: Could not cache compiled level. Error: {e}", file=sys.stderr)
+
+    _level_cache[path] = (level, stat.st_mtime_ns, stat.st_size)
+    return level
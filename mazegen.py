@@ -0,0 +1,159 @@
+"""Procedural maze generator for large Pac-Man arenas.
+
+    python mazegen.py 1001 1001 --seed 7 --out levels/arena.txt
+    python pacman_clone.py --level levels/arena.txt
+
+A maze starts as a random spanning tree carved over a lattice of corridor
+cells (every other row and column), so every cell can reach every other.
+It is then braided: each dead end is knocked through to a neighbouring
+corridor and a share of the remaining walls are opened, leaving loops
+everywhere as in the arcade maze. A ghost house with a door sits in the
+middle, side tunnels open at evenly spaced rows, and every corridor cell
+outside the house holds a pellet, with power pellets near the corners and
+scattered across the maze. The output is an ordinary maze file (see
+levels.py), so it is validated and compiled like any other.
+"""
+import sys, random, argparse
+
+from levels import WALL, PATH, PELLET, POWER_PELLET, parse_level
+
+MIN_SIZE = 21
+# Chance of opening a wall between two corridor cells that are already connected
+LOOP_CHANCE = 0.1
+# Maze rows per side tunnel, and corridor cells per power pellet beyond the four corners
+TUNNEL_SPACING = 40
+POWER_PELLET_SPACING = 3000
+
+LATTICE_STEPS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def generate_maze_text(rows, cols, seed=None):
+    """Returns the text of a maze file for a new rows x cols maze."""
+    if rows < MIN_SIZE or cols < MIN_SIZE:
+        raise ValueError(f"mazes must be at least {MIN_SIZE}x{MIN_SIZE}, got {rows}x{cols}")
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    rng = random.Random(seed)
+    wall, path = ord(WALL), ord(PATH)
+    grid = [bytearray(WALL * cols, "ascii") for _ in range(rows)]
+    # Lattice node (i, j) is maze cell (2i + 1, 2j + 1)
+    node_rows, node_cols = (rows - 1) // 2, (cols - 1) // 2
+
+    def neighbours(i, j):
+        return [(i + di, j + dj) for di, dj in LATTICE_STEPS if 0 <= i + di < node_rows and 0 <= j + dj < node_cols]
+
+    def open_between(i, j, ni, nj):
+        grid[i + ni + 1][j + nj + 1] = path
+
+    def is_open(i, j, ni, nj):
+        return grid[i + ni + 1][j + nj + 1] == path
+
+    # Spanning tree by randomized depth-first search
+    visited = bytearray(node_rows * node_cols)
+    start = (rng.randrange(node_rows), rng.randrange(node_cols))
+    visited[start[0] * node_cols + start[1]] = 1
+    grid[2 * start[0] + 1][2 * start[1] + 1] = path
+    stack = [start]
+    while stack:
+        i, j = stack[-1]
+        options = [(ni, nj) for ni, nj in neighbours(i, j) if not visited[ni * node_cols + nj]]
+        if not options:
+            stack.pop()
+            continue
+        ni, nj = rng.choice(options)
+        visited[ni * node_cols + nj] = 1
+        grid[2 * ni + 1][2 * nj + 1] = path
+        open_between(i, j, ni, nj)
+        stack.append((ni, nj))
+
+    # Braiding: no dead ends, and some extra loops
+    for i in range(node_rows):
+        for j in range(node_cols):
+            closed = [(ni, nj) for ni, nj in neighbours(i, j) if not is_open(i, j, ni, nj)]
+            if not closed:
+                continue
+            dead_end = len(closed) == len(neighbours(i, j)) - 1
+            if dead_end or rng.random() < LOOP_CHANCE:
+                open_between(i, j, *rng.choice(closed))
+
+    # Ghost house: a walled box with a door on top, in a cleared area so a
+    # corridor runs all the way round it
+    hr, hc = 2 * (node_rows // 2) + 1, 2 * (node_cols // 2) + 1
+    for r in range(hr - 4, hr + 5):
+        grid[r][hc - 6:hc + 7] = PATH.encode() * 13
+    for r in range(hr - 2, hr + 3):
+        for c in range(hc - 4, hc + 5):
+            if r in (hr - 2, hr + 2) or c in (hc - 4, hc + 4):
+                grid[r][c] = wall
+    grid[hr - 2][hc] = path
+    house = (hr - 2, hr + 2, hc - 4, hc + 4)
+
+    # Side tunnels, from the first and last lattice columns out to the edges
+    last_node_col = 2 * node_cols - 1
+    tunnels = max(1, rows // TUNNEL_SPACING)
+    tunnel_rows = [2 * int((k + 0.5) * node_rows / tunnels) + 1 for k in range(tunnels)]
+    for r in tunnel_rows:
+        grid[r][0] = path
+        for c in range(last_node_col + 1, cols):
+            grid[r][c] = path
+
+    # Pellets on every corridor cell outside the house and the tunnel mouths
+    pacman = (hr + 4, hc)
+    corridor = []
+    for r in range(1, rows - 1):
+        row = grid[r]
+        in_house = house[0] <= r <= house[1]
+        for c in range(1, last_node_col + 1):
+            if row[c] == path and not (in_house and house[2] <= c <= house[3]) and (r, c) != pacman:
+                row[c] = ord(PELLET)
+                corridor.append((r, c))
+    last_node_row = 2 * node_rows - 1
+    power = [(1, 1), (1, last_node_col), (last_node_row, 1), (last_node_row, last_node_col)]
+    power += rng.sample(corridor, len(corridor) // POWER_PELLET_SPACING)
+    for r, c in power:
+        grid[r][c] = ord(POWER_PELLET)
+
+    positions = {
+        "pacman": pacman,
+        "ghost_house": (hr, hc),
+        "blinky": (hr - 3, hc),
+        "pinky": (hr, hc),
+        "inky": (hr, hc - 2),
+        "clyde": (hr, hc + 2),
+        "blinky_scatter": (0, cols - 3),
+        "pinky_scatter": (0, 2),
+        "inky_scatter": (rows - 1, cols - 1),
+        "clyde_scatter": (rows - 1, 0),
+    }
+    header = [f"# python mazegen.py {rows} {cols} --seed {seed}", f"name: arena-{rows}x{cols}-{seed}"]
+    header += [f"{key}: {r} {c}" for key, (r, c) in positions.items()]
+    return "\n".join(header + [row.decode("ascii") for row in grid]) + "\n"
+
+def generate_level(rows, cols, seed=None):
+    """Generates, parses and validates a new maze; returns a levels.Level."""
+    return parse_level(generate_maze_text(rows, cols, seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a large, connected Pac-Man maze file.")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("cols", type=int)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", help="write the maze here instead of to stdout")
+    args = parser.parse_args()
+    try:
+        text = generate_maze_text(args.rows, args.cols, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    level = parse_level(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"{args.out}: {level.rows}x{level.cols}, {len(level.pellets)} pellets, "
+              f"{len(level.power_pellets)} power pellets, {len(level.tunnel_rows)} tunnels", file=sys.stderr)
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,45 @@
-import pygame, sys, random
+import sys, os, random
 import math
+import time
+import hashlib
+import struct
+import threading
+import zlib
+from array import array
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()
+from levels import GHOST_TYPES, NO_PELLET, CELL_PELLET, CELL_POWER_PELLET, load_level
+from profiler import FrameProfiler, ProfilerOverlay
+
+LAUNCH_TIME = time.perf_counter()
+
+# Pygame is only needed for the window, sound and drawing; the game logic
+# runs headless without it.
+try:
+    import pygame
+except ImportError:
+    pygame = None
 
 # --- Constants ---
 CELL_SIZE = 24
+# The window shows a ROWS x COLS view of the maze (which may be any size)
 ROWS, COLS = 31, 28
 WIDTH, HEIGHT = COLS * CELL_SIZE, ROWS * CELL_SIZE + 40
-SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Pac-Man Clone - Cyberpunk Edition")
-CLOCK = pygame.time.Clock()
-FONT = pygame.font.SysFont("Inter", 24)
+FRAME_MS = 1000 / 60
+# The windowed game steps the simulation in fixed ticks, independent of the
+# frame rate; a frame longer than MAX_FRAME_MS is cut short rather than
+# caught up on, so a stall can never snowball into ever-longer frames.
+SIM_TICK_MS = 1000 / 120
+MAX_FRAME_MS = 250
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ASSET_DIR, ".cache")
+
+# Display globals, set up by init_display()
+SCREEN = None
+CLOCK = None
+FONT = None
+
+# Frame-time profiler; disabled (and close to free) unless switched on
+PROFILER = FrameProfiler()
 
 # Colors
 BLACK = (10, 10, 20)
@@ -41,54 +68,89 @@ DOWN = (0, 1)
 LEFT = (-1, 0)
 RIGHT = (1, 0)
 DIRECTIONS = [UP, DOWN, LEFT, RIGHT]
+# Directions by index, with "not moving" last
+DIRECTION_BY_INDEX = DIRECTIONS + [(0, 0)]
+DIRECTION_INDEX = {direction: i for i, direction in enumerate(DIRECTION_BY_INDEX)}
+
+# Player inputs: an index into DIRECTIONS, or INPUT_START
+INPUT_START = len(DIRECTIONS)
 
-# Maze layout from classic Pac-Man (0=path, 1=wall, 2=pellet, 3=power pellet)
-original_layout = [
-    "1111111111111111111111111111",
-    "1222222222222112222222222221",
-    "1211112111112112111112111121",
-    "1310012100012112100012100131",
-    "1211112111112112111112111121",
-    "1222222222222222222222222221",
-    "1211112121111111111212111121",
-    "1222222122222112222212222221",
-    "1111112122222112222212111111",
-    "0000012111112112111112100000",
-    "0000012122222222222212100000",
-    "0000012120000000000212100000",
-    "1111112120111001110212111111",
-    "0000002000100000010002000000",
-    "0000002000000000000002000000",
-    "1111112120100000010212111111",
-    "0000012120111001110212100000",
-    "0000012120000000000212100000",
-    "0000012122222222222212100000",
-    "1111112121111111111212111111",
-    "1222222222222112222222222221",
-    "1211112222222112222222111121",
-    "1322212111112112111112122231",
-    "1111212222222222222222121111",
-    "1111212121111111111212121111",
-    "1222212122222112222212122221",
-    "1222222122222112222212222221",
-    "1211111111112112111111111121",
-    "1222222222222222222222222221",
-    "11111111111111111111111111111",
-]
-
-# Ghost spawn points and scatter targets
-GHOST_HOUSE_CENTER = (14, 13)
-BLINKY_SPAWN = (11, 13)
-PINKY_SPAWN = (14, 13)
-INKY_SPAWN = (14, 11)
-CLYDE_SPAWN = (14, 15)
-
-BLINKY_SCATTER = (1, 23)
-PINKY_SCATTER = (1, 6)
-INKY_SCATTER = (30, 25)
-CLYDE_SCATTER = (30, 3)
+# Mazes live in levels/ (see levels.py for the file format)
+LEVELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+DEFAULT_LEVEL = os.path.join(LEVELS_DIR, "classic.txt")
+GHOST_COLORS = {'blinky': RED, 'pinky': PINK, 'inky': CYAN, 'clyde': ORANGE}
 
 # --- Helper Functions ---
+def init_display():
+    """Opens the game window and loads the HUD font. The mixer is left to
+    Game.load_sounds, which starts it off the main thread."""
+    global SCREEN, CLOCK, FONT
+    pygame.display.init()
+    pygame.font.init()
+    SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Pac-Man Clone - Cyberpunk Edition")
+    CLOCK = pygame.time.Clock()
+    FONT = load_font("Inter", 24)
+
+def load_font(name, size):
+    """Same as pygame.font.SysFont(name, size), but remembers the resolved font file
+    so later launches skip the system font scan."""
+    cache_path = os.path.join(CACHE_DIR, f"font-{name}.txt")
+    try:
+        with open(cache_path) as f:
+            path = f.read()
+        if not path or os.path.exists(path):
+            return pygame.font.Font(path or None, size)
+    except OSError:
+        pass
+    path = pygame.font.match_font(name) or ""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_path, "w") as f:
+            f.write(path)
+    except OSError as e:
+        print(f"Warning: Could not cache font path. Error: {e}", file=sys.stderr)
+    return pygame.font.Font(path or None, size)
+
+# --- Sound ---
+SOUND_FILES = {
+    'startup_sound': "startup_sound.mp3",
+    'pellet_sound': "pellet_sound.mp3",
+    'power_pellet_sound': "power_pellet_sound.mp3",
+    'death_sound': "death_sound.mp3",
+}
+
+def load_sound(filename):
+    """Loads a sound effect, reusing its decoded samples from the cache while the
+    file and the mixer's output format are unchanged."""
+    path = os.path.join(ASSET_DIR, filename)
+    stat = os.stat(path)
+    key = repr((filename, stat.st_mtime_ns, stat.st_size, pygame.mixer.get_init()))
+    cache_path = os.path.join(CACHE_DIR, f"sound-{hashlib.sha1(key.encode()).hexdigest()[:16]}.pcm")
+    try:
+        with open(cache_path, "rb") as f:
+            return pygame.mixer.Sound(buffer=f.read())
+    except OSError:
+        pass
+    sound = pygame.mixer.Sound(path)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_path + ".tmp", "wb") as f:
+            f.write(sound.get_raw())
+        os.replace(cache_path + ".tmp", cache_path)
+    except OSError as e:
+        print(f"Warning: Could not cache decoded sound. Error: {e}", file=sys.stderr)
+    return sound
+
+def load_sounds():
+    """Starts the mixer and loads every sound effect; returns {name: Sound}, empty if there is no audio."""
+    try:
+        pygame.mixer.init()
+        return {name: load_sound(filename) for name, filename in SOUND_FILES.items()}
+    except (pygame.error, OSError) as e:
+        print(f"Warning: Could not load sound file. Make sure sound files are in the same directory. Error: {e}", file=sys.stderr)
+        return {}
+
 def get_grid_coords(pixel_x, pixel_y):
     """Converts pixel coordinates to grid coordinates."""
     return int(pixel_y // CELL_SIZE), int(pixel_x // CELL_SIZE)
@@ -105,11 +167,223 @@ def manhattan_distance(pos1, pos2):
     """Calculates Manhattan distance between two grid positions."""
     return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
 
+# --- Navigation ---
+# Exits and ghost choices for every NavGraph exit bitmask, shared by all cells with those exits
+EXIT_DIRS_BY_MASK = [tuple(d for d in DIRECTIONS if mask >> DIRECTION_INDEX[d] & 1) for mask in range(1 << len(DIRECTIONS))]
+CHOICES_BY_MASK = [tuple(tuple(d for d in exits if d != (-dx, -dy)) or exits for dx, dy in DIRECTIONS) + (exits,)
+                   for exits in EXIT_DIRS_BY_MASK]
+# Mazes with more walkable cells than this get Manhattan distances rather than
+# an all-pairs DistanceTable, which takes 2 * cells ** 2 bytes
+MAX_DISTANCE_TABLE_CELLS = 4096
+
+class NavGraph:
+    """Walkable-cell graph of a maze, built once per layout.
+
+    exits is a bitmask over DIRECTIONS per cell, row-major, of the neighbours
+    that can be entered; exit_dirs[r][c] holds the same exits as direction
+    tuples. choices[r][c][i] holds the exits a ghost may take when it arrives
+    moving in DIRECTIONS[i] (index 4 when standing still): every exit except
+    going back, unless going back is the only way out. Cells with the same
+    exits share their exit_dirs and choices, so the graph costs a few bytes
+    per cell however large the maze. wraps maps each end of a side tunnel to
+    the other.
+    """
+    def __init__(self, maze_map):
+        rows, cols = len(maze_map), len(maze_map[0])
+        self.maze_map = maze_map
+        self.rows = rows
+        self.cols = cols
+        self.walkable_count = 0
+        self._distances = None
+        self.exits = bytearray(rows * cols)
+        self.exit_dirs = []
+        self.choices = []
+        up, down, left, right = (1 << DIRECTION_INDEX[d] for d in (UP, DOWN, LEFT, RIGHT))
+        for r, row in enumerate(maze_map):
+            above = maze_map[r - 1] if r > 0 else None
+            below = maze_map[r + 1] if r + 1 < rows else None
+            masks = [0] * cols
+            self.walkable_count += cols - row.count(1)
+            for c, val in enumerate(row):
+                if val == 1:
+                    continue
+                mask = 0
+                if above is not None and above[c] != 1: mask |= up
+                if below is not None and below[c] != 1: mask |= down
+                if c > 0 and row[c - 1] != 1: mask |= left
+                if c + 1 < cols and row[c + 1] != 1: mask |= right
+                masks[c] = mask
+            self.exits[r * cols:(r + 1) * cols] = bytes(masks)
+            self.exit_dirs.append([EXIT_DIRS_BY_MASK[mask] for mask in masks])
+            self.choices.append([CHOICES_BY_MASK[mask] for mask in masks])
+
+        self.wraps = {}
+        for r, row in enumerate(maze_map):
+            if row[0] != 1 and row[cols - 1] != 1:
+                self.wraps[(r, 0)] = (r, cols - 1)
+                self.wraps[(r, cols - 1)] = (r, 0)
+
+    @property
+    def distances(self):
+        """The maze's DistanceTable, loaded or computed on first use. Mazes with more
+        than MAX_DISTANCE_TABLE_CELLS walkable cells get Manhattan distances instead."""
+        if self._distances is None:
+            if self.walkable_count > MAX_DISTANCE_TABLE_CELLS:
+                self._distances = ManhattanDistances()
+            else:
+                self._distances = load_distance_table(self)
+        return self._distances
+
+    def walkable_cells(self):
+        return [(r, c) for r, row in enumerate(self.maze_map) for c, val in enumerate(row) if val != 1]
+
+    def neighbours(self, r, c):
+        """Cells reachable in one move from (r, c), including side-tunnel wraps."""
+        cells = [(r + dy, c + dx) for dx, dy in self.exit_dirs[r][c]]
+        wrap = self.wraps.get((r, c))
+        if wrap is not None:
+            cells.append(wrap)
+        return cells
+
+class DistanceTable:
+    """True shortest-path distances between every pair of walkable cells.
+
+    Distances come from a BFS over the NavGraph, side tunnels included, and
+    are stored as a flat uint16 array: table[index[a] * n + index[b]].
+    Cells that cannot reach each other are UNREACHABLE.
+    """
+    UNREACHABLE = 0xFFFF
+
+    def __init__(self, cells, table):
+        self.cells = cells
+        self.n = len(cells)
+        self.index = {cell: i for i, cell in enumerate(cells)}
+        self.table = table
+
+    @classmethod
+    def compute(cls, nav):
+        cells = nav.walkable_cells()
+        index = {cell: i for i, cell in enumerate(cells)}
+        n = len(cells)
+        unreachable = cls.UNREACHABLE
+        neighbours = [[index[cell] for cell in nav.neighbours(r, c)] for r, c in cells]
+        table = array('H')
+        blank = [unreachable] * n
+        # One BFS per source, a whole distance ring at a time, into a plain list
+        # row: several times faster than a queue over the array itself
+        for source in range(n):
+            row = blank[:]
+            row[source] = 0
+            frontier = [source]
+            dist = 0
+            while frontier:
+                dist += 1
+                reached = []
+                for i in frontier:
+                    for j in neighbours[i]:
+                        if row[j] == unreachable:
+                            row[j] = dist
+                            reached.append(j)
+                frontier = reached
+            table.fromlist(row)
+        return cls(cells, table)
+
+    def distance(self, pos1, pos2):
+        """Maze distance between two cells, or the Manhattan distance when either
+        cell is a wall, off the grid, or unreachable from the other."""
+        i = self.index.get((pos1[0], pos1[1]))
+        j = self.index.get((pos2[0], pos2[1]))
+        if i is not None and j is not None:
+            dist = self.table[i * self.n + j]
+            if dist != self.UNREACHABLE:
+                return dist
+        return manhattan_distance(pos1, pos2)
+
+class ManhattanDistances:
+    """Stands in for a DistanceTable on mazes too large for one."""
+    def distance(self, pos1, pos2):
+        return manhattan_distance(pos1, pos2)
+
+def load_distance_table(nav):
+    """Loads a maze's DistanceTable from the disk cache, computing and caching it on a miss.
+
+    Cache files are keyed by a hash of the layout, so an edited maze never
+    picks up stale distances.
+    """
+    layout = "\n".join("".join(str(val) for val in row) for row in nav.maze_map)
+    key = hashlib.sha1((sys.byteorder + layout).encode()).hexdigest()[:16]
+    path = os.path.join(CACHE_DIR, f"distances-{key}.bin")
+    cells = nav.walkable_cells()
+    table = array('H')
+    try:
+        with open(path, "rb") as f:
+            table.fromfile(f, len(cells) * len(cells))
+        return DistanceTable(cells, table)
+    except (OSError, EOFError):
+        pass
+
+    distances = DistanceTable.compute(nav)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            distances.table.tofile(f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"Warning: Could not cache maze distances. Error: {e}", file=sys.stderr)
+    return distances
+
+_nav_graph_cache = {}
+
+def get_nav_graph(maze_map):
+    """Returns the navigation graph for a maze map, building it only the first time the map is seen.
+    Maze maps are shared and never modified (see levels.Level.maze_map), so they are keyed by identity."""
+    nav = _nav_graph_cache.get(id(maze_map))
+    if nav is None or nav.maze_map is not maze_map:
+        nav = _nav_graph_cache[id(maze_map)] = NavGraph(maze_map)
+    return nav
+
 # --- Game Classes ---
+class OccupancyGrid:
+    """Uniform grid of which entities are in each maze cell, so the ones near a
+    cell are found without scanning them all. Only occupied cells take memory.
+    Entities are filed under their grid_pos and must be move()d after it changes.
+    """
+    def __init__(self):
+        self.cells = {}
+
+    def add(self, entity):
+        entity.cell = (entity.grid_pos[0], entity.grid_pos[1])
+        bucket = self.cells.get(entity.cell)
+        if bucket is None:
+            self.cells[entity.cell] = [entity]
+        else:
+            bucket.append(entity)
+
+    def remove(self, entity):
+        bucket = self.cells[entity.cell]
+        bucket.remove(entity)
+        if not bucket:
+            del self.cells[entity.cell]
+
+    def move(self, entity):
+        if entity.cell[0] != entity.grid_pos[0] or entity.cell[1] != entity.grid_pos[1]:
+            self.remove(entity)
+            self.add(entity)
+
+    def rebuild(self, entities):
+        self.cells.clear()
+        for entity in entities:
+            self.add(entity)
+
 class Entity:
+    __slots__ = ("spawn_pos", "grid_pos", "prev_grid_pos", "pixel_pos", "prev_pixel_pos", "direction", "speed", "cell")
+
     def __init__(self, start_pos, speed=1):
+        self.spawn_pos = tuple(start_pos)
         self.grid_pos = list(start_pos)
+        self.prev_grid_pos = tuple(start_pos)
         self.pixel_pos = list(get_pixel_coords(*start_pos))
+        self.prev_pixel_pos = list(self.pixel_pos)
         self.direction = (0, 0)
         self.speed = speed
 
@@ -118,31 +392,68 @@ class Entity:
 
     def can_move(self, target_grid_pos, maze_map):
         r, c = target_grid_pos
-        return 0 <= r < ROWS and 0 <= c < COLS and maze_map[r][c] != 1
-
-    def update_position(self, maze_map):
+        return 0 <= r < len(maze_map) and 0 <= c < len(maze_map[r]) and maze_map[r][c] != 1
+
+    def render_pos(self, alpha=1.0):
+        """Pixel position to draw at, alpha of the way from the previous tick's position
+        to the current one. Jumps of more than a cell (tunnels, respawns) are not smoothed."""
+        x1, y1 = self.pixel_pos
+        if alpha >= 1:
+            return x1, y1
+        x0, y0 = self.prev_pixel_pos
+        if abs(x1 - x0) + abs(y1 - y0) > CELL_SIZE:
+            return x1, y1
+        return x0 + (x1 - x0) * alpha, y0 + (y1 - y0) * alpha
+
+    def screen_pos(self, alpha=1.0, camera=(0, 0)):
+        """render_pos() relative to a camera at maze pixel camera."""
+        x, y = self.render_pos(alpha)
+        return x - camera[0], y - camera[1]
+
+    def get_bounds(self, alpha=1.0, camera=(0, 0)):
+        """Returns the screen rectangle covering everything draw() paints for this entity."""
+        size = CELL_SIZE + 8
+        x, y = self.screen_pos(alpha, camera)
+        return pygame.Rect(int(x) - size // 2, int(y) - size // 2, size, size)
+
+    def move_towards_center(self, dt=FRAME_MS):
+        """Moves the pixel position towards the center of grid_pos; returns True once it is there.
+
+        speed is in cells per 60 Hz frame, so the distance covered scales with dt.
+        """
         target_pixel_x = self.grid_pos[1] * CELL_SIZE + CELL_SIZE // 2
         target_pixel_y = self.grid_pos[0] * CELL_SIZE + CELL_SIZE // 2
+        step = self.speed * CELL_SIZE
+        if dt != FRAME_MS:  # leaves 60 Hz steps bit-identical to batch_sim
+            step *= dt / FRAME_MS
 
         if self.pixel_pos[0] != target_pixel_x:
             if self.pixel_pos[0] < target_pixel_x:
-                self.pixel_pos[0] = min(self.pixel_pos[0] + self.speed * CELL_SIZE, target_pixel_x)
+                self.pixel_pos[0] = min(self.pixel_pos[0] + step, target_pixel_x)
             else:
-                self.pixel_pos[0] = max(self.pixel_pos[0] - self.speed * CELL_SIZE, target_pixel_x)
+                self.pixel_pos[0] = max(self.pixel_pos[0] - step, target_pixel_x)
         if self.pixel_pos[1] != target_pixel_y:
             if self.pixel_pos[1] < target_pixel_y:
-                self.pixel_pos[1] = min(self.pixel_pos[1] + self.speed * CELL_SIZE, target_pixel_y)
+                self.pixel_pos[1] = min(self.pixel_pos[1] + step, target_pixel_y)
             else:
-                self.pixel_pos[1] = max(self.pixel_pos[1] - self.speed * CELL_SIZE, target_pixel_y)
+                self.pixel_pos[1] = max(self.pixel_pos[1] - step, target_pixel_y)
 
-        if self.pixel_pos[0] == target_pixel_x and self.pixel_pos[1] == target_pixel_y:
-            next_grid_r, next_grid_c = self.grid_pos[0] + self.direction[1], self.grid_pos[1] + self.direction[0]
-            if self.can_move((next_grid_r, next_grid_c), maze_map):
-                self.grid_pos = [next_grid_r, next_grid_c]
-            else:
-                self.direction = (0, 0)
+        return self.pixel_pos[0] == target_pixel_x and self.pixel_pos[1] == target_pixel_y
+
+    def step_to_next_cell(self, maze_map):
+        next_grid_r, next_grid_c = self.grid_pos[0] + self.direction[1], self.grid_pos[1] + self.direction[0]
+        if self.can_move((next_grid_r, next_grid_c), maze_map):
+            self.grid_pos = [next_grid_r, next_grid_c]
+        else:
+            self.direction = (0, 0)
+
+    def update_position(self, maze_map, dt=FRAME_MS):
+        if self.move_towards_center(dt):
+            self.step_to_next_cell(maze_map)
 
 class PacMan(Entity):
+    __slots__ = ("mouth_open", "mouth_timer", "mouth_delay", "queued_direction")
+
     def __init__(self, start_pos):
         super().__init__(start_pos, speed=0.1)
         self.mouth_open = True
@@ -153,8 +464,8 @@ class PacMan(Entity):
     def set_queued_direction(self, dr, dc):
         self.queued_direction = (dr, dc)
 
-    def update(self, maze_map, dt):
-        self.handle_teleportation()
+    def update(self, maze_map, dt, move_dt=None):
+        self.handle_teleportation(len(maze_map[0]))
 
         if self.queued_direction != (0, 0):
             target_r, target_c = self.grid_pos[0] + self.queued_direction[1], self.grid_pos[1] + self.queued_direction[0]
@@ -173,73 +484,64 @@ class PacMan(Entity):
             self.mouth_open = not self.mouth_open
             self.mouth_timer = 0
         
-        super().update_position(maze_map)
+        super().update_position(maze_map, dt if move_dt is None else move_dt)
 
-    def handle_teleportation(self):
+    def handle_teleportation(self, cols):
         if self.grid_pos[1] == 0 and self.direction == LEFT:
-            self.grid_pos[1] = COLS - 1
+            self.grid_pos[1] = cols - 1
             self.pixel_pos = list(get_pixel_coords(*self.grid_pos))
-        elif self.grid_pos[1] == COLS - 1 and self.direction == RIGHT:
+        elif self.grid_pos[1] == cols - 1 and self.direction == RIGHT:
             self.grid_pos[1] = 0
             self.pixel_pos = list(get_pixel_coords(*self.grid_pos))
 
-    def draw(self, surface):
-        x, y = self.pixel_pos
-        radius = CELL_SIZE // 2 - 2
-        pygame.draw.circle(surface, YELLOW, (x, y), radius)
-
-        if self.mouth_open and self.direction != (0, 0):
-            mouth_half_angle = math.radians(30)
-            center_angle = 0
-            if self.direction == UP: center_angle = math.radians(90)
-            elif self.direction == LEFT: center_angle = math.radians(180)
-            elif self.direction == DOWN: center_angle = math.radians(270)
-            
-            p1_angle = center_angle - mouth_half_angle
-            p2_angle = center_angle + mouth_half_angle
-            
-            p1 = (x + radius * math.cos(p1_angle), y + radius * math.sin(p1_angle))
-            p2 = (x + radius * math.cos(p2_angle), y + radius * math.sin(p2_angle))
-            mouth_points = [(x, y), p1, p2]
-            pygame.draw.polygon(surface, BLACK, mouth_points)
+    def draw(self, surface, alpha=1.0, camera=(0, 0)):
+        get_sprite_atlas().blit(surface, ('pac_man', self.mouth_open, self.direction), self.screen_pos(alpha, camera))
 
 class Ghost(Entity):
-    def __init__(self, start_pos, color, ghost_type, scatter_target):
+    __slots__ = ("rng", "home", "original_color", "color", "ghost_type", "frightened", "eaten", "scatter_target",
+                 "modes", "current_mode", "mode_timer", "mode_duration_scatter", "mode_duration_chase",
+                 "normal_speed", "frightened_speed", "eaten_speed")
+
+    def __init__(self, start_pos, color, ghost_type, scatter_target, home, rng=random):
         super().__init__(start_pos, speed=0.1)
+        self.rng = rng
+        self.home = home
         self.original_color = color
         self.color = color
         self.ghost_type = ghost_type
         self.frightened = False
         self.eaten = False
         self.scatter_target = scatter_target
-        self.spawn_pos = start_pos
         self.modes = ['scatter', 'chase']
         self.current_mode = 'scatter'
         self.mode_timer = 0
         self.mode_duration_scatter = 7000
         self.mode_duration_chase = 20000
+        self.normal_speed = 0.1
+        self.frightened_speed = 0.05
+        self.eaten_speed = 0.2
 
     def set_frightened(self, value):
         self.frightened = value
         if value:
             self.color = SCARED_GHOST_COLOR
-            self.speed = 0.05
+            self.speed = self.frightened_speed
         else:
             self.color = self.original_color
-            self.speed = 0.1
+            self.speed = self.normal_speed
 
     def set_eaten(self, value):
         self.eaten = value
         if value:
             self.color = BLACK
-            self.speed = 0.2
+            self.speed = self.eaten_speed
             self.frightened = False
 
-    def get_target_tile(self, pac_man_pos, pac_man_dir, blinky_pos=None):
+    def get_target_tile(self, pac_man_pos, pac_man_dir, blinky_pos=None, nav=None):
         pr, pc = pac_man_pos
         pdr, pdc = pac_man_dir
 
-        if self.eaten: return GHOST_HOUSE_CENTER
+        if self.eaten: return self.home
         if self.frightened: return self.grid_pos
         if self.current_mode == 'scatter': return self.scatter_target
 
@@ -254,13 +556,14 @@ class Ghost(Entity):
             vector_y = target_tile_pac[0] - blinky_pos[0]
             return (blinky_pos[0] + 2 * vector_y, blinky_pos[1] + 2 * vector_x)
         elif self.ghost_type == 'clyde':
-            if manhattan_distance(self.grid_pos, (pr, pc)) < 8:
+            distance = nav.distances.distance if nav else manhattan_distance
+            if distance(self.grid_pos, (pr, pc)) < 8:
                 return self.scatter_target
             else:
                 return (pr, pc)
         return (pr, pc)
 
-    def update(self, maze_map, pac_man_pos, pac_man_dir, blinky_pos, dt):
+    def update(self, maze_map, pac_man_pos, pac_man_dir, blinky_pos, dt, nav=None, move_dt=None):
         self.mode_timer += dt
 
         if not self.frightened and not self.eaten:
@@ -274,83 +577,253 @@ class Ghost(Entity):
         if self.eaten and self.grid_pos == list(self.spawn_pos):
             self.set_eaten(False)
             self.color = self.original_color
-            self.speed = 0.1
+            self.speed = self.normal_speed
             self.current_mode = 'scatter'
             self.mode_timer = 0
 
-        target_tile = self.get_target_tile(pac_man_pos, pac_man_dir, blinky_pos)
-        
-        best_direction = self.direction
-        min_dist = float('inf')
-        opposite_dir = (-self.direction[0], -self.direction[1])
-        possible_dirs = DIRECTIONS[:]
-        if self.frightened or self.eaten: random.shuffle(possible_dirs)
-        
-        for dr, dc in possible_dirs:
-            if (dr, dc) == opposite_dir and self.direction != (0,0) and not self.frightened and not self.eaten:
-                num_valid_moves = 0
-                for temp_dr, temp_dc in DIRECTIONS:
-                    if self.can_move((self.grid_pos[0] + temp_dc, self.grid_pos[1] + temp_dr), maze_map):
-                        num_valid_moves += 1
-                if num_valid_moves > 1: continue
-
-            next_r, next_c = self.grid_pos[0] + dc, self.grid_pos[1] + dr
-            if self.can_move((next_r, next_c), maze_map):
-                dist = manhattan_distance((next_r, next_c), target_tile)
-                if dist < min_dist:
-                    min_dist = dist
-                    best_direction = (dr, dc)
-
-        if best_direction != (0,0): self.set_direction(*best_direction)
-        super().update_position(maze_map)
-
-    def draw(self, surface):
-        x, y = self.pixel_pos
-        radius = CELL_SIZE // 2 - 2
+        if nav is None:
+            nav = get_nav_graph(maze_map)
+        # Steering only matters on the tick the ghost reaches a tile center
+        if self.move_towards_center(dt if move_dt is None else move_dt):
+            self.choose_direction(nav, pac_man_pos, pac_man_dir, blinky_pos)
+            self.step_to_next_cell(maze_map)
+
+    def choose_direction(self, nav, pac_man_pos, pac_man_dir, blinky_pos):
+        """Picks the exit to leave the current tile by. Corridors have a single
+        choice; only junctions need the target tile."""
+        r, c = self.grid_pos
+        options = nav.choices[r][c][DIRECTION_INDEX[self.direction]]
+        if len(options) < 2:
+            if options: self.set_direction(*options[0])
+            return
+        if self.frightened:
+            self.set_direction(*self.rng.choice(nav.exit_dirs[r][c]))
+            return
         if self.eaten:
-            eye_radius = 4
-            pygame.draw.circle(surface, WHITE, (x - radius // 2, y - radius // 4), eye_radius)
-            pygame.draw.circle(surface, WHITE, (x + radius // 2, y - radius // 4), eye_radius)
-            pygame.draw.circle(surface, BLACK, (x - radius // 2 + self.direction[0]*2, y - radius // 4 + self.direction[1]*2), eye_radius // 2)
-            pygame.draw.circle(surface, BLACK, (x + radius // 2 + self.direction[0]*2, y - radius // 4 + self.direction[1]*2), eye_radius // 2)
-        else:
-            pygame.draw.circle(surface, self.color, (x, y - radius // 4), radius)
-            pygame.draw.rect(surface, self.color, (x - radius, y - radius // 4, radius * 2, radius + radius // 4))
-            leg_count = 4
-            leg_width = (radius * 2) / leg_count
-            for i in range(leg_count):
-                pygame.draw.circle(surface, self.color, (x - radius + (i * leg_width) + leg_width // 2, y + radius + 2), leg_width // 2 + 1)
-            eye_radius = 4
-            pygame.draw.circle(surface, WHITE, (x - radius // 2, y - radius // 4), eye_radius)
-            pygame.draw.circle(surface, WHITE, (x + radius // 2, y - radius // 4), eye_radius)
-            pupil_offset_x = self.direction[0] * 2
-            pupil_offset_y = self.direction[1] * 2
-            pygame.draw.circle(surface, BLACK, (x - radius // 2 + pupil_offset_x, y - radius // 4 + pupil_offset_y), eye_radius // 2)
-            pygame.draw.circle(surface, BLACK, (x + radius // 2 + pupil_offset_x, y - radius // 4 + pupil_offset_y), eye_radius // 2)
+            options = list(nav.exit_dirs[r][c])
+            self.rng.shuffle(options)
+
+        target_tile = self.get_target_tile(pac_man_pos, pac_man_dir, blinky_pos, nav)
+        distance = nav.distances.distance
+        best_direction = options[0]
+        min_dist = float('inf')
+        for dr, dc in options:
+            dist = distance((r + dc, c + dr), target_tile)
+            if dist < min_dist:
+                min_dist = dist
+                best_direction = (dr, dc)
+        self.set_direction(*best_direction)
+
+    def draw(self, surface, alpha=1.0, camera=(0, 0)):
+        key = ('eyes', self.direction) if self.eaten else ('ghost', self.color, self.direction)
+        get_sprite_atlas().blit(surface, key, self.screen_pos(alpha, camera))
+
+class PelletStore:
+    """The pellets left in a maze, one byte per cell (see levels.Level.pellet_grid).
+
+    Eating, testing and counting are O(1) and reset() is a single copy of the
+    level's grid. Eaten cells are logged in order, so the renderer can erase
+    just those; generation changes whenever pellets come back or are placed.
+    pack() gives the pellets as two bitsets for snapshots; the packed bytes
+    are kept and shared by every snapshot until a pellet changes.
+    """
+    PELLET_BITS = bytes.maketrans(bytes([NO_PELLET, CELL_PELLET, CELL_POWER_PELLET]), b"010")
+    POWER_BITS = bytes.maketrans(bytes([NO_PELLET, CELL_PELLET, CELL_POWER_PELLET]), b"001")
+    BITS_TO_PELLETS = bytes.maketrans(b"01", bytes([NO_PELLET, CELL_PELLET]))
+    BITS_TO_POWER = bytes.maketrans(b"01", bytes([NO_PELLET, CELL_POWER_PELLET]))
+
+    def __init__(self, level):
+        self.cols = level.cols
+        self.template = level.pellet_grid
+        self.cells = bytearray(self.template)
+        self.eaten = []
+        self.generation = 0
+        self.remaining = len(self.cells) - self.cells.count(NO_PELLET)
+        self.packed = None
+
+    def reset(self):
+        self.cells[:] = self.template
+        self.eaten.clear()
+        self.generation += 1
+        self.remaining = len(self.cells) - self.cells.count(NO_PELLET)
+        self.packed = None
+
+    def clear(self):
+        self.cells[:] = bytes(len(self.cells))
+        self.eaten.clear()
+        self.generation += 1
+        self.remaining = 0
+        self.packed = None
+
+    def place(self, r, c, kind=CELL_PELLET):
+        i = r * self.cols + c
+        self.remaining += (kind != NO_PELLET) - (self.cells[i] != NO_PELLET)
+        self.cells[i] = kind
+        self.generation += 1
+        self.packed = None
+
+    def kind(self, r, c):
+        return self.cells[r * self.cols + c]
+
+    def eat(self, r, c):
+        """Removes the pellet at (r, c), if any; returns what was there."""
+        i = r * self.cols + c
+        kind = self.cells[i]
+        if kind:
+            self.cells[i] = NO_PELLET
+            self.remaining -= 1
+            self.eaten.append((r, c))
+            self.packed = None
+        return kind
+
+    def pack(self):
+        """The pellets as a bitset of pellet cells followed by one of power pellet cells."""
+        if self.packed is None:
+            size = (len(self.cells) + 7) // 8
+            self.packed = (int(self.cells.translate(self.PELLET_BITS), 2).to_bytes(size, "big")
+                           + int(self.cells.translate(self.POWER_BITS), 2).to_bytes(size, "big"))
+        return self.packed
+
+    def unpack(self, packed):
+        """Sets the pellets from pack()ed bytes; a no-op if they are what the store already holds."""
+        if packed == self.packed:
+            return
+        n = len(self.cells)
+        size = (n + 7) // 8
+        pellets = format(int.from_bytes(packed[:size], "big"), f"0{n}b").encode().translate(self.BITS_TO_PELLETS)
+        power = format(int.from_bytes(packed[size:], "big"), f"0{n}b").encode().translate(self.BITS_TO_POWER)
+        self.cells[:] = (int.from_bytes(pellets, "big") | int.from_bytes(power, "big")).to_bytes(n, "big")
+        self.remaining = n - self.cells.count(NO_PELLET)
+        self.eaten.clear()
+        self.generation += 1
+        self.packed = packed
+
+    def cells_of(self, kind):
+        """The cells holding kind, in row-major order."""
+        cells, cols = self.cells, self.cols
+        return [divmod(i, cols) for i in range(len(cells)) if cells[i] == kind]
+
+    def __contains__(self, cell):
+        return self.cells[cell[0] * self.cols + cell[1]] != NO_PELLET
+
+    def __len__(self):
+        return self.remaining
+
+# --- Snapshots ---
+# Game.snapshot() layout: a header, one record per Pac-Man and per ghost, the
+# packed pellets and the packed RNG state. Numbers that may be ints or floats
+# are stored as doubles, with a bitmask of the ones to turn back into ints.
+SNAPSHOT_VERSION = 1
+# version, rows, cols, score, lives, ticks, game state, fright mode, fright timer is int, fright timer, Pac-Men, ghosts
+SNAPSHOT_HEADER = struct.Struct("<BHHqhqB??dHH")
+# grid row and col, previous grid row and col, direction, queued direction, mouth open, int mask,
+# then pixel x and y, previous pixel x and y, speed and mouth timer
+PAC_MAN_STATE = struct.Struct("<hhhhBB?B6d")
+# grid row and col, previous grid row and col, direction, color (normal, frightened, eaten),
+# frightened | eaten << 1 | mode << 2, int mask, then pixel x and y, previous pixel x and y, speed and mode timer
+GHOST_STATE = struct.Struct("<hhhhBBBB6d")
+GHOST_MODES = ('scatter', 'chase')
+
+def int_mask(values):
+    mask = 0
+    for i, value in enumerate(values):
+        if type(value) is int:
+            mask |= 1 << i
+    return mask
+
+def apply_int_mask(values, mask):
+    if not mask:
+        return values
+    return [int(value) if mask >> i & 1 else value for i, value in enumerate(values)]
+
+def restore_entity(entity, r, c, prev_r, prev_c, x, y, prev_x, prev_y, direction):
+    """Writes unpacked snapshot fields into an entity, reusing its position lists."""
+    entity.grid_pos[0] = r
+    entity.grid_pos[1] = c
+    entity.prev_grid_pos = (prev_r, prev_c)
+    entity.pixel_pos[0] = x
+    entity.pixel_pos[1] = y
+    entity.prev_pixel_pos[0] = prev_x
+    entity.prev_pixel_pos[1] = prev_y
+    entity.direction = DIRECTION_BY_INDEX[direction]
+
+class GameRandom(random.Random):
+    """random.Random that keeps its packed state for snapshots until it is next used.
+
+    Packing the Mersenne Twister state costs far more than a game tick, and
+    the game only draws numbers at a few junctions and deaths, so most
+    snapshots reuse the bytes packed for the previous one.
+    """
+    STATE = struct.Struct("<625I?d")
+
+    def __init__(self, seed=None):
+        self.packed = None
+        super().__init__(seed)
+
+    def seed(self, *args, **kwargs):
+        self.packed = None
+        super().seed(*args, **kwargs)
+
+    def setstate(self, state):
+        self.packed = None
+        super().setstate(state)
+
+    def random(self):
+        self.packed = None
+        return super().random()
+
+    def getrandbits(self, k):
+        self.packed = None
+        return super().getrandbits(k)
+
+    def pack_state(self):
+        if self.packed is None:
+            _, internal, gauss_next = self.getstate()
+            self.packed = self.STATE.pack(*internal, gauss_next is not None, gauss_next or 0.0)
+        return self.packed
+
+    def unpack_state(self, packed):
+        """Sets the state from pack_state() bytes; a no-op if it is already in that state."""
+        if packed == self.packed:
+            return
+        values = self.STATE.unpack(packed)
+        self.setstate((self.VERSION, values[:625], values[626] if values[625] else None))
+        self.packed = packed
 
 class Game:
-    def __init__(self):
+    def __init__(self, headless=False, seed=None, level=None):
+        self.headless = headless
+        # Only the game on screen records profiler spans, not the private games
+        # the autopilot plays out on its search thread
+        self.profiled = not headless
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = GameRandom(self.seed)
+        self.level = level if level is not None else load_level(DEFAULT_LEVEL)
+        self.pellets = PelletStore(self.level)
+        self.renderer = None
         self.game_state = GAME_STATE_START
         self.load_sounds()
-        self.play_startup_sound()
         self.reset_game()
-        
 
     def reset_game(self):
-        self.maze_map = []
-        self.pellets = set()
-        self.power_pellets = set()
-        self.parse_maze_layout()
-
-        self.pac_man = PacMan((21, 10))
-        self.blinky = Ghost(BLINKY_SPAWN, RED, 'blinky', BLINKY_SCATTER)
-        self.pinky = Ghost(PINKY_SPAWN, PINK, 'pinky', PINKY_SCATTER)
-        self.inky = Ghost(INKY_SPAWN, CYAN, 'inky', INKY_SCATTER)
-        self.clyde = Ghost(CLYDE_SPAWN, ORANGE, 'clyde', CLYDE_SCATTER)
-        self.ghosts = [self.blinky, self.pinky, self.inky, self.clyde]
+        self.load_maze()
+
+        level = self.level
+        self.pac_man = PacMan(level.pacman_spawn)
+        self.ghosts = [Ghost(level.ghost_spawns[ghost], GHOST_COLORS[ghost], ghost, level.ghost_scatter[ghost],
+                             level.ghost_house, self.rng)
+                       for ghost in GHOST_TYPES]
+        self.blinky, self.pinky, self.inky, self.clyde = self.ghosts
+        self.pac_men = [self.pac_man]
+        self.entities = self.pac_men + self.ghosts
+        # Pac-Men by cell, for collision checks. Ghosts are not filed: each
+        # ghost looks up the cells around itself.
+        self.pac_man_grid = OccupancyGrid()
+        self.pac_man_grid.rebuild(self.pac_men)
 
         self.score = 0
         self.lives = 3
+        self.ticks = 0
         self.fright_mode = False
         self.fright_timer = 0
         self.fright_duration = 7000
@@ -359,95 +832,223 @@ class Game:
         self.level_complete_message = ""
 
     def load_sounds(self):
-        try:
-            self.startup_sound = pygame.mixer.Sound("startup_sound.mp3")
-            self.pellet_sound = pygame.mixer.Sound("pellet_sound.mp3")
-            self.power_pellet_sound = pygame.mixer.Sound("power_pellet_sound.mp3")
-            self.death_sound = pygame.mixer.Sound("death_sound.mp3")
-        except pygame.error as e:
-            print(f"Warning: Could not load sound file. Make sure sound files are in the same directory. Error: {e}")
-            self.startup_sound = None
-            self.pellet_sound = None
-            self.power_pellet_sound = None
-            self.death_sound = None
+        """Loads the sound effects on a background thread so the window is not kept
+        waiting; until they are ready the game is silent."""
+        for name in SOUND_FILES:
+            setattr(self, name, None)
+        if self.headless:
+            return
+        threading.Thread(target=self.attach_sounds, name="sound-loader", daemon=True).start()
+
+    def attach_sounds(self):
+        start = time.perf_counter()
+        sounds = load_sounds()
+        for name, sound in sounds.items():
+            setattr(self, name, sound)
+        if sounds:
+            print(f"Sounds ready after {(time.perf_counter() - LAUNCH_TIME) * 1000:.0f} ms "
+                  f"({(time.perf_counter() - start) * 1000:.0f} ms loading)", file=sys.stderr)
+        if self.game_state == GAME_STATE_START:
+            self.play_startup_sound()
 
     def play_startup_sound(self):
         if self.startup_sound:
             self.startup_sound.play()
 
-    def parse_maze_layout(self):
-        self.maze_map = []
-        self.pellets.clear()
-        self.power_pellets.clear()
-        for r, row_str in enumerate(original_layout):
-            row_list = []
-            for c, char in enumerate(row_str):
-                if char == '1': row_list.append(1)
-                elif char == '2':
-                    row_list.append(0)
-                    self.pellets.add((r, c))
-                elif char == '3':
-                    row_list.append(0)
-                    self.power_pellets.add((r, c))
-                else: row_list.append(0)
-            self.maze_map.append(row_list)
+    def load_maze(self):
+        """Restores the walls and pellets of the current level; the level itself is only ever compiled once."""
+        self.maze_map = self.level.maze_map
+        self.pellets.reset()
+        self.nav = get_nav_graph(self.maze_map)
+        # Build (or load) the distance table now rather than on the first
+        # ghost decision, so a cold compute never lands in the middle of a frame
+        self.nav.distances
 
     def handle_input(self, event):
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_UP: self.pac_man.set_queued_direction(0, -1)
-            elif event.key == pygame.K_DOWN: self.pac_man.set_queued_direction(0, 1)
-            elif event.key == pygame.K_LEFT: self.pac_man.set_queued_direction(-1, 0)
-            elif event.key == pygame.K_RIGHT: self.pac_man.set_queued_direction(1, 0)
-            elif event.key == pygame.K_RETURN and self.game_state != GAME_STATE_PLAYING:
-                self.reset_game()
-                self.game_state = GAME_STATE_PLAYING
-
-    def update(self, dt):
-        if self.game_state != GAME_STATE_PLAYING:
-            return
+        """Applies a Pygame event; returns the input it produced, or None."""
+        if event.type != pygame.KEYDOWN:
+            return None
+        if event.key == pygame.K_UP: code = DIRECTIONS.index(UP)
+        elif event.key == pygame.K_DOWN: code = DIRECTIONS.index(DOWN)
+        elif event.key == pygame.K_LEFT: code = DIRECTIONS.index(LEFT)
+        elif event.key == pygame.K_RIGHT: code = DIRECTIONS.index(RIGHT)
+        elif event.key == pygame.K_RETURN and self.game_state != GAME_STATE_PLAYING: code = INPUT_START
+        else: return None
+        self.apply_input(code)
+        return code
+
+    def apply_input(self, code):
+        if code == INPUT_START:
+            if self.game_state != GAME_STATE_PLAYING:
+                self.start_game()
+        else:
+            self.pac_man.set_queued_direction(*DIRECTIONS[code])
 
-        self.pac_man.update(self.maze_map, dt)
-        pac_r, pac_c = self.pac_man.grid_pos
+    def start_game(self):
+        self.reset_game()
+        self.game_state = GAME_STATE_PLAYING
 
-        if (pac_r, pac_c) in self.pellets:
-            try: self.pellets.remove((pac_r, pac_c))
-            except KeyError: pass
-            self.score += 10
-            if self.pellet_sound: self.pellet_sound.play()
+    def update(self, dt, move_dt=None):
+        """Advances the game by one tick of dt ms; returns the points scored during it.
 
-        if (pac_r, pac_c) in self.power_pellets:
-            try: self.power_pellets.remove((pac_r, pac_c))
-            except KeyError: pass
-            self.score += 50
-            self.activate_fright_mode()
-            if self.power_pellet_sound: self.power_pellet_sound.play()
+        move_dt, if given, is how long entities move for instead: version 1
+        recordings moved them one 60 Hz step per tick whatever its length.
+        """
+        if self.game_state != GAME_STATE_PLAYING:
+            return 0
+
+        start_score = self.score
+        self.ticks += 1
+        for entity in self.entities:
+            entity.prev_pixel_pos[:] = entity.pixel_pos
+            entity.prev_grid_pos = (entity.grid_pos[0], entity.grid_pos[1])
+        self.update_pac_man(dt, move_dt)
 
         if self.fright_mode:
             self.fright_timer -= dt
             if self.fright_timer <= 0: self.deactivate_fright_mode()
 
         blinky_pos = self.blinky.grid_pos
+        profiling = self.profiled and PROFILER.enabled
         for ghost in self.ghosts:
-            ghost.update(self.maze_map, self.pac_man.grid_pos, self.pac_man.direction, blinky_pos, dt)
-            if manhattan_distance(ghost.grid_pos, self.pac_man.grid_pos) < 1.5:
-                if ghost.frightened and not ghost.eaten:
-                    self.score += 200
-                    ghost.set_eaten(True)
-                    ghost.grid_pos = list(ghost.spawn_pos)
-                    ghost.pixel_pos = list(get_pixel_coords(*ghost.spawn_pos))
-                    ghost.direction = (0, 0)
-                elif not ghost.frightened and not ghost.eaten:
-                    self.lives -= 1
-                    if self.death_sound: self.death_sound.play()
-                    self.reset_entities_position()
-                    if self.lives == 0:
-                        self.game_state = GAME_STATE_GAME_OVER
-                        self.game_over_message = "GAME OVER!"
-                    break
-
-        if not self.pellets and not self.power_pellets:
+            if profiling: start = time.perf_counter_ns()
+            ghost.update(self.maze_map, self.pac_man.grid_pos, self.pac_man.direction, blinky_pos, dt, self.nav, move_dt)
+            if profiling: PROFILER.add_span(ghost.ghost_type, start)
+            if self.handle_collision(ghost):
+                break
+
+        if not self.pellets:
             self.game_state = GAME_STATE_LEVEL_COMPLETE
             self.level_complete_message = "LEVEL COMPLETE!"
+        return self.score - start_score
+
+    def update_pac_man(self, dt, move_dt=None):
+        """Moves every Pac-Man and eats the pellets under them."""
+        for pac_man in self.pac_men:
+            pac_man.update(self.maze_map, dt, move_dt)
+            self.pac_man_grid.move(pac_man)
+
+            kind = self.pellets.eat(*pac_man.grid_pos)
+            if kind == CELL_PELLET:
+                self.score += 10
+                if self.pellet_sound: self.pellet_sound.play()
+            elif kind == CELL_POWER_PELLET:
+                self.score += 50
+                self.activate_fright_mode()
+                if self.power_pellet_sound: self.power_pellet_sound.play()
+
+    def touches_pac_man(self, ghost):
+        """True if a Pac-Man shares or borders the ghost's cell. Only the cells
+        around the ghost are looked up in the Pac-Man grid.
+
+        Entities step at most one cell per tick, so a ghost and a Pac-Man that
+        pass each other always end the tick in the same or neighbouring cells.
+        """
+        r, c = ghost.grid_pos
+        occupied = self.pac_man_grid.cells
+        if (r, c) in occupied:
+            return True
+        for dx, dy in self.nav.exit_dirs[r][c]:
+            if (r + dy, c + dx) in occupied:
+                return True
+        return self.nav.wraps.get((r, c)) in occupied
+
+    def handle_collision(self, ghost):
+        """Resolves a ghost touching Pac-Man; returns True if Pac-Man lost a life."""
+        if not self.touches_pac_man(ghost):
+            return False
+        if ghost.frightened and not ghost.eaten:
+            self.score += 200
+            ghost.set_eaten(True)
+            ghost.grid_pos = list(ghost.spawn_pos)
+            ghost.pixel_pos = list(get_pixel_coords(*ghost.spawn_pos))
+            ghost.direction = (0, 0)
+        elif not ghost.frightened and not ghost.eaten:
+            self.lives -= 1
+            if self.death_sound: self.death_sound.play()
+            self.reset_entities_position()
+            if self.lives == 0:
+                self.game_state = GAME_STATE_GAME_OVER
+                self.game_over_message = "GAME OVER!"
+            return True
+        return False
+
+    def state_checksum(self):
+        """CRC32 of the whole simulation state, used to check that a replay reproduces a game exactly."""
+        state = [self.score, self.lives, self.ticks, self.game_state, self.fright_mode, self.fright_timer,
+                 self.pellets.cells_of(CELL_PELLET), self.pellets.cells_of(CELL_POWER_PELLET)]
+        for entity in [self.pac_man] + self.ghosts:
+            state += [entity.grid_pos, entity.pixel_pos, entity.direction]
+        for ghost in self.ghosts:
+            state += [ghost.frightened, ghost.eaten, ghost.current_mode, ghost.mode_timer]
+        return zlib.crc32(repr(state).encode())
+
+    def snapshot(self):
+        """Packs the simulation state into bytes that restore() loads back into this or
+        any other Game on the same maze with as many Pac-Men and ghosts. Settings such
+        as speeds and mode durations are not included."""
+        parts = [SNAPSHOT_HEADER.pack(SNAPSHOT_VERSION, self.level.rows, self.level.cols, self.score, self.lives,
+                                      self.ticks, self.game_state, self.fright_mode, type(self.fright_timer) is int,
+                                      self.fright_timer, len(self.pac_men), len(self.ghosts))]
+        for pac_man in self.pac_men:
+            numbers = (*pac_man.pixel_pos, *pac_man.prev_pixel_pos, pac_man.speed, pac_man.mouth_timer)
+            parts.append(PAC_MAN_STATE.pack(*pac_man.grid_pos, *pac_man.prev_grid_pos,
+                                            DIRECTION_INDEX[pac_man.direction], DIRECTION_INDEX[pac_man.queued_direction],
+                                            pac_man.mouth_open, int_mask(numbers), *numbers))
+        for ghost in self.ghosts:
+            numbers = (*ghost.pixel_pos, *ghost.prev_pixel_pos, ghost.speed, ghost.mode_timer)
+            color = 0 if ghost.color == ghost.original_color else 1 if ghost.color == SCARED_GHOST_COLOR else 2
+            flags = ghost.frightened | ghost.eaten << 1 | GHOST_MODES.index(ghost.current_mode) << 2
+            parts.append(GHOST_STATE.pack(*ghost.grid_pos, *ghost.prev_grid_pos, DIRECTION_INDEX[ghost.direction],
+                                          color, flags, int_mask(numbers), *numbers))
+        parts.append(self.pellets.pack())
+        parts.append(self.rng.pack_state())
+        return b"".join(parts)
+
+    def restore(self, snapshot):
+        """Loads a snapshot() into this game, in place."""
+        (version, rows, cols, self.score, self.lives, self.ticks, game_state, self.fright_mode, timer_is_int,
+         fright_timer, num_pac_men, num_ghosts) = SNAPSHOT_HEADER.unpack_from(snapshot)
+        if (version, rows, cols, num_pac_men, num_ghosts) != (SNAPSHOT_VERSION, self.level.rows, self.level.cols,
+                                                               len(self.pac_men), len(self.ghosts)):
+            raise ValueError("snapshot is of a different maze, entity count or snapshot version")
+        self.game_state = game_state
+        self.fright_timer = int(fright_timer) if timer_is_int else fright_timer
+        self.game_over_message = "GAME OVER!" if game_state == GAME_STATE_GAME_OVER else ""
+        self.level_complete_message = "LEVEL COMPLETE!" if game_state == GAME_STATE_LEVEL_COMPLETE else ""
+
+        offset = SNAPSHOT_HEADER.size
+        for pac_man in self.pac_men:
+            r, c, prev_r, prev_c, direction, queued, pac_man.mouth_open, ints, *numbers = \
+                PAC_MAN_STATE.unpack_from(snapshot, offset)
+            offset += PAC_MAN_STATE.size
+            x, y, prev_x, prev_y, pac_man.speed, pac_man.mouth_timer = apply_int_mask(numbers, ints)
+            restore_entity(pac_man, r, c, prev_r, prev_c, x, y, prev_x, prev_y, direction)
+            pac_man.queued_direction = DIRECTION_BY_INDEX[queued]
+            self.pac_man_grid.move(pac_man)
+        for ghost in self.ghosts:
+            r, c, prev_r, prev_c, direction, color, flags, ints, *numbers = GHOST_STATE.unpack_from(snapshot, offset)
+            offset += GHOST_STATE.size
+            x, y, prev_x, prev_y, ghost.speed, ghost.mode_timer = apply_int_mask(numbers, ints)
+            restore_entity(ghost, r, c, prev_r, prev_c, x, y, prev_x, prev_y, direction)
+            ghost.color = (ghost.original_color, SCARED_GHOST_COLOR, BLACK)[color]
+            ghost.frightened = bool(flags & 1)
+            ghost.eaten = bool(flags & 2)
+            ghost.current_mode = GHOST_MODES[flags >> 2]
+
+        pellets_end = offset + 2 * ((rows * cols + 7) // 8)
+        self.pellets.unpack(snapshot[offset:pellets_end])
+        self.rng.unpack_state(snapshot[pellets_end:])
+
+    def add_pac_man(self, pac_man):
+        """Adds another Pac-Man (stress tests); ghosts keep chasing the first one."""
+        self.pac_men.append(pac_man)
+        self.entities.insert(len(self.pac_men) - 1, pac_man)
+        self.pac_man_grid.add(pac_man)
+
+    def add_ghost(self, ghost):
+        self.ghosts.append(ghost)
+        self.entities.append(ghost)
 
     def activate_fright_mode(self):
         self.fright_mode = True
@@ -464,67 +1065,446 @@ class Game:
                 ghost.set_frightened(False)
 
     def reset_entities_position(self):
-        self.pac_man.grid_pos = [21, 10]
-        self.pac_man.pixel_pos = list(get_pixel_coords(21, 10))
-        self.pac_man.direction = (0, 0)
-        self.pac_man.queued_direction = (0,0)
+        for pac_man in self.pac_men:
+            pac_man.grid_pos = list(pac_man.spawn_pos)
+            pac_man.pixel_pos = list(get_pixel_coords(*pac_man.spawn_pos))
+            pac_man.direction = (0, 0)
+            pac_man.queued_direction = (0,0)
+        self.pac_man_grid.rebuild(self.pac_men)
 
         for ghost in self.ghosts:
             ghost.grid_pos = list(ghost.spawn_pos)
             ghost.pixel_pos = list(get_pixel_coords(*ghost.spawn_pos))
-            ghost.direction = random.choice(DIRECTIONS)
+            ghost.direction = self.rng.choice(DIRECTIONS)
             ghost.set_frightened(False)
             ghost.set_eaten(False)
             ghost.current_mode = 'scatter'
             ghost.mode_timer = 0
 
-    def draw(self, surface):
-        surface.fill(BLACK)
-        for r, row in enumerate(self.maze_map):
-            for c, val in enumerate(row):
-                if val == 1:
-                    rect = pygame.Rect(c * CELL_SIZE, r * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-                    pygame.draw.rect(surface, MAZE_COLOR, rect, border_radius=3)
-        for r, c in self.pellets:
-            pygame.draw.circle(surface, WHITE, (c * CELL_SIZE + CELL_SIZE // 2, r * CELL_SIZE + CELL_SIZE // 2), 3)
-        for r, c in self.power_pellets:
-            pygame.draw.circle(surface, WHITE, (c * CELL_SIZE + CELL_SIZE // 2, r * CELL_SIZE + CELL_SIZE // 2), 6)
-        self.pac_man.draw(surface)
-        for ghost in self.ghosts:
-            ghost.draw(surface)
-
-        score_txt = FONT.render(f"Score: {self.score}", True, WHITE)
-        lives_txt = FONT.render(f"Lives: {self.lives}", True, WHITE)
+    def draw(self, surface, alpha=1.0):
+        """Draws the game; alpha is how far the frame lies between the last tick and the next."""
+        if self.renderer is None:
+            self.renderer = Renderer()
+        self.renderer.draw(self, surface, alpha)
+
+# --- Rendering ---
+# The maze is drawn in square chunks of CHUNK_CELLS cells, rendered on first
+# sight; only the MAX_CHUNKS most recently seen are kept, so memory does not
+# grow with the maze.
+CHUNK_CELLS = 16
+MAX_CHUNKS = 24
+
+def render_chunk(maze_map, pellets, chunk_r, chunk_c):
+    """Draws the walls and pellets of one maze chunk onto a new surface."""
+    size = CHUNK_CELLS * CELL_SIZE
+    surface = pygame.Surface((size, size)).convert()
+    surface.fill(BLACK)
+    r0, c0 = chunk_r * CHUNK_CELLS, chunk_c * CHUNK_CELLS
+    for r in range(r0, min(r0 + CHUNK_CELLS, len(maze_map))):
+        row = maze_map[r]
+        y = (r - r0) * CELL_SIZE
+        for c in range(c0, min(c0 + CHUNK_CELLS, len(row))):
+            x = (c - c0) * CELL_SIZE
+            if row[c] == 1:
+                pygame.draw.rect(surface, MAZE_COLOR, (x, y, CELL_SIZE, CELL_SIZE), border_radius=3)
+            else:
+                kind = pellets.kind(r, c)
+                if kind != NO_PELLET:
+                    center = (x + CELL_SIZE // 2, y + CELL_SIZE // 2)
+                    pygame.draw.circle(surface, WHITE, center, 6 if kind == CELL_POWER_PELLET else 3)
+    return surface
+
+def draw_pac_man_shape(surface, x, y, mouth_open, direction):
+    """Draws Pac-Man centered on (x, y)."""
+    radius = CELL_SIZE // 2 - 2
+    pygame.draw.circle(surface, YELLOW, (x, y), radius)
+
+    if mouth_open and direction != (0, 0):
+        mouth_half_angle = math.radians(30)
+        center_angle = 0
+        if direction == UP: center_angle = math.radians(90)
+        elif direction == LEFT: center_angle = math.radians(180)
+        elif direction == DOWN: center_angle = math.radians(270)
+        
+        p1_angle = center_angle - mouth_half_angle
+        p2_angle = center_angle + mouth_half_angle
+        
+        p1 = (x + radius * math.cos(p1_angle), y + radius * math.sin(p1_angle))
+        p2 = (x + radius * math.cos(p2_angle), y + radius * math.sin(p2_angle))
+        mouth_points = [(x, y), p1, p2]
+        pygame.draw.polygon(surface, BLACK, mouth_points)
+
+def draw_ghost_shape(surface, x, y, color, direction, eaten):
+    """Draws a ghost centered on (x, y), or just its eyes once eaten."""
+    radius = CELL_SIZE // 2 - 2
+    if eaten:
+        eye_radius = 4
+        pygame.draw.circle(surface, WHITE, (x - radius // 2, y - radius // 4), eye_radius)
+        pygame.draw.circle(surface, WHITE, (x + radius // 2, y - radius // 4), eye_radius)
+        pygame.draw.circle(surface, BLACK, (x - radius // 2 + direction[0]*2, y - radius // 4 + direction[1]*2), eye_radius // 2)
+        pygame.draw.circle(surface, BLACK, (x + radius // 2 + direction[0]*2, y - radius // 4 + direction[1]*2), eye_radius // 2)
+    else:
+        pygame.draw.circle(surface, color, (x, y - radius // 4), radius)
+        pygame.draw.rect(surface, color, (x - radius, y - radius // 4, radius * 2, radius + radius // 4))
+        leg_count = 4
+        leg_width = (radius * 2) / leg_count
+        for i in range(leg_count):
+            pygame.draw.circle(surface, color, (x - radius + (i * leg_width) + leg_width // 2, y + radius + 2), leg_width // 2 + 1)
+        eye_radius = 4
+        pygame.draw.circle(surface, WHITE, (x - radius // 2, y - radius // 4), eye_radius)
+        pygame.draw.circle(surface, WHITE, (x + radius // 2, y - radius // 4), eye_radius)
+        pupil_offset_x = direction[0] * 2
+        pupil_offset_y = direction[1] * 2
+        pygame.draw.circle(surface, BLACK, (x - radius // 2 + pupil_offset_x, y - radius // 4 + pupil_offset_y), eye_radius // 2)
+        pygame.draw.circle(surface, BLACK, (x + radius // 2 + pupil_offset_x, y - radius // 4 + pupil_offset_y), eye_radius // 2)
+
+class SpriteAtlas:
+    """Every Pac-Man and ghost visual state, pre-rendered once into a single surface.
+
+    Sprites are keyed by ('pac_man', mouth_open, direction), ('ghost', color,
+    direction) or ('eyes', direction); drawing an entity is one blit of its
+    sprite's area. States missing from the atlas are rendered on first use.
+    """
+    def __init__(self, ghost_colors):
+        self.size = CELL_SIZE + 8
+        keys = [('pac_man', False, (0, 0))] + [('pac_man', True, d) for d in DIRECTIONS]
+        for direction in DIRECTIONS + [(0, 0)]:
+            keys += [('ghost', color, direction) for color in ghost_colors]
+            keys.append(('eyes', direction))
+        self.surface = self.new_surface(self.size * len(keys))
+        self.rects = {}
+        for i, key in enumerate(keys):
+            self.rects[key] = pygame.Rect(i * self.size, 0, self.size, self.size)
+            self.render(self.surface, key, i * self.size + self.size // 2, self.size // 2)
+        self.extra = {}
+
+    def new_surface(self, width):
+        surface = pygame.Surface((width, self.size), pygame.SRCALPHA)
+        return surface.convert_alpha() if pygame.display.get_surface() else surface
+
+    def render(self, surface, key, x, y):
+        if key[0] == 'pac_man':
+            draw_pac_man_shape(surface, x, y, key[1], key[2])
+        elif key[0] == 'ghost':
+            draw_ghost_shape(surface, x, y, key[1], key[2], False)
+        else:
+            draw_ghost_shape(surface, x, y, None, key[1], True)
+
+    def blit(self, surface, key, pixel_pos):
+        if key[0] == 'pac_man' and not (key[1] and key[2] != (0, 0)):
+            key = ('pac_man', False, (0, 0))
+        dest = (int(pixel_pos[0]) - self.size // 2, int(pixel_pos[1]) - self.size // 2)
+        rect = self.rects.get(key)
+        if rect is not None:
+            surface.blit(self.surface, dest, rect)
+            return
+        sprite = self.extra.get(key)
+        if sprite is None:
+            sprite = self.extra[key] = self.new_surface(self.size)
+            self.render(sprite, key, self.size // 2, self.size // 2)
+        surface.blit(sprite, dest)
+
+_sprite_atlas = None
+_sprite_atlas_key = None
+
+def get_sprite_atlas():
+    """Returns the sprite atlas, rebuilding it if CELL_SIZE or any sprite color has changed."""
+    global _sprite_atlas, _sprite_atlas_key
+    key = (CELL_SIZE, YELLOW, BLACK, WHITE, RED, PINK, CYAN, ORANGE, SCARED_GHOST_COLOR)
+    if key != _sprite_atlas_key:
+        _sprite_atlas = SpriteAtlas([RED, PINK, CYAN, ORANGE, SCARED_GHOST_COLOR])
+        _sprite_atlas_key = key
+    return _sprite_atlas
+
+def get_cell_rect(r, c):
+    return pygame.Rect(c * CELL_SIZE, r * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+
+class Renderer:
+    """Draws a game onto the screen, repainting and pushing only what changed since the last frame.
+
+    The view above the HUD shows the part of the maze around Pac-Man: the
+    camera follows Pac-Man and stops at the edges of the maze, so a maze that
+    fits in the window never scrolls. The background under the view is
+    composed from the maze chunks in sight; eaten pellets are erased from it
+    and from the cached chunks. Entities outside the view are not drawn. A
+    full redraw happens when the maze is reset or the game state changes.
+    With on_screen=False it draws onto any surface and never updates the display.
+    """
+    def __init__(self, on_screen=True):
+        self.on_screen = on_screen
+        self.maze_map = None
+        self.pellets = None
+        self.pellet_generation = None
+        self.erased = 0
+        self.game_state = None
+        self.chunks = {}
+        self.camera = (0, 0)
+        self.background = pygame.Surface((WIDTH, HEIGHT)).convert()
+        self.entity_rects = []
+        self.hud_values = None
+        self.overlay = None
+        self.view = pygame.Rect(0, 0, WIDTH, ROWS * CELL_SIZE)
+        self.hud_rect = pygame.Rect(0, ROWS * CELL_SIZE, WIDTH, HEIGHT - ROWS * CELL_SIZE)
+
+    def draw(self, game, surface, alpha=1.0):
+        if (game.maze_map is not self.maze_map or game.pellets is not self.pellets
+                or game.pellets.generation != self.pellet_generation or game.game_state != self.game_state):
+            self.redraw(game, surface, alpha)
+            if self.overlay is not None: self.overlay.draw(surface)
+            self.present(None)
+            return
+        dirty = []
+        if game.game_state == GAME_STATE_PLAYING:
+            camera = self.camera_position(game, alpha)
+            if camera != self.camera:
+                dirty += self.scroll(game, surface, camera)
+            else:
+                dirty += self.draw_pellets(game, surface)
+            dirty += self.draw_entities(game, surface, alpha)
+            dirty += self.draw_hud(game, surface)
+        if self.overlay is not None:
+            dirty.append(self.overlay.draw(surface))
+        self.present(dirty)
+
+    def set_overlay(self, overlay):
+        """Shows an overlay (anything with draw(surface) -> rect) on top of the game, or removes it if None."""
+        self.overlay = overlay
+        self.game_state = None
+
+    def present(self, dirty):
+        """Pushes the changed rectangles to the display, or the whole screen if dirty is None."""
+        if not self.on_screen:
+            return
+        with PROFILER.span("flip"):
+            if dirty is None:
+                pygame.display.flip()
+            elif dirty:
+                pygame.display.update(dirty)
+
+    def camera_position(self, game, alpha=1.0):
+        """The maze pixel at the view's top left: Pac-Man in the middle, clamped to the maze."""
+        x, y = game.pac_man.render_pos(alpha)
+        max_x = max(0, len(game.maze_map[0]) * CELL_SIZE - self.view.width)
+        max_y = max(0, len(game.maze_map) * CELL_SIZE - self.view.height)
+        return (min(max(int(x) - self.view.width // 2, 0), max_x),
+                min(max(int(y) - self.view.height // 2, 0), max_y))
+
+    def redraw(self, game, surface, alpha=1.0):
+        """Repaints the whole screen, dropping the cached chunks if the maze or its pellets were reset."""
+        pellets = game.pellets
+        if game.maze_map is not self.maze_map or pellets is not self.pellets or pellets.generation != self.pellet_generation:
+            self.maze_map = game.maze_map
+            self.pellets = pellets
+            self.pellet_generation = pellets.generation
+            self.erased = len(pellets.eaten)
+            self.chunks.clear()
+        else:
+            self.erase_eaten(game)
+        self.game_state = game.game_state
+        self.camera = self.camera_position(game, alpha)
+        self.compose(game)
+        surface.blit(self.background, (0, 0))
+
+        self.entity_rects = []
+        self.draw_entities(game, surface, alpha)
+        self.hud_values = None
+        self.draw_hud(game, surface)
+        self.draw_message(game, surface)
+
+    def scroll(self, game, surface, camera):
+        """Moves the view to a new camera position; returns the changed rects."""
+        self.erase_eaten(game)
+        self.camera = camera
+        self.compose(game)
+        surface.blit(self.background, self.view, self.view)
+        self.entity_rects = []
+        return [self.view]
+
+    def compose(self, game):
+        """Paints the maze chunks in view onto the background."""
+        self.background.fill(BLACK)
+        self.background.set_clip(self.view)
+        size = CHUNK_CELLS * CELL_SIZE
+        cam_x, cam_y = self.camera
+        last_r = min(cam_y + self.view.height - 1, len(game.maze_map) * CELL_SIZE - 1) // size
+        last_c = min(cam_x + self.view.width - 1, len(game.maze_map[0]) * CELL_SIZE - 1) // size
+        for chunk_r in range(cam_y // size, last_r + 1):
+            for chunk_c in range(cam_x // size, last_c + 1):
+                self.background.blit(self.get_chunk(game, chunk_r, chunk_c), (chunk_c * size - cam_x, chunk_r * size - cam_y))
+        self.background.set_clip(None)
+
+    def get_chunk(self, game, chunk_r, chunk_c):
+        """Returns a chunk's surface, rendering it on a miss and evicting the least recently used."""
+        key = (chunk_r, chunk_c)
+        chunk = self.chunks.pop(key, None)
+        if chunk is None:
+            chunk = render_chunk(game.maze_map, game.pellets, chunk_r, chunk_c)
+        self.chunks[key] = chunk
+        if len(self.chunks) > MAX_CHUNKS:
+            del self.chunks[next(iter(self.chunks))]
+        return chunk
+
+    def erase_eaten(self, game):
+        """Erases pellets eaten since the last call from the cached chunks; returns their cells."""
+        eaten_log = game.pellets.eaten
+        if self.erased == len(eaten_log):
+            return []
+        eaten = eaten_log[self.erased:]
+        self.erased = len(eaten_log)
+        for r, c in eaten:
+            chunk = self.chunks.get((r // CHUNK_CELLS, c // CHUNK_CELLS))
+            if chunk is not None:
+                chunk.fill(BLACK, ((c % CHUNK_CELLS) * CELL_SIZE, (r % CHUNK_CELLS) * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+        return eaten
+
+    def draw_pellets(self, game, surface):
+        """Erases eaten pellets from the chunks, the background and the screen; returns the changed rects."""
+        dirty = []
+        cam_x, cam_y = self.camera
+        for r, c in self.erase_eaten(game):
+            rect = get_cell_rect(r, c).move(-cam_x, -cam_y).clip(self.view)
+            if rect:
+                self.background.fill(BLACK, rect)
+                surface.blit(self.background, rect, rect)
+                dirty.append(rect)
+        return dirty
+
+    def draw_entities(self, game, surface, alpha=1.0):
+        """Restores the background under last frame's entities and draws the ones in view again."""
+        for rect in self.entity_rects:
+            surface.blit(self.background, rect, rect)
+        dirty = self.entity_rects
+        self.entity_rects = []
+        camera, view = self.camera, self.view
+        surface.set_clip(view)
+        for entity in game.entities:
+            rect = entity.get_bounds(alpha, camera)
+            if view.colliderect(rect):
+                entity.draw(surface, alpha, camera)
+                self.entity_rects.append(rect.clip(view))
+        surface.set_clip(None)
+        return dirty + self.entity_rects
+
+    def draw_hud(self, game, surface):
+        """Re-renders the score and lives text only when they change."""
+        if self.hud_values == (game.score, game.lives):
+            return []
+        self.hud_values = (game.score, game.lives)
+        surface.blit(self.background, self.hud_rect, self.hud_rect)
+        score_txt = FONT.render(f"Score: {game.score}", True, WHITE)
+        lives_txt = FONT.render(f"Lives: {game.lives}", True, WHITE)
         surface.blit(score_txt, (10, ROWS * CELL_SIZE + 5))
         surface.blit(lives_txt, (WIDTH - lives_txt.get_width() - 10, ROWS * CELL_SIZE + 5))
+        return [self.hud_rect]
 
-        if self.game_state == GAME_STATE_START:
+    def draw_message(self, game, surface):
+        if game.game_state == GAME_STATE_START:
             start_txt = FONT.render("Press ENTER to Start", True, WHITE)
             start_rect = start_txt.get_rect(center=(WIDTH // 2, HEIGHT // 2))
             surface.blit(start_txt, start_rect)
-        elif self.game_state == GAME_STATE_GAME_OVER:
-            game_over_txt = FONT.render(self.game_over_message + " Press ENTER to Restart", True, WHITE)
+        elif game.game_state == GAME_STATE_GAME_OVER:
+            game_over_txt = FONT.render(game.game_over_message + " Press ENTER to Restart", True, WHITE)
             game_over_rect = game_over_txt.get_rect(center=(WIDTH // 2, HEIGHT // 2))
             surface.blit(game_over_txt, game_over_rect)
-        elif self.game_state == GAME_STATE_LEVEL_COMPLETE:
-            level_complete_txt = FONT.render(self.level_complete_message + " Press ENTER to Play Again", True, WHITE)
+        elif game.game_state == GAME_STATE_LEVEL_COMPLETE:
+            level_complete_txt = FONT.render(game.level_complete_message + " Press ENTER to Play Again", True, WHITE)
             level_complete_rect = level_complete_txt.get_rect(center=(WIDTH // 2, HEIGHT // 2))
             surface.blit(level_complete_txt, level_complete_rect)
 
-        pygame.display.flip()
+# --- Headless Simulation ---
+def run_headless(game=None, max_ticks=None, dt=FRAME_MS, policy=None):
+    """Steps a headless game as fast as possible until it ends or max_ticks is reached.
+
+    policy, if given, is called as policy(game) before every tick and may return
+    a (dr, dc) direction to queue for Pac-Man, or None to leave the input alone.
+    Returns the game.
+    """
+    if game is None:
+        game = Game(headless=True)
+    if game.game_state != GAME_STATE_PLAYING:
+        game.start_game()
+    ticks = 0
+    while game.game_state == GAME_STATE_PLAYING and (max_ticks is None or ticks < max_ticks):
+        if policy is not None:
+            direction = policy(game)
+            if direction is not None:
+                game.pac_man.set_queued_direction(*direction)
+        game.update(dt)
+        ticks += 1
+    return game
 
 # --- Main Game Loop ---
 if __name__ == "__main__":
-    game = Game()
+    if "--headless" in sys.argv:
+        start = time.perf_counter()
+        game = run_headless(max_ticks=100000, policy=lambda g: random.choice(DIRECTIONS) if g.pac_man.direction == (0, 0) else None)
+        elapsed = time.perf_counter() - start
+        print(f"Score: {game.score}  Lives: {game.lives}  Ticks: {game.ticks}  ({game.ticks / elapsed:.0f} ticks/sec)")
+        sys.exit()
+
+    level = None
+    if "--level" in sys.argv:
+        level = load_level(sys.argv[sys.argv.index("--level") + 1])
+    init_display()
+    game = Game(level=level)
+    recorder = None
+    if "--record" in sys.argv:
+        import replay
+        recorder = replay.ReplayRecorder(sys.argv[sys.argv.index("--record") + 1], game.seed, SIM_TICK_MS)
+    trace_path = None
+    if "--trace" in sys.argv:
+        trace_path = sys.argv[sys.argv.index("--trace") + 1]
+        PROFILER.enabled = True
+    pilot = None
+    if "--autopilot" in sys.argv:
+        import autopilot
+        budget = float(sys.argv[sys.argv.index("--autopilot-budget") + 1]) if "--autopilot-budget" in sys.argv else autopilot.DEFAULT_BUDGET_MS
+        processes = int(sys.argv[sys.argv.index("--autopilot-processes") + 1]) if "--autopilot-processes" in sys.argv else 1
+        pilot = autopilot.Autopilot(game, budget, processes=processes)
+        pilot.start()
+    # Frames per second to render at; 0 renders as fast as possible
+    fps = int(sys.argv[sys.argv.index("--fps") + 1]) if "--fps" in sys.argv else 60
+    overlay = None
+    accumulator = 0.0
+    inputs = []
+    first_frame = True
     running = True
     while running:
-        dt = CLOCK.tick(60)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            game.handle_input(event)
-        game.update(dt)
-        game.draw(SCREEN)
-
+        accumulator += min(CLOCK.tick(fps), MAX_FRAME_MS)
+        PROFILER.begin_frame()
+        with PROFILER.span("events"):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    overlay = None if overlay else ProfilerOverlay(PROFILER)
+                    PROFILER.enabled = overlay is not None or trace_path is not None
+                    if game.renderer: game.renderer.set_overlay(overlay)
+                code = game.handle_input(event)
+                if code is not None: inputs.append(code)
+        with PROFILER.span("update"):
+            while accumulator >= SIM_TICK_MS:
+                if pilot:
+                    code = pilot.attract_input(game, SIM_TICK_MS)
+                    if code is not None:
+                        game.apply_input(code)
+                        inputs.append(code)
+                # Inputs were applied as they arrived; a replay applies them before this tick
+                if recorder: recorder.record_tick(inputs)
+                inputs = []
+                game.update(SIM_TICK_MS)
+                accumulator -= SIM_TICK_MS
+        with PROFILER.span("draw"):
+            game.draw(SCREEN, accumulator / SIM_TICK_MS)
+        # The autopilot searches on its own thread while this frame is shown and the clock waits
+        if pilot: pilot.think()
+        if first_frame:
+            print(f"First frame after {(time.perf_counter() - LAUNCH_TIME) * 1000:.0f} ms", file=sys.stderr)
+            first_frame = False
+        PROFILER.end_frame()
+
+    if pilot: pilot.close()
+    if recorder: recorder.close(game)
+    if trace_path: PROFILER.export_chrome_trace(trace_path)
     pygame.quit()
     sys.exit()
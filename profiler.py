@@ -0,0 +1,180 @@
+"""Frame-time profiler with an on-screen overlay and Chrome trace export.
+
+Named timing spans are written into a fixed-size ring buffer, so profiling a
+long session never grows memory. While the profiler is disabled, span()
+hands back a shared no-op context manager and nothing is recorded.
+
+    python pacman_clone.py --trace trace.json   # open in chrome://tracing or Perfetto
+
+Press F3 in game to toggle the overlay.
+"""
+import json
+from array import array
+from contextlib import nullcontext
+from time import perf_counter_ns
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+_NULL_SPAN = nullcontext()
+FRAME_BUDGET_MS = 1000 / 60
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+
+    def __exit__(self, *exc):
+        self.profiler.add_span(self.name, self.start)
+
+
+class FrameProfiler:
+    """Records named spans and per-frame times into ring buffers."""
+
+    def __init__(self, capacity=16384, frame_capacity=240):
+        self.enabled = False
+        self.capacity = capacity
+        self.span_names = [None] * capacity
+        self.span_starts = array('q', [0]) * capacity
+        self.span_durations = array('q', [0]) * capacity
+        self.span_count = 0
+        self.frame_capacity = frame_capacity
+        self.frame_times = array('d', [0.0]) * frame_capacity
+        self.frame_first_span = array('q', [0]) * frame_capacity
+        self.frame_count = 0
+        self.frame_start = None
+        self.origin = perf_counter_ns()
+
+    def span(self, name):
+        """Returns a context manager timing its body as a span called name."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def add_span(self, name, start, end=None):
+        if end is None:
+            end = perf_counter_ns()
+        i = self.span_count % self.capacity
+        self.span_names[i] = name
+        self.span_starts[i] = start
+        self.span_durations[i] = end - start
+        self.span_count += 1
+
+    def begin_frame(self):
+        if not self.enabled:
+            self.frame_start = None
+            return
+        self.frame_start = perf_counter_ns()
+        self.frame_first_span[self.frame_count % self.frame_capacity] = self.span_count
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+        end = perf_counter_ns()
+        self.frame_times[self.frame_count % self.frame_capacity] = (end - self.frame_start) / 1e6
+        self.frame_count += 1
+        self.add_span("frame", self.frame_start, end)
+
+    def recent_frame_times(self):
+        """Returns the recorded frame times in ms, oldest first."""
+        n = min(self.frame_count, self.frame_capacity)
+        return [self.frame_times[(self.frame_count - n + i) % self.frame_capacity] for i in range(n)]
+
+    def percentiles(self, fractions=(0.5, 0.95, 0.99)):
+        times = sorted(self.recent_frame_times())
+        if not times:
+            return [0.0 for _ in fractions]
+        return [times[min(len(times) - 1, int(f * len(times)))] for f in fractions]
+
+    def stage_breakdown(self, frames=120):
+        """Returns {span name: mean ms per frame} over the last few frames.
+
+        Time spent in a nested span (flip inside draw, each ghost inside update)
+        counts only towards the innermost one, so the stages never add up to
+        more than the frame time.
+        """
+        frames = min(frames, self.frame_count, self.frame_capacity)
+        if not frames:
+            return {}
+        first = self.frame_first_span[(self.frame_count - frames) % self.frame_capacity]
+        first = max(first, self.span_count - self.capacity)
+        totals = {}
+        # Spans are recorded as they end, so a span's children come just before
+        # it: the spans on the stack that started after it did.
+        stack = []
+        for n in range(first, self.span_count):
+            i = n % self.capacity
+            start, duration = self.span_starts[i], self.span_durations[i]
+            own = duration
+            while stack and stack[-1][0] >= start:
+                own -= stack.pop()[1]
+            stack.append((start, duration))
+            name = self.span_names[i]
+            if name != "frame":
+                totals[name] = totals.get(name, 0) + own
+        return {name: total / 1e6 / frames for name, total in totals.items()}
+
+    def chrome_trace(self):
+        """Returns the buffered spans in Chrome's trace-event format."""
+        events = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": "main"}}]
+        for n in range(max(0, self.span_count - self.capacity), self.span_count):
+            i = n % self.capacity
+            events.append({
+                "name": self.span_names[i], "ph": "X", "pid": 1, "tid": 1,
+                "ts": (self.span_starts[i] - self.origin) / 1000,
+                "dur": self.span_durations[i] / 1000,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+
+class ProfilerOverlay:
+    """Draws a frame-time graph, percentiles and a per-stage breakdown in a corner of the screen."""
+
+    def __init__(self, profiler, width=260, graph_height=60):
+        self.profiler = profiler
+        self.font = pygame.font.Font(None, 18)
+        self.width = width
+        self.graph_height = graph_height
+        self.height = 0
+
+    def draw(self, surface):
+        """Draws the overlay and returns the rect it covers."""
+        profiler = self.profiler
+        breakdown = sorted(profiler.stage_breakdown().items(), key=lambda item: -item[1])
+        line_height = self.font.get_linesize()
+        # Never shrink, so a stage dropping out of the breakdown leaves nothing stale behind.
+        self.height = max(self.height, self.graph_height + line_height * (len(breakdown) + 1) + 12)
+        rect = pygame.Rect(4, 4, self.width, self.height)
+        surface.fill((0, 0, 0), rect)
+
+        # Frame-time graph, scaled so the frame budget sits at half height.
+        graph = pygame.Rect(rect.x + 4, rect.y + 4, rect.width - 8, self.graph_height)
+        scale = graph.height / (2 * FRAME_BUDGET_MS)
+        budget_y = graph.bottom - int(FRAME_BUDGET_MS * scale)
+        pygame.draw.line(surface, (90, 90, 90), (graph.left, budget_y), (graph.right, budget_y))
+        times = profiler.recent_frame_times()[-graph.width:]
+        for x, ms in enumerate(times):
+            height = min(graph.height, max(1, int(ms * scale)))
+            color = (80, 220, 80) if ms <= FRAME_BUDGET_MS else (240, 80, 80)
+            pygame.draw.line(surface, color, (graph.left + x, graph.bottom), (graph.left + x, graph.bottom - height))
+
+        p50, p95, p99 = profiler.percentiles()
+        lines = [f"frame p50 {p50:.2f}  p95 {p95:.2f}  p99 {p99:.2f} ms"]
+        lines += [f"  {name:<12} {ms:6.3f} ms" for name, ms in breakdown]
+        y = graph.bottom + 4
+        for line in lines:
+            surface.blit(self.font.render(line, True, (230, 230, 230)), (rect.x + 4, y))
+            y += line_height
+        return rect
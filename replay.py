@@ -0,0 +1,152 @@
+"""Deterministic game recordings and fast headless replay.
+
+A recording holds the game's RNG seed, its fixed tick length and the player
+inputs of every tick, so replaying it through Game.update reproduces the game
+exactly. The final score and a checksum of the full game state are stored
+too, which lets a replay double as a regression test:
+
+    python pacman_clone.py --record run.pmr   # play and record
+    python replay.py run.pmr                  # replay headless and verify
+
+File layout: a fixed header (magic, version, seed, tick count, final score,
+lives, game state, state checksum, tick length in ms as a double and the
+size of the level) followed by the zlib-compressed level and ticks. The
+level is the maze the game was played on, compiled (see levels.py), so a
+recording replays on its own maze wherever it is opened. Each tick is the
+number of inputs (uint8) and one byte per input code (see
+pacman_clone.INPUT_START).
+
+Version 2 files have no level and were played on the classic maze.
+Version 1 files, from before the fixed timestep, also have no tick length in
+the header and store each tick's frame time (uint16 ms) before its inputs.
+Their entities moved one 60 Hz step per tick, so they replay with
+move_dt=FRAME_MS.
+"""
+import sys, struct, time, zlib
+
+from pacman_clone import Game, FRAME_MS
+from levels import LevelError, compile_level, read_compiled, validate_level
+
+MAGIC = b"PMRP"
+VERSION = 3
+HEADER = struct.Struct("<4sBIQqiBIdI")
+HEADER_V2 = struct.Struct("<4sBIQqiBId")
+HEADER_V1 = struct.Struct("<4sBIQqiBI")
+TICK_V1 = struct.Struct("<HB")
+
+
+class ReplayRecorder:
+    """Collects the ticks of a live game and writes them out on close()."""
+
+    def __init__(self, path, seed, dt):
+        self.path = path
+        self.seed = seed
+        self.dt = dt
+        self.ticks = 0
+        self.data = bytearray()
+
+    def record_tick(self, inputs):
+        self.data.append(len(inputs))
+        self.data += bytes(inputs)
+        self.ticks += 1
+
+    def close(self, game):
+        level = compile_level(game.level)
+        header = HEADER.pack(MAGIC, VERSION, self.seed, self.ticks, game.score, game.lives, game.game_state,
+                             game.state_checksum(), self.dt, len(level))
+        with open(self.path, "wb") as f:
+            f.write(header)
+            f.write(zlib.compress(level + bytes(self.data), 9))
+
+
+class Replay:
+    """A loaded recording."""
+
+    def __init__(self, seed, num_ticks, score, lives, game_state, checksum, data, dt=None, level=None):
+        self.seed = seed
+        self.dt = dt
+        self.num_ticks = num_ticks
+        self.score = score
+        self.lives = lives
+        self.game_state = game_state
+        self.checksum = checksum
+        self.data = data
+        # The maze to replay on; None for the classic maze
+        self.level = level
+        # What Game.update should move entities by; None moves them by each tick's dt
+        self.move_dt = FRAME_MS if dt is None else None
+
+    def ticks(self):
+        """Yields (dt, inputs) for every recorded tick."""
+        data, offset, dt = self.data, 0, self.dt
+        for _ in range(self.num_ticks):
+            if self.dt is None:
+                dt, count = TICK_V1.unpack_from(data, offset)
+                offset += TICK_V1.size
+            else:
+                count = data[offset]
+                offset += 1
+            yield dt, data[offset:offset + count]
+            offset += count
+
+
+def load_replay(path):
+    with open(path, "rb") as f:
+        blob = f.read()
+    magic, version = blob[:4], blob[4:5]
+    if magic != MAGIC or version not in (b"\x01", b"\x02", bytes([VERSION])):
+        raise ValueError(f"{path} is not a version 1 to {VERSION} replay file")
+    if version == b"\x01":
+        _, _, seed, num_ticks, score, lives, game_state, checksum = HEADER_V1.unpack_from(blob)
+        return Replay(seed, num_ticks, score, lives, game_state, checksum, zlib.decompress(blob[HEADER_V1.size:]))
+    if version == b"\x02":
+        _, _, seed, num_ticks, score, lives, game_state, checksum, dt = HEADER_V2.unpack_from(blob)
+        return Replay(seed, num_ticks, score, lives, game_state, checksum, zlib.decompress(blob[HEADER_V2.size:]), dt)
+    _, _, seed, num_ticks, score, lives, game_state, checksum, dt, level_size = HEADER.unpack_from(blob)
+    data = zlib.decompress(blob[HEADER.size:])
+    compiled = read_compiled(data[:level_size])
+    try:
+        if compiled is None:
+            raise LevelError("not a compiled level")
+        validate_level(compiled[0])
+    except LevelError as e:
+        raise ValueError(f"{path}: the recorded level is damaged ({e})")
+    return Replay(seed, num_ticks, score, lives, game_state, checksum, data[level_size:], dt, compiled[0])
+
+
+def run_replay(replay, game=None):
+    """Re-runs a recording headless at full speed; returns the finished game."""
+    if game is None:
+        game = Game(headless=True, seed=replay.seed, level=replay.level)
+    for dt, inputs in replay.ticks():
+        for code in inputs:
+            game.apply_input(code)
+        game.update(dt, replay.move_dt)
+    return game
+
+
+def verify_replay(replay, game):
+    """Returns a list of the differences between a replayed game and its recording."""
+    expected = {"score": replay.score, "lives": replay.lives, "game_state": replay.game_state, "checksum": replay.checksum}
+    actual = {"score": game.score, "lives": game.lives, "game_state": game.game_state, "checksum": game.state_checksum()}
+    return [f"{key}: expected {expected[key]}, got {actual[key]}" for key in expected if expected[key] != actual[key]]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python replay.py REPLAY_FILE...")
+        sys.exit(2)
+    failed = False
+    for path in sys.argv[1:]:
+        replay = load_replay(path)
+        start = time.perf_counter()
+        game = run_replay(replay)
+        elapsed = time.perf_counter() - start
+        problems = verify_replay(replay, game)
+        failed = failed or bool(problems)
+        speedup = sum(dt for dt, _ in replay.ticks()) / 1000 / elapsed if elapsed else float("inf")
+        print(f"{path}: {'OK' if not problems else 'MISMATCH'}  score {game.score}  "
+              f"{replay.num_ticks} ticks in {elapsed:.3f}s ({replay.num_ticks / elapsed:.0f} ticks/sec, {speedup:.0f}x real time)")
+        for problem in problems:
+            print("  " + problem)
+    sys.exit(1 if failed else 0)
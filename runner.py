@@ -0,0 +1,217 @@
+"""Runs many seeded headless games across a process pool.
+
+Used to evaluate Pac-Man policies and ghost tuning. Every game is fully
+determined by its seed, policy and parameters, so any result can be re-run
+on its own. Results stream back as small tuples while the games finish and
+are summarized per parameter set:
+
+    python runner.py --games 2000 --policy greedy
+    python runner.py --games 500 --sweep fright_duration=4000,7000,10000 --sweep ghost_speed=0.08,0.1 --out results.jsonl
+
+A policy is a factory called as factory(rng) once per game; it returns a
+function called as policy(game) before every tick that gives a direction to
+queue for Pac-Man, or None to leave the input alone (see run_headless).
+Built-in policies are listed in POLICIES; others can be given as
+"module:function".
+"""
+import sys, json, time, random, argparse, importlib, itertools, statistics
+from collections import deque
+from multiprocessing import Pool, cpu_count
+
+from pacman_clone import Game, DIRECTIONS, manhattan_distance, run_headless
+from autopilot import autopilot_policy
+
+# Tunable parameters and the defaults the game ships with.
+PARAMS = {
+    "mode_duration_scatter": 7000,
+    "mode_duration_chase": 20000,
+    "fright_duration": 7000,
+    "pac_man_speed": 0.1,
+    "ghost_speed": 0.1,
+    "frightened_speed": 0.05,
+    "eaten_speed": 0.2,
+}
+
+
+# --- Policies ---
+def random_policy(rng):
+    """Turns at random whenever Pac-Man is stuck, and now and then anyway."""
+    def policy(game):
+        if game.pac_man.direction == (0, 0) or rng.random() < 0.02:
+            return rng.choice(DIRECTIONS)
+        return None
+    return policy
+
+def greedy_policy(rng):
+    """Heads for the nearest pellet along the maze, keeping two cells clear of dangerous ghosts."""
+    state = {"cell": None, "direction": None}
+
+    def policy(game):
+        cell = tuple(game.pac_man.grid_pos)
+        threatened = any(manhattan_distance(cell, ghost.grid_pos) <= 4 for ghost in game.ghosts
+                         if not ghost.frightened and not ghost.eaten)
+        if cell == state["cell"] and game.pac_man.direction != (0, 0) and not threatened:
+            return state["direction"]
+        state["cell"] = cell
+        state["direction"] = nearest_pellet_direction(game, cell) or rng.choice(DIRECTIONS)
+        return state["direction"]
+    return policy
+
+def nearest_pellet_direction(game, start):
+    """Returns the first step of the shortest safe path to a pellet, or None."""
+    nav = game.nav
+    danger = set()
+    for ghost in game.ghosts:
+        if not ghost.frightened and not ghost.eaten:
+            gr, gc = ghost.grid_pos
+            near = {(gr, gc)}
+            for _ in range(2):
+                near.update([n for cell in near for n in nav.neighbours(*cell)])
+            danger |= near
+    seen = {start}
+    queue = deque()
+    for dx, dy in nav.exit_dirs[start[0]][start[1]]:
+        cell = (start[0] + dy, start[1] + dx)
+        if cell not in danger:
+            seen.add(cell)
+            queue.append((cell, (dx, dy)))
+    while queue:
+        cell, first = queue.popleft()
+        if cell in game.pellets:
+            return first
+        for dx, dy in nav.exit_dirs[cell[0]][cell[1]]:
+            nxt = (cell[0] + dy, cell[1] + dx)
+            if nxt not in seen and nxt not in danger:
+                seen.add(nxt)
+                queue.append((nxt, first))
+    return None
+
+POLICIES = {
+    "random": random_policy,
+    "greedy": greedy_policy,
+    "autopilot": autopilot_policy,
+}
+
+def resolve_policy(name):
+    if name in POLICIES:
+        return POLICIES[name]
+    module, _, attr = name.partition(":")
+    if not attr:
+        raise ValueError(f"unknown policy {name!r}; use one of {sorted(POLICIES)} or module:function")
+    return getattr(importlib.import_module(module), attr)
+
+
+# --- Games ---
+def apply_params(game, params):
+    """Applies tuning parameters to a freshly started game."""
+    game.fright_duration = params["fright_duration"]
+    game.pac_man.speed = params["pac_man_speed"]
+    for ghost in game.ghosts:
+        ghost.mode_duration_scatter = params["mode_duration_scatter"]
+        ghost.mode_duration_chase = params["mode_duration_chase"]
+        ghost.normal_speed = ghost.speed = params["ghost_speed"]
+        ghost.frightened_speed = params["frightened_speed"]
+        ghost.eaten_speed = params["eaten_speed"]
+
+def play_game(task):
+    """Plays one game; returns (param_set, seed, score, ticks, pellets_eaten, deaths, won)."""
+    param_set, seed, policy_name, params, max_ticks = task
+    game = Game(headless=True, seed=seed)
+    game.start_game()
+    apply_params(game, params)
+    pellets = len(game.pellets)
+    policy = resolve_policy(policy_name)(random.Random(seed))
+    run_headless(game, max_ticks=max_ticks, policy=policy)
+    won = not game.pellets
+    return param_set, seed, game.score, game.ticks, pellets - len(game.pellets), 3 - game.lives, won
+
+def run_games(tasks, processes=None):
+    """Plays every task across a process pool, yielding results as they finish (in no particular order)."""
+    tasks = list(tasks)
+    processes = processes or cpu_count()
+    if processes == 1:
+        yield from map(play_game, tasks)
+        return
+    # Large chunks keep IPC low; enough of them keep every worker busy to the end.
+    chunksize = max(1, len(tasks) // (processes * 8))
+    with Pool(processes) as pool:
+        yield from pool.imap_unordered(play_game, tasks, chunksize)
+
+def make_tasks(param_sets, games, policy, max_ticks, seed=0):
+    """One task per game per parameter set; every parameter set sees the same seeds."""
+    for i, params in enumerate(param_sets):
+        for n in range(games):
+            yield i, seed + n, policy, params, max_ticks
+
+def sweep_param_sets(sweeps):
+    """Expands {"name": [values]} into every combination, on top of the defaults."""
+    names = list(sweeps)
+    return [dict(PARAMS, **dict(zip(names, values))) for values in itertools.product(*(sweeps[name] for name in names))]
+
+
+# --- Summaries ---
+def summarize(results):
+    """Summary statistics for a list of result tuples from one parameter set."""
+    scores = [r[2] for r in results]
+    ticks = [r[3] for r in results]
+    return {
+        "games": len(results),
+        "score_mean": statistics.fmean(scores),
+        "score_stdev": statistics.pstdev(scores),
+        "score_min": min(scores),
+        "score_median": statistics.median(scores),
+        "score_max": max(scores),
+        "ticks_mean": statistics.fmean(ticks),
+        "pellets_mean": statistics.fmean(r[4] for r in results),
+        "deaths_mean": statistics.fmean(r[5] for r in results),
+        "win_rate": sum(r[6] for r in results) / len(results),
+    }
+
+def parse_sweep(text):
+    name, _, values = text.partition("=")
+    if name not in PARAMS or not values:
+        raise argparse.ArgumentTypeError(f"expected NAME=V1,V2,... with NAME one of {', '.join(PARAMS)}")
+    return name, [type(PARAMS[name])(float(v)) for v in values.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play many seeded headless games in parallel and summarize the results.")
+    parser.add_argument("--games", type=int, default=1000, help="games per parameter set")
+    parser.add_argument("--policy", default="greedy", help=f"one of {sorted(POLICIES)} or module:function")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--max-ticks", type=int, default=50000, help="stop games that run longer than this")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--sweep", type=parse_sweep, action="append", default=[], help="NAME=V1,V2,... parameter values to try")
+    parser.add_argument("--out", help="stream per-game results to this JSON lines file")
+    args = parser.parse_args()
+    resolve_policy(args.policy)
+
+    param_sets = sweep_param_sets(dict(args.sweep))
+    tasks = make_tasks(param_sets, args.games, args.policy, args.max_ticks, args.seed)
+    total = len(param_sets) * args.games
+    results = [[] for _ in param_sets]
+    out = open(args.out, "w") if args.out else None
+    start = time.perf_counter()
+    for done, result in enumerate(run_games(tasks, args.processes), 1):
+        results[result[0]].append(result)
+        if out:
+            out.write(json.dumps(dict(zip(("param_set", "seed", "score", "ticks", "pellets_eaten", "deaths", "won"), result))) + "\n")
+        if done % 100 == 0 or done == total:
+            print(f"\r{done}/{total} games", end="", file=sys.stderr, flush=True)
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    if out:
+        out.close()
+
+    print(f"{total} games in {elapsed:.1f}s ({total / elapsed:.1f} games/sec)")
+    swept = [name for name, _ in args.sweep]
+    for params, param_results in zip(param_sets, results):
+        label = ", ".join(f"{name}={params[name]}" for name in swept) or "defaults"
+        stats = summarize(param_results)
+        print(f"{label}: score {stats['score_mean']:.0f} +/- {stats['score_stdev']:.0f} "
+              f"(median {stats['score_median']:.0f}, max {stats['score_max']})  ticks {stats['ticks_mean']:.0f}  "
+              f"pellets {stats['pellets_mean']:.0f}  deaths {stats['deaths_mean']:.2f}  wins {stats['win_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
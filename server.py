@@ -0,0 +1,524 @@
+"""Local game server: one authoritative game streamed to spectators and players.
+
+    python server.py serve --port 8765 --autopilot             # a demo game for spectators
+    python server.py serve --unix /tmp/pacman.sock --ghost-player blinky
+    python server.py watch --host 127.0.0.1 --port 8765        # open a window on the game
+    python server.py watch --unix /tmp/pacman.sock --play ghost
+
+The server steps the game in fixed SIM_TICK_MS ticks on an asyncio loop and
+every BROADCAST_TICKS ticks sends each client what changed since the last
+broadcast: score, lives and game state, the pellets eaten and the entities
+that moved or changed look. Nothing is sent while nothing changes. A client
+that joins, or falls behind, gets a keyframe instead: a zlib-compressed
+Game.snapshot(), which it restores into its own copy of the game. Each
+broadcast is encoded once and the same bytes go to every client. Clients
+are throttled by a token bucket of CLIENT_RATE bytes per second, and any
+client whose socket has more than MAX_BUFFERED bytes waiting is skipped
+until it drains and then resynchronized by keyframe, so a slow client costs
+the server bounded memory and bandwidth and never holds up the others.
+
+One client may play Pac-Man (otherwise the autopilot can, with --autopilot)
+and, with --ghost-player, one may steer that ghost: it takes the turns the
+player asks for at junctions and follows its usual AI the rest of the time.
+Clients draw with the game's Renderer and interpolate entities between the
+last two updates, so movement stays smooth at the broadcast rate.
+
+Every message is a FRAME header (type, payload length) and a payload:
+    HELLO     client -> server  magic, version, requested role
+    WELCOME   server -> client  magic, version, granted role, broadcast interval;
+                                then the zlib-compressed compiled level (see levels.py)
+    KEYFRAME  server -> client  broadcast tick; then a zlib-compressed Game.snapshot()
+    DELTA     server -> client  DELTA_HEADER; then PELLET per pellet eaten and
+                                ENTITY_MOVE per changed entity (index into game.entities)
+    INPUT     client -> server  an input code (see pacman_clone.INPUT_START)
+"""
+import sys, time, zlib, struct, asyncio, argparse
+
+import pacman_clone
+from pacman_clone import (
+    Game, Ghost, Renderer, UP, DOWN, LEFT, RIGHT, DIRECTIONS, DIRECTION_INDEX, DIRECTION_BY_INDEX, GHOST_COLORS, INPUT_START,
+    SCARED_GHOST_COLOR, BLACK, SIM_TICK_MS, MAX_FRAME_MS, GAME_STATE_PLAYING, GAME_STATE_GAME_OVER,
+    GAME_STATE_LEVEL_COMPLETE,
+)
+from levels import GHOST_TYPES, LevelError, compile_level, read_compiled, validate_level, load_level
+
+MAGIC = b"PMNP"
+PROTOCOL_VERSION = 1
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+MSG_HELLO, MSG_WELCOME, MSG_KEYFRAME, MSG_DELTA, MSG_INPUT = range(5)
+ROLE_SPECTATOR, ROLE_PAC_MAN, ROLE_GHOST = range(3)
+ROLE_NAMES = {"spectator": ROLE_SPECTATOR, "pacman": ROLE_PAC_MAN, "ghost": ROLE_GHOST}
+
+FRAME = struct.Struct("<BI")
+HELLO = struct.Struct("<4sBB")
+WELCOME = struct.Struct("<4sBBd")
+KEYFRAME = struct.Struct("<I")
+# Broadcast tick, score, lives, game state, pellets eaten, entity moves
+DELTA_HEADER = struct.Struct("<IqhBHH")
+PELLET = struct.Struct("<HH")
+# Entity index, grid row and column, pixel x and y, direction index, flags
+ENTITY_MOVE = struct.Struct("<HhhffBB")
+INPUT = struct.Struct("<B")
+
+# ENTITY_MOVE flags: a ghost's frightened and eaten state and colour (0 own,
+# 1 scared, 2 eyes only) in bits 0-3, Pac-Man's mouth in bit 4
+FRIGHTENED, EATEN, MOUTH_OPEN = 1, 2, 16
+GHOST_COLOR_SHIFT = 2
+
+BROADCAST_TICKS = 4
+CLIENT_RATE = 32 * 1024
+CLIENT_BURST = 16 * 1024
+MAX_BUFFERED = 64 * 1024
+# How long a finished game stays on show before the server starts the next, without a Pac-Man player
+RESTART_MS = 3000
+HELLO_TIMEOUT_S = 5
+MAX_CLIENT_MESSAGE = 64
+MAX_SERVER_MESSAGE = 64 * 1024 * 1024
+
+
+class ProtocolError(ValueError):
+    """A peer that sent something this protocol does not allow."""
+
+
+def frame(kind, payload):
+    return FRAME.pack(kind, len(payload)) + payload
+
+async def read_frame(reader, max_length):
+    kind, length = FRAME.unpack(await reader.readexactly(FRAME.size))
+    if length > max_length:
+        raise ProtocolError(f"message of {length} bytes is over the limit of {max_length}")
+    return kind, await reader.readexactly(length)
+
+def entity_state(entity):
+    """What a client needs to draw an entity, as packed in ENTITY_MOVE after the index."""
+    if isinstance(entity, Ghost):
+        color = 0 if entity.color == entity.original_color else 1 if entity.color == SCARED_GHOST_COLOR else 2
+        flags = entity.frightened * FRIGHTENED | entity.eaten * EATEN | color << GHOST_COLOR_SHIFT
+    else:
+        flags = entity.mouth_open * MOUTH_OPEN
+    return (entity.grid_pos[0], entity.grid_pos[1], entity.pixel_pos[0], entity.pixel_pos[1],
+            DIRECTION_INDEX[entity.direction], flags)
+
+
+# --- Server ---
+class PlayerGhost(Ghost):
+    """A ghost that takes the turn a player last asked for wherever it can, and
+    otherwise (and always on its way home after being eaten) follows the AI."""
+    __slots__ = ("wish",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wish = (0, 0)
+
+    def choose_direction(self, nav, pac_man_pos, pac_man_dir, blinky_pos):
+        r, c = self.grid_pos
+        if not self.eaten and self.wish in nav.choices[r][c][DIRECTION_INDEX[self.direction]]:
+            self.set_direction(*self.wish)
+        else:
+            super().choose_direction(nav, pac_man_pos, pac_man_dir, blinky_pos)
+
+class ServerGame(Game):
+    """The authoritative headless game; ghost_player names a ghost to be a PlayerGhost."""
+
+    def __init__(self, level=None, seed=None, ghost_player=None):
+        self.ghost_player = ghost_player
+        super().__init__(headless=True, seed=seed, level=level)
+
+    def reset_game(self):
+        super().reset_game()
+        self.player_ghost = None
+        if self.ghost_player is not None:
+            level, ghost_type = self.level, self.ghost_player
+            ghost = PlayerGhost(level.ghost_spawns[ghost_type], GHOST_COLORS[ghost_type], ghost_type,
+                                level.ghost_scatter[ghost_type], level.ghost_house, self.rng)
+            self.ghosts[GHOST_TYPES.index(ghost_type)] = ghost
+            setattr(self, ghost_type, ghost)
+            self.entities = self.pac_men + self.ghosts
+            self.player_ghost = ghost
+
+
+class ClientConnection:
+    """A connected client: its role, its socket and what it may still send."""
+
+    def __init__(self, writer, role, rate, burst):
+        self.writer = writer
+        self.role = role
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.refilled = time.perf_counter()
+        self.synced = False
+        self.bytes_sent = 0
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+
+    def send(self, data):
+        self.writer.write(data)
+        self.tokens -= len(data)
+        self.bytes_sent += len(data)
+
+
+class GameServer:
+    """Runs a ServerGame and streams it to every client that connects (see the module docstring)."""
+
+    def __init__(self, level=None, seed=None, ghost_player=None, autopilot_budget_ms=None,
+                 broadcast_ticks=BROADCAST_TICKS, client_rate=CLIENT_RATE, client_burst=CLIENT_BURST):
+        self.game = ServerGame(level, seed, ghost_player)
+        self.broadcast_ticks = broadcast_ticks
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.clients = []
+        self.pac_man_player = None
+        self.ghost_player = None
+        self.ticks = 0
+        self.idle_ms = 0
+        self.welcome_level = zlib.compress(compile_level(self.game.level))
+        # What the clients were last sent; the next delta is relative to it
+        self.sent_generation = None
+        self.sent_eaten = 0
+        self.sent_header = None
+        self.sent_states = []
+        self.pilot = None
+        if autopilot_budget_ms is not None:
+            import autopilot
+            self.pilot = autopilot.Autopilot(self.game, autopilot_budget_ms)
+            # Search on the pilot's own thread, so the event loop never waits for it
+            self.pilot.start()
+        self.game.start_game()
+
+    async def listen(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        """Accepts clients over TCP, or over a Unix socket at path; returns the asyncio server."""
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle_connection, path)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self):
+        """Hangs up on every client and stops the autopilot."""
+        for client in self.clients:
+            client.writer.close()
+        if self.pilot is not None:
+            self.pilot.close()
+
+    async def run(self, ticks=None):
+        """Steps the game in real time, broadcasting as it goes; stops after ticks ticks, if given."""
+        loop = asyncio.get_running_loop()
+        tick_s = SIM_TICK_MS / 1000
+        next_time = loop.time()
+        end = None if ticks is None else self.ticks + ticks
+        while end is None or self.ticks < end:
+            self.tick()
+            next_time += tick_s
+            delay = next_time - loop.time()
+            if delay < -MAX_FRAME_MS / 1000:
+                # Too far behind to catch up: drop the lost time rather than rushing through it
+                next_time = loop.time()
+            await asyncio.sleep(max(0, delay))
+
+    def tick(self):
+        game = self.game
+        if game.game_state == GAME_STATE_PLAYING:
+            self.idle_ms = 0
+            if self.pilot is not None and self.pac_man_player is None:
+                direction = self.pilot.step(game)
+                if direction is not None:
+                    game.pac_man.set_queued_direction(*direction)
+        elif self.pac_man_player is None:
+            self.idle_ms += SIM_TICK_MS
+            if self.idle_ms >= RESTART_MS:
+                game.start_game()
+        game.update(SIM_TICK_MS)
+        self.ticks += 1
+        if self.ticks % self.broadcast_ticks == 0:
+            self.broadcast()
+            if self.pilot is not None and self.pac_man_player is None:
+                self.pilot.think()
+
+    def apply_input(self, client, code):
+        game = self.game
+        if client.role == ROLE_PAC_MAN and code <= INPUT_START:
+            game.apply_input(code)
+        elif client.role == ROLE_GHOST and code < len(DIRECTIONS) and game.player_ghost is not None:
+            game.player_ghost.wish = DIRECTIONS[code]
+
+    # --- Streaming ---
+    def broadcast(self):
+        """Sends every client the changes since the last broadcast, or a keyframe if it needs one."""
+        game = self.game
+        if game.pellets.generation != self.sent_generation:
+            # A new game: everyone starts again from a keyframe
+            self.sent_generation = game.pellets.generation
+            self.sent_eaten = len(game.pellets.eaten)
+            self.sent_states = [entity_state(entity) for entity in game.entities]
+            self.sent_header = None
+            for client in self.clients:
+                client.synced = False
+        delta = self.encode_delta()
+        keyframe = None
+        now = time.perf_counter()
+        for client in self.clients:
+            client.refill(now)
+            transport = client.writer.transport
+            if transport.is_closing() or transport.get_write_buffer_size() > MAX_BUFFERED:
+                client.synced = False
+                continue
+            if client.synced:
+                if delta is None:
+                    continue
+                if client.tokens >= len(delta):
+                    client.send(delta)
+                    continue
+                client.synced = False
+            if keyframe is None:
+                keyframe = self.encode_keyframe()
+            if client.tokens >= min(len(keyframe), client.burst):
+                client.send(keyframe)
+                client.synced = True
+
+    def encode_delta(self):
+        """The DELTA message since the last broadcast, or None if nothing changed."""
+        game = self.game
+        eaten_log = game.pellets.eaten
+        eaten = eaten_log[self.sent_eaten:]
+        self.sent_eaten = len(eaten_log)
+        moves = []
+        for i, entity in enumerate(game.entities):
+            state = entity_state(entity)
+            if state != self.sent_states[i]:
+                self.sent_states[i] = state
+                moves.append(ENTITY_MOVE.pack(i, *state))
+        header = (game.score, game.lives, game.game_state)
+        if not eaten and not moves and header == self.sent_header:
+            return None
+        self.sent_header = header
+        parts = [DELTA_HEADER.pack(self.ticks, *header, len(eaten), len(moves))]
+        parts += [PELLET.pack(r, c) for r, c in eaten]
+        parts += moves
+        return frame(MSG_DELTA, b"".join(parts))
+
+    def encode_keyframe(self):
+        return frame(MSG_KEYFRAME, KEYFRAME.pack(self.ticks) + zlib.compress(self.game.snapshot()))
+
+    async def handle_connection(self, reader, writer):
+        client = None
+        try:
+            kind, payload = await asyncio.wait_for(read_frame(reader, MAX_CLIENT_MESSAGE), HELLO_TIMEOUT_S)
+            if kind != MSG_HELLO or len(payload) != HELLO.size:
+                raise ProtocolError("expected HELLO")
+            magic, version, role = HELLO.unpack(payload)
+            if magic != MAGIC or version != PROTOCOL_VERSION:
+                raise ProtocolError("not a client of this protocol version")
+            if role == ROLE_PAC_MAN and self.pac_man_player is None:
+                client = self.pac_man_player = ClientConnection(writer, role, self.client_rate, self.client_burst)
+            elif role == ROLE_GHOST and self.ghost_player is None and self.game.ghost_player is not None:
+                client = self.ghost_player = ClientConnection(writer, role, self.client_rate, self.client_burst)
+            else:
+                client = ClientConnection(writer, ROLE_SPECTATOR, self.client_rate, self.client_burst)
+            client.send(frame(MSG_WELCOME, WELCOME.pack(MAGIC, PROTOCOL_VERSION, client.role,
+                                                        self.broadcast_ticks * SIM_TICK_MS) + self.welcome_level))
+            self.clients.append(client)
+            while True:
+                kind, payload = await read_frame(reader, MAX_CLIENT_MESSAGE)
+                if kind == MSG_INPUT and len(payload) == INPUT.size:
+                    self.apply_input(client, INPUT.unpack(payload)[0])
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            if client is not None:
+                if client in self.clients:
+                    self.clients.remove(client)
+                if client is self.pac_man_player:
+                    self.pac_man_player = None
+                if client is self.ghost_player:
+                    self.ghost_player = None
+                    if self.game.player_ghost is not None:
+                        self.game.player_ghost.wish = (0, 0)
+            writer.close()
+
+
+# --- Client ---
+class GameClient:
+    """Keeps a copy of a server's game up to date from its stream.
+
+    The copy is a headless Game on the level the server sent. Entities keep
+    their previous position in prev_pixel_pos, so alpha() gives how far to
+    draw them between the last two updates.
+    """
+
+    def __init__(self):
+        self.game = None
+        self.role = None
+        self.interval = None
+        self.ticks = 0
+        self.received_at = 0
+        self.bytes_received = 0
+        self.reader = None
+        self.writer = None
+
+    async def connect(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None, role=ROLE_SPECTATOR):
+        """Connects over TCP, or to a Unix socket at path, and waits for the welcome; returns the granted role."""
+        if path is not None:
+            self.reader, self.writer = await asyncio.open_unix_connection(path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.writer.write(frame(MSG_HELLO, HELLO.pack(MAGIC, PROTOCOL_VERSION, role)))
+        kind, payload = await read_frame(self.reader, MAX_SERVER_MESSAGE)
+        if kind != MSG_WELCOME:
+            raise ProtocolError("expected WELCOME")
+        magic, version, self.role, interval_ms = WELCOME.unpack_from(payload)
+        if magic != MAGIC or version != PROTOCOL_VERSION:
+            raise ProtocolError("not a server of this protocol version")
+        self.interval = interval_ms / 1000
+        try:
+            compiled = read_compiled(zlib.decompress(payload[WELCOME.size:]))
+            if compiled is None:
+                raise ProtocolError("the server sent a level this version cannot read")
+            validate_level(compiled[0])
+        except (zlib.error, LevelError) as e:
+            raise ProtocolError(f"the server sent a broken level: {e}")
+        self.game = Game(headless=True, seed=0, level=compiled[0])
+        self.bytes_received += FRAME.size + len(payload)
+        return self.role
+
+    async def run(self):
+        """Applies messages until the server hangs up."""
+        try:
+            while True:
+                await self.receive()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    async def receive(self):
+        """Reads one message and applies it; returns its type."""
+        kind, payload = await read_frame(self.reader, MAX_SERVER_MESSAGE)
+        self.bytes_received += FRAME.size + len(payload)
+        game = self.game
+        if kind == MSG_KEYFRAME:
+            self.ticks, = KEYFRAME.unpack_from(payload)
+            game.restore(zlib.decompress(payload[KEYFRAME.size:]))
+            for entity in game.entities:
+                entity.prev_pixel_pos[:] = entity.pixel_pos
+        elif kind == MSG_DELTA:
+            self.apply_delta(payload)
+        else:
+            return kind
+        self.received_at = time.perf_counter()
+        return kind
+
+    def apply_delta(self, payload):
+        game = self.game
+        self.ticks, game.score, game.lives, game_state, num_eaten, num_moves = DELTA_HEADER.unpack_from(payload)
+        game.game_state = game_state
+        game.game_over_message = "GAME OVER!" if game_state == GAME_STATE_GAME_OVER else ""
+        game.level_complete_message = "LEVEL COMPLETE!" if game_state == GAME_STATE_LEVEL_COMPLETE else ""
+        offset = DELTA_HEADER.size
+        for _ in range(num_eaten):
+            game.pellets.eat(*PELLET.unpack_from(payload, offset))
+            offset += PELLET.size
+        entities = game.entities
+        for entity in entities:
+            entity.prev_pixel_pos[:] = entity.pixel_pos
+        for _ in range(num_moves):
+            index, r, c, x, y, direction, flags = ENTITY_MOVE.unpack_from(payload, offset)
+            offset += ENTITY_MOVE.size
+            entity = entities[index]
+            entity.grid_pos = [r, c]
+            entity.pixel_pos = [x, y]
+            entity.direction = DIRECTION_BY_INDEX[direction]
+            if isinstance(entity, Ghost):
+                entity.frightened = bool(flags & FRIGHTENED)
+                entity.eaten = bool(flags & EATEN)
+                entity.color = (entity.original_color, SCARED_GHOST_COLOR, BLACK)[flags >> GHOST_COLOR_SHIFT]
+            else:
+                entity.mouth_open = bool(flags & MOUTH_OPEN)
+
+    def send_input(self, code):
+        self.writer.write(frame(MSG_INPUT, INPUT.pack(code)))
+
+    def alpha(self, now=None):
+        """How far to draw entities from their previous position towards the latest one."""
+        now = time.perf_counter() if now is None else now
+        return min(1.0, (now - self.received_at) / self.interval)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+KEY_INPUTS = {"K_UP": DIRECTIONS.index(UP), "K_DOWN": DIRECTIONS.index(DOWN), "K_LEFT": DIRECTIONS.index(LEFT),
+              "K_RIGHT": DIRECTIONS.index(RIGHT), "K_RETURN": INPUT_START}
+
+async def watch(client, fps=60):
+    """Shows a connected client's game in a window until it is closed or the server hangs up."""
+    pygame = pacman_clone.pygame
+    pacman_clone.init_display()
+    keys = {getattr(pygame, name): code for name, code in KEY_INPUTS.items()}
+    renderer = Renderer()
+    receiving = asyncio.ensure_future(client.run())
+    try:
+        while not receiving.done():
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return
+                if event.type == pygame.KEYDOWN and event.key in keys and client.role != ROLE_SPECTATOR:
+                    client.send_input(keys[event.key])
+            renderer.draw(client.game, pacman_clone.SCREEN, client.alpha())
+            await asyncio.sleep(1 / fps)
+    finally:
+        receiving.cancel()
+        client.close()
+        pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a Pac-Man game to local spectators and players, or watch one.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the authoritative game")
+    serve.add_argument("--level", help="maze file to play (default: the classic maze)")
+    serve.add_argument("--seed", type=int, default=None)
+    serve.add_argument("--ghost-player", choices=GHOST_TYPES, help="let a client steer this ghost")
+    serve.add_argument("--autopilot", action="store_true", help="let the autopilot play Pac-Man while no one else does")
+    watch_parser = commands.add_parser("watch", help="open a window on a served game")
+    watch_parser.add_argument("--play", choices=["pacman", "ghost"], help="ask to play instead of only watching")
+    for command in (serve, watch_parser):
+        command.add_argument("--host", default=DEFAULT_HOST)
+        command.add_argument("--port", type=int, default=DEFAULT_PORT)
+        command.add_argument("--unix", metavar="PATH", help="use a Unix socket instead of TCP")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        level = load_level(args.level) if args.level else None
+        import autopilot
+        server = GameServer(level, args.seed, args.ghost_player,
+                            autopilot.DEFAULT_BUDGET_MS if args.autopilot else None)
+
+        async def serve_forever():
+            listener = await server.listen(args.host, args.port, args.unix)
+            print(f"Serving on {args.unix or f'{args.host}:{args.port}'}", file=sys.stderr)
+            async with listener:
+                try:
+                    await server.run()
+                finally:
+                    server.close()
+        try:
+            asyncio.run(serve_forever())
+        except KeyboardInterrupt:
+            pass
+    else:
+        async def watch_game():
+            client = GameClient()
+            role = await client.connect(args.host, args.port, args.unix, ROLE_NAMES[args.play or "spectator"])
+            if args.play and role == ROLE_SPECTATOR:
+                print(f"No {args.play} player wanted; watching instead", file=sys.stderr)
+            await watch(client)
+        try:
+            asyncio.run(watch_game())
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Makes v1.pmr, a version 1 recording with uneven frame times that ends in a
+game over. Run it from a checkout of commit e97140c, where replay.py still
+writes version 1 files:
+
+    PYTHONPATH=. python tests/fixtures/make_v1.py tests/fixtures/v1.pmr 3000
+"""
+import random, sys
+
+from pacman_clone import Game, INPUT_START, GAME_STATE_PLAYING
+from replay import ReplayRecorder
+
+FRAME_TIMES = [16, 17, 17, 16, 17, 33, 16]
+
+path, max_ticks = sys.argv[1], int(sys.argv[2])
+game = Game(headless=True, seed=7)
+recorder = ReplayRecorder(path, game.seed)
+rng = random.Random(2)
+
+recorder.record_tick(16, [INPUT_START])
+game.apply_input(INPUT_START)
+game.update(16)
+tick = 0
+while game.game_state == GAME_STATE_PLAYING and recorder.ticks < max_ticks:
+    inputs = []
+    if game.pac_man.direction == (0, 0) or rng.random() < 0.02:
+        inputs.append(rng.randrange(4))
+    for code in inputs:
+        game.apply_input(code)
+    dt = FRAME_TIMES[tick % len(FRAME_TIMES)]
+    tick += 1
+    recorder.record_tick(dt, inputs)
+    game.update(dt)
+recorder.close(game)
+print(recorder.ticks, game.score, game.lives, game.game_state)
@@ -0,0 +1,35 @@
+import random
+
+import pytest
+
+from pacman_clone import Game, FRAME_MS, SIM_TICK_MS, DIRECTIONS, GAME_STATE_PLAYING
+from batch_sim import BatchGame, STOP, NO_ACTION
+
+
+@pytest.mark.parametrize("dt", [FRAME_MS, SIM_TICK_MS])
+def test_batch_matches_game(dt):
+    """Steps a BatchGame of one and a Game with the same inputs until the first
+    random event (a power pellet or a death) and compares them every tick."""
+    game = Game(headless=True, seed=0)
+    game.start_game()
+    batch = BatchGame(1, seed=0)
+    rng = random.Random(3)
+    ticks = 0
+    while game.game_state == GAME_STATE_PLAYING and not game.fright_mode and game.lives == 3:
+        action = NO_ACTION
+        if batch.pac_dir[0] == STOP or rng.random() < 0.02:
+            action = rng.randrange(len(DIRECTIONS))
+            game.pac_man.set_queued_direction(*DIRECTIONS[action])
+        game.update(dt)
+        batch.step([action], dt)
+        if game.fright_mode or game.lives != 3:
+            break
+        ticks += 1
+
+        assert batch.score[0] == game.score
+        assert (batch.pac_r[0], batch.pac_c[0]) == tuple(game.pac_man.grid_pos)
+        assert (batch.pac_x[0], batch.pac_y[0]) == tuple(game.pac_man.pixel_pos)
+        for i, ghost in enumerate(game.ghosts):
+            assert (batch.ghost_r[0, i], batch.ghost_c[0, i]) == tuple(ghost.grid_pos)
+            assert (batch.ghost_x[0, i], batch.ghost_y[0, i]) == tuple(ghost.pixel_pos)
+    assert ticks > 200
@@ -0,0 +1,28 @@
+import pytest
+
+from pacman_clone import Game, MAX_FRAME_MS, FRAME_MS, LEFT, RIGHT, get_pixel_coords
+
+
+@pytest.mark.parametrize("dt", [FRAME_MS, MAX_FRAME_MS])
+@pytest.mark.parametrize("gap", [5, 6])
+def test_head_on_pass_is_caught(dt, gap):
+    """A ghost and Pac-Man running at each other down a corridor touch before
+    they pass, however long the tick."""
+    game = Game(headless=True, seed=0)
+    game.start_game()
+    pac_man, ghost = game.pac_man, game.blinky
+    ghost.speed = 0.2
+    pac_man.grid_pos, ghost.grid_pos = [1, 1], [1, 1 + gap]
+    for entity, direction in ((pac_man, RIGHT), (ghost, LEFT)):
+        entity.pixel_pos = list(get_pixel_coords(*entity.grid_pos))
+        entity.direction = direction
+    game.pac_man_grid.rebuild(game.pac_men)
+
+    while pac_man.pixel_pos[0] < ghost.pixel_pos[0]:
+        assert pac_man.direction == RIGHT and ghost.direction == LEFT
+        pac_man.update_position(game.maze_map, dt)
+        game.pac_man_grid.move(pac_man)
+        ghost.update_position(game.maze_map, dt)
+        if game.touches_pac_man(ghost):
+            return
+    pytest.fail("they passed each other without touching")
@@ -0,0 +1,84 @@
+import random
+
+import numpy as np
+import pytest
+
+from env import PacManEnv, CHANNELS, NUM_ACTIONS, NO_ACTION, PAC_MAN, GHOST_CHANNELS, FRIGHTENED, EATEN
+from levels import CELL_PELLET, CELL_POWER_PELLET
+
+
+def expected_planes(game):
+    """The observation planes worked out from scratch."""
+    level = game.level
+    planes = np.zeros((len(CHANNELS), level.rows, level.cols), dtype=np.uint8)
+    planes[0] = np.frombuffer(level.walls, dtype=np.uint8).reshape(level.rows, level.cols)
+    cells = np.frombuffer(game.pellets.cells, dtype=np.uint8).reshape(level.rows, level.cols)
+    planes[1] = cells == CELL_PELLET
+    planes[2] = cells == CELL_POWER_PELLET
+    planes[PAC_MAN][tuple(game.pac_man.grid_pos)] = 1
+    for channel, ghost in zip(GHOST_CHANNELS, game.ghosts):
+        r, c = ghost.grid_pos
+        planes[channel, r, c] = 1
+        planes[FRIGHTENED, r, c] += ghost.frightened
+        planes[EATEN, r, c] += ghost.eaten
+    return planes
+
+
+def test_planes_track_the_game():
+    """The incrementally updated planes match the game after every step, across
+    eaten pellets, frightened and eaten ghosts, deaths and new episodes."""
+    env = PacManEnv(frame_skip=2, max_ticks=2000, seed=0)
+    obs, info = env.reset()
+    rng = random.Random(0)
+    episodes = 0
+    eaten = False
+    for step in range(3000):
+        np.testing.assert_array_equal(obs, expected_planes(env.game))
+        # Random play seldom reaches a power pellet
+        if step % 200 == 0:
+            env.game.activate_fright_mode()
+        obs, reward, terminated, truncated, info = env.step(rng.randrange(NUM_ACTIONS))
+        eaten |= any(ghost.eaten for ghost in env.game.ghosts)
+        if terminated or truncated:
+            episodes += 1
+            obs, info = env.reset()
+    assert episodes and eaten
+
+
+def test_step_and_reset_contract():
+    env = PacManEnv(frame_skip=4, max_ticks=40, seed=1)
+    obs, info = env.reset()
+    assert obs.shape == env.observation_shape == (len(CHANNELS), env.game.level.rows, env.game.level.cols)
+    assert obs.dtype == np.uint8
+    assert info == {"score": 0, "lives": 3, "ticks": 0, "game_state": env.game.game_state}
+    with pytest.raises(ValueError):
+        obs[0, 0, 0] = 1
+
+    score = 0
+    for step in range(1, 11):
+        next_obs, reward, terminated, truncated, info = env.step(NO_ACTION)
+        assert next_obs is obs
+        assert reward == info["score"] - score
+        score = info["score"]
+        assert info["ticks"] == 4 * step
+        assert not terminated
+        assert truncated == (step == 10)
+
+
+def test_reset_with_a_seed_replays_the_episode():
+    env = PacManEnv(seed=2)
+    runs = []
+    for _ in range(2):
+        env.reset(seed=7)
+        rng = random.Random(0)
+        runs.append([env.step(rng.randrange(NUM_ACTIONS))[1:4] for _ in range(300)] + [env.game.state_checksum()])
+    assert runs[0] == runs[1]
+
+
+def test_pixel_observations():
+    env = PacManEnv(pixel_size=(84, 96), seed=0)
+    obs, _ = env.reset()
+    assert set(obs) == {"planes", "pixels"}
+    assert obs["pixels"].shape == (96, 84, 3)
+    assert obs["pixels"].any()
+    assert env.step(NO_ACTION)[0]["pixels"] is obs["pixels"]
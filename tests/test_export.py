@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+import pacman_clone
+from pacman_clone import WIDTH, HEIGHT
+from export import FrameWriter, export_replay
+from replay import load_replay
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+@pytest.fixture(scope="module")
+def frame():
+    pacman_clone.init_display()
+    return pacman_clone.pygame.Surface((WIDTH, HEIGHT)).convert()
+
+
+def test_writer_writes_every_frame_in_order(frame):
+    written = []
+    writer = FrameWriter(lambda index, surface: written.append(index), frame, pool_size=2)
+    for _ in range(20):
+        writer.submit(frame)
+    writer.close()
+    assert written == list(range(20))
+
+
+def test_writer_error_reaches_the_caller(frame):
+    """A failed write surfaces from submit() or close() rather than being lost,
+    and the frames still in flight never leave submit() waiting."""
+    error = OSError("disk full")
+    written = []
+
+    def write(index, surface):
+        if index == 3:
+            raise error
+        written.append(index)
+
+    writer = FrameWriter(write, frame, pool_size=2)
+    with pytest.raises(OSError) as raised:
+        for _ in range(100):
+            writer.submit(frame)
+    assert raised.value is error
+    with pytest.raises(OSError) as raised:
+        writer.close()
+    assert raised.value is error
+    assert written == [0, 1, 2]
+
+
+@pytest.mark.parametrize("fps, start_s, duration_s, frames", [
+    (60, 10, 5, 300),
+    (30, 10, 5, 150),
+    (60, 0, 0.5, 30),
+    # The recording ends at 29.98s: 269 frames up to there, then one of its last state
+    (60, 25.5, 5, 270),
+    (60, 40, 5, 1),
+])
+def test_frame_count(frame, fps, start_s, duration_s, frames):
+    replay = load_replay(os.path.join(FIXTURES, "v1.pmr"))
+    submitted = []
+    count = export_replay(replay, frame, submitted.append, fps, start_s, duration_s)
+    assert count == len(submitted) == frames
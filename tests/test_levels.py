@@ -0,0 +1,102 @@
+import os, re
+
+import pytest
+
+import levels
+from pacman_clone import DEFAULT_LEVEL
+from levels import LevelError, parse_level, compile_level, read_compiled, load_level, compiled_path
+
+HEADER = {
+    "name": "tiny", "pacman": "1 1", "ghost_house": "2 3",
+    "blinky": "1 3", "pinky": "2 3", "inky": "3 1", "clyde": "3 5",
+    "blinky_scatter": "-1 6", "pinky_scatter": "-1 0", "inky_scatter": "5 6", "clyde_scatter": "5 0",
+}
+ROWS = ["1111111",
+        "1222221",
+        "0200020",
+        "1232221",
+        "1111111"]
+
+
+def maze_text(rows=ROWS, **header):
+    header = {**HEADER, **header}
+    return "".join(f"{key}: {value}\n" for key, value in header.items() if value is not None) + "\n".join(rows) + "\n"
+
+
+@pytest.mark.parametrize("text, message", [
+    (maze_text(ROWS + ["1121111"]), "pellet at (5, 2) cannot be reached"),
+    (maze_text(pacman="0 1"), "pacman position (0, 1) is a wall"),
+    (maze_text(ROWS[:2] + ["020002"] + ROWS[3:]), "maze row has 6 cells, expected 7"),
+    (maze_text(clyde_scatter=None), "missing header keys: clyde_scatter"),
+])
+def test_bad_maze_is_rejected(text, message):
+    with pytest.raises(LevelError, match=re.escape(message)):
+        parse_level(text)
+
+
+def test_compiled_level_round_trips():
+    level = parse_level(maze_text())
+    compiled = read_compiled(compile_level(level, 123456789, 321))
+    assert compiled is not None
+    copy, mtime_ns, size = compiled
+    assert (mtime_ns, size) == (123456789, 321)
+    assert (copy.name, copy.rows, copy.cols) == ("tiny", 5, 7)
+    assert bytes(copy.walls) == bytes(level.walls)
+    assert bytes(copy.pellet_bits) == bytes(level.pellet_bits)
+    assert bytes(copy.power_bits) == bytes(level.power_bits)
+    assert copy.pacman_spawn == level.pacman_spawn == (1, 1)
+    assert copy.ghost_house == level.ghost_house == (2, 3)
+    assert copy.ghost_spawns == level.ghost_spawns
+    assert copy.ghost_scatter == level.ghost_scatter
+    assert copy.ghost_scatter["blinky"] == (-1, 6)
+    assert copy.tunnel_rows == level.tunnel_rows == (2,)
+    assert copy.pellet_grid == level.pellet_grid
+    assert copy.power_pellets == level.power_pellets == {(3, 2)}
+
+
+def test_truncated_compiled_level_is_rejected():
+    compiled = compile_level(load_level(DEFAULT_LEVEL))
+    for size in range(len(compiled)):
+        assert read_compiled(compiled[:size]) is None
+
+
+def test_corrupt_cache_is_recompiled(tmp_path):
+    path = str(tmp_path / "maze.txt")
+    with open(DEFAULT_LEVEL) as source, open(path, "w") as f:
+        f.write(source.read())
+    expected = load_level(path)
+    with open(compiled_path(path), "wb") as f:
+        f.write(compile_level(expected)[:30])
+    levels._level_cache.clear()
+
+    level = load_level(path)
+    assert bytes(level.walls) == bytes(expected.walls)
+    with open(compiled_path(path), "rb") as f:
+        assert read_compiled(f.read()) is not None
+
+
+@pytest.mark.parametrize("change", ["mtime", "size"])
+def test_stale_compiled_level_is_recompiled(tmp_path, change):
+    """An edited source is parsed again even when only its mtime or only its size moved."""
+    path = str(tmp_path / "tiny.txt")
+    with open(path, "w") as f:
+        f.write(maze_text())
+    assert load_level(path).name == "tiny"
+    stat = os.stat(path)
+
+    with open(path, "w") as f:
+        f.write(maze_text(name="tony" if change == "mtime" else "tiny, edited"))
+    # Keep whichever of mtime and size is not under test as it was
+    if change == "mtime":
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    else:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    levels._level_cache.clear()
+
+    level = load_level(path)
+    assert level.name != "tiny"
+    with open(compiled_path(path), "rb") as f:
+        compiled = read_compiled(f.read())
+    stat = os.stat(path)
+    assert compiled[0].name == level.name
+    assert compiled[1:] == (stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,62 @@
+from pacman_clone import PelletStore, DEFAULT_LEVEL
+from levels import NO_PELLET, CELL_PELLET, CELL_POWER_PELLET, load_level
+
+
+def test_eat():
+    level = load_level(DEFAULT_LEVEL)
+    pellets = PelletStore(level)
+    total = len(level.pellets) + len(level.power_pellets)
+    assert len(pellets) == total
+
+    assert pellets.eat(1, 1) == CELL_PELLET
+    assert pellets.eat(3, 1) == CELL_POWER_PELLET
+    assert pellets.eat(1, 1) == NO_PELLET
+    assert pellets.eat(0, 0) == NO_PELLET
+    assert (1, 1) not in pellets and (1, 2) in pellets
+    assert len(pellets) == total - 2
+    assert pellets.eaten == [(1, 1), (3, 1)]
+    assert (3, 1) not in pellets.cells_of(CELL_POWER_PELLET)
+
+
+def test_pack_and_unpack():
+    level = load_level(DEFAULT_LEVEL)
+    pellets = PelletStore(level)
+    for cell in [(1, 1), (1, 2), (3, 26)]:
+        pellets.eat(*cell)
+    pellets.place(5, 0)
+    packed = pellets.pack()
+    assert len(packed) == 2 * ((level.rows * level.cols + 7) // 8)
+    assert pellets.pack() is packed
+
+    copy = PelletStore(level)
+    copy.unpack(packed)
+    assert copy.cells == pellets.cells
+    assert len(copy) == len(pellets)
+    assert copy.cells_of(CELL_POWER_PELLET) == pellets.cells_of(CELL_POWER_PELLET)
+    assert copy.pack() is packed
+
+    # Eating drops the packed bytes; unpacking the old ones puts the pellet back
+    copy.eat(1, 3)
+    assert copy.pack() != packed
+    copy.unpack(packed)
+    assert (1, 3) in copy and copy.eaten == []
+
+
+def test_generation():
+    """generation moves when pellets come back or are placed, not when one is eaten."""
+    pellets = PelletStore(load_level(DEFAULT_LEVEL))
+    generation = pellets.generation
+    pellets.eat(1, 1)
+    assert pellets.generation == generation
+
+    packed = pellets.pack()
+    for change in [pellets.reset, pellets.clear, lambda: pellets.place(1, 1, CELL_POWER_PELLET),
+                   lambda: pellets.unpack(packed)]:
+        change()
+        assert pellets.generation > generation
+        generation = pellets.generation
+    assert pellets.kind(1, 1) == NO_PELLET and len(pellets) == len(PelletStore(load_level(DEFAULT_LEVEL))) - 1
+
+    # Unpacking the pellets the store already holds changes nothing
+    pellets.unpack(packed)
+    assert pellets.generation == generation
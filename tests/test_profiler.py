@@ -0,0 +1,45 @@
+from profiler import FrameProfiler
+from pacman_clone import Game, PROFILER, SIM_TICK_MS
+from autopilot import Autopilot
+
+
+def test_nested_spans_count_once():
+    profiler = FrameProfiler()
+    profiler.enabled = True
+    ms = 1000000
+    for frame in range(2):
+        profiler.begin_frame()
+        base = profiler.frame_start
+        profiler.add_span("events", base, base + 1 * ms)
+        profiler.add_span("blinky", base + 2 * ms, base + 3 * ms)
+        profiler.add_span("pinky", base + 3 * ms, base + 5 * ms)
+        profiler.add_span("update", base + 1 * ms, base + 6 * ms)
+        profiler.add_span("flip", base + 8 * ms, base + 10 * ms)
+        profiler.add_span("draw", base + 6 * ms, base + 10 * ms)
+        profiler.end_frame()
+
+    breakdown = profiler.stage_breakdown()
+    assert breakdown == {"events": 1.0, "blinky": 1.0, "pinky": 2.0, "update": 2.0, "flip": 2.0, "draw": 2.0}
+    assert sum(breakdown.values()) == 10.0
+
+
+def test_autopilot_rollouts_record_no_spans():
+    game = Game(headless=True, seed=0)
+    game.profiled = True
+    game.start_game()
+    pilot = Autopilot(game, 2)
+    PROFILER.enabled = True
+    try:
+        before = PROFILER.span_count
+        for _ in range(30):
+            direction = pilot.step(game)
+            if direction is not None:
+                game.pac_man.set_queued_direction(*direction)
+            pilot.think()
+            game.update(SIM_TICK_MS)
+        # At most one span per ghost per tick of the live game
+        assert 0 < PROFILER.span_count - before <= 30 * len(game.ghosts)
+        assert pilot.searcher.sim.ticks > 0
+    finally:
+        PROFILER.enabled = False
+        pilot.close()
@@ -0,0 +1,86 @@
+import os, random, zlib
+
+import pytest
+
+from pacman_clone import Game, SIM_TICK_MS, INPUT_START, GAME_STATE_PLAYING
+from levels import load_level
+from mazegen import generate_maze_text
+from replay import ReplayRecorder, load_replay, run_replay, verify_replay, MAGIC, HEADER, HEADER_V2
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def test_version_1_recording_replays():
+    # A version 1 recording (no tick length in the header) made by fixtures/make_v1.py,
+    # with uneven frame times and a game over
+    replay = load_replay(os.path.join(FIXTURES, "v1.pmr"))
+    assert replay.dt is None
+    assert verify_replay(replay, run_replay(replay)) == []
+
+
+def record(path, level=None):
+    """Plays a game with random turns and records it; returns the game."""
+    game = Game(headless=True, seed=3, level=level)
+    recorder = ReplayRecorder(path, game.seed, SIM_TICK_MS)
+    rng = random.Random(0)
+    inputs = [INPUT_START]
+    while recorder.ticks < 3000 and (recorder.ticks == 0 or game.game_state == GAME_STATE_PLAYING):
+        if game.pac_man.direction == (0, 0) or rng.random() < 0.02:
+            inputs.append(rng.randrange(4))
+        for code in inputs:
+            game.apply_input(code)
+        recorder.record_tick(inputs)
+        inputs = []
+        game.update(SIM_TICK_MS)
+    recorder.close(game)
+    return game
+
+
+def test_recording_round_trip(tmp_path):
+    path = str(tmp_path / "run.pmr")
+    record(path)
+    replay = load_replay(path)
+    assert replay.dt == SIM_TICK_MS
+    assert verify_replay(replay, run_replay(replay)) == []
+
+
+def test_recording_replays_on_its_own_level(tmp_path):
+    maze = tmp_path / "maze.txt"
+    maze.write_text(generate_maze_text(41, 41, seed=0))
+    path = str(tmp_path / "run.pmr")
+    game = record(path, load_level(str(maze)))
+    # Nothing but the recording is needed to replay it
+    os.remove(maze)
+    replay = load_replay(path)
+    assert (replay.level.rows, replay.level.cols) == (41, 41)
+    assert bytes(replay.level.walls) == bytes(game.level.walls)
+    assert verify_replay(replay, run_replay(replay)) == []
+
+
+def test_version_2_recording_replays_on_the_classic_maze(tmp_path):
+    path = str(tmp_path / "run.pmr")
+    record(path)
+    with open(path, "rb") as f:
+        blob = f.read()
+    header = HEADER.unpack_from(blob)
+    data = zlib.decompress(blob[HEADER.size:])[header[-1]:]
+    with open(path, "wb") as f:
+        f.write(HEADER_V2.pack(MAGIC, 2, *header[2:-1]))
+        f.write(zlib.compress(data))
+
+    replay = load_replay(path)
+    assert replay.level is None
+    assert verify_replay(replay, run_replay(replay)) == []
+
+
+def test_damaged_level_is_reported(tmp_path):
+    path = str(tmp_path / "run.pmr")
+    record(path)
+    with open(path, "rb") as f:
+        blob = f.read()
+    header = list(HEADER.unpack_from(blob))
+    header[-1] -= 10
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(*header) + blob[HEADER.size:])
+    with pytest.raises(ValueError, match="recorded level is damaged"):
+        load_replay(path)
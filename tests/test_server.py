@@ -0,0 +1,89 @@
+import asyncio, zlib
+
+import pytest
+
+from server import (
+    GameServer, GameClient, ProtocolError, frame, MSG_WELCOME, WELCOME, MAGIC, PROTOCOL_VERSION,
+    ROLE_GHOST, ROLE_SPECTATOR,
+)
+from levels import Level, GHOST_TYPES, compile_level, load_level
+from pacman_clone import DIRECTIONS, RIGHT, DEFAULT_LEVEL
+
+TICKS = 240
+
+
+def assert_mirrors(game, copy):
+    assert (copy.score, copy.lives, copy.game_state) == (game.score, game.lives, game.game_state)
+    assert copy.pellets.cells == game.pellets.cells
+    for entity, mirrored in zip(game.entities, copy.entities):
+        assert mirrored.grid_pos == entity.grid_pos
+        assert mirrored.direction == entity.direction
+        assert abs(mirrored.pixel_pos[0] - entity.pixel_pos[0]) < 1e-3
+        assert abs(mirrored.pixel_pos[1] - entity.pixel_pos[1]) < 1e-3
+
+
+def test_loopback_clients_mirror_the_game():
+    async def session():
+        server = GameServer(seed=1, ghost_player="pinky", autopilot_budget_ms=2)
+        # The autopilot searches off the event loop
+        assert server.pilot.thread is not None
+        listener = await server.listen(port=0)
+        port = listener.sockets[0].getsockname()[1]
+        ghost, spectator = GameClient(), GameClient()
+        readers = []
+        try:
+            assert await ghost.connect(port=port, role=ROLE_GHOST) == ROLE_GHOST
+            assert await spectator.connect(port=port, role=ROLE_SPECTATOR) == ROLE_SPECTATOR
+            readers += [asyncio.ensure_future(client.run()) for client in (ghost, spectator)]
+            ghost.send_input(DIRECTIONS.index(RIGHT))
+            await server.run(TICKS)
+            await asyncio.sleep(0.2)
+            assert server.game.player_ghost.wish == RIGHT
+            for client in (ghost, spectator):
+                assert client.ticks == server.ticks == TICKS
+                assert_mirrors(server.game, client.game)
+        finally:
+            ghost.close()
+            spectator.close()
+            server.close()
+            listener.close()
+            await listener.wait_closed()
+        await asyncio.gather(*readers, return_exceptions=True)
+
+    asyncio.run(session())
+
+
+def walled_in_level():
+    """The classic maze with Pac-Man spawning inside the top-left wall."""
+    level = load_level(DEFAULT_LEVEL)
+    positions = {"pacman": (0, 0), "ghost_house": level.ghost_house, **level.ghost_spawns}
+    scatter = {ghost + "_scatter": level.ghost_scatter[ghost] for ghost in GHOST_TYPES}
+    return Level(level.name, level.rows, level.cols, level.walls, level.pellet_bits, level.power_bits,
+                 positions, scatter, level.tunnel_rows)
+
+
+@pytest.mark.parametrize("payload", [
+    zlib.compress(compile_level(load_level(DEFAULT_LEVEL))[:30]),
+    zlib.compress(b"not a level"),
+    b"not compressed",
+    zlib.compress(compile_level(walled_in_level())),
+])
+def test_client_rejects_a_broken_level(payload):
+    async def session():
+        async def welcome(reader, writer):
+            writer.write(frame(MSG_WELCOME, WELCOME.pack(MAGIC, PROTOCOL_VERSION, ROLE_SPECTATOR, 33.3)
+                               + payload))
+            await writer.drain()
+            writer.close()
+
+        listener = await asyncio.start_server(welcome, "127.0.0.1", 0)
+        client = GameClient()
+        try:
+            with pytest.raises(ProtocolError):
+                await client.connect(port=listener.sockets[0].getsockname()[1])
+        finally:
+            client.close()
+            listener.close()
+            await listener.wait_closed()
+
+    asyncio.run(session())
@@ -0,0 +1,49 @@
+import random
+
+from pacman_clone import Game, SIM_TICK_MS, DIRECTIONS
+
+
+def play(game, inputs):
+    for code in inputs:
+        if code is not None:
+            game.apply_input(code)
+        game.update(SIM_TICK_MS)
+    return game.state_checksum()
+
+
+def random_inputs(seed, ticks):
+    rng = random.Random(seed)
+    return [rng.randrange(len(DIRECTIONS)) if rng.random() < 0.05 else None for _ in range(ticks)]
+
+
+def test_restore_replays_the_same_game():
+    """Running the same inputs again from a restored snapshot ends in the same state,
+    random ghost choices and deaths included."""
+    game = Game(headless=True, seed=5)
+    game.start_game()
+    play(game, random_inputs(1, 600))
+    snapshot = game.snapshot()
+    before = game.state_checksum()
+
+    inputs = random_inputs(2, 1200)
+    after = play(game, inputs)
+    assert after != before
+    game.restore(snapshot)
+    assert game.state_checksum() == before
+    assert play(game, inputs) == after
+
+
+def test_snapshot_round_trips_through_bytes():
+    """A snapshot loaded into another game gives the same state and the same snapshot back."""
+    game = Game(headless=True, seed=5)
+    game.start_game()
+    play(game, random_inputs(1, 900))
+    snapshot = bytes(game.snapshot())
+
+    copy = Game(headless=True, seed=99)
+    copy.restore(snapshot)
+    assert copy.state_checksum() == game.state_checksum()
+    assert copy.snapshot() == snapshot
+
+    inputs = random_inputs(2, 900)
+    assert play(copy, inputs) == play(game, inputs)